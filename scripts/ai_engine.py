@@ -0,0 +1,278 @@
+import os
+import sys
+import hashlib
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# ===== Path Fix（GitHub Actions 必要）=====
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from scripts.safe_yfinance import safe_download
+from scripts.discord_notifier import send
+from scripts import history_store, metrics_materializer, history, market_registry, risk_state
+from scripts import tree_compiler, feature_store, run_cache, memory_profile
+
+warnings.filterwarnings("ignore")
+
+# ===============================
+# Paths
+# ===============================
+DATA_DIR = os.path.join(BASE_DIR, "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+
+FEATS = list(feature_store.DEFINITIONS)
+MIN_BARS = 120
+INPUT_BARS = 30          # 變動偵測比對的最近 bar 數
+
+# ===============================
+def calc_pivot(df):
+    r = df.iloc[-20:]
+    h, l, c = r["High"].max(), r["Low"].min(), r["Close"].iloc[-1]
+    p = (h + l + c) / 3
+    return round(2*p - h, 2), round(2*p - l, 2)
+
+# ===============================
+# Stages
+# ===============================
+def fetch(m):
+    data = safe_download(m["core_watch"])
+    if data is None:
+        return None
+
+    # 📦 價格寫入本地 columnar 價格庫（供分析 / 查詢重用）
+    try:
+        history.store_panel(m["code"], data, m["core_watch"])
+    except Exception as e:
+        print(f"[WARN] price store update failed: {e}")
+    return data
+
+def features(df, horizon):
+    df = df.copy()
+    for name, fn in feature_store.DEFINITIONS.items():
+        df[name] = fn(df["Close"], df["Volume"])
+    df["target"] = feature_store.label(df["Close"], horizon)
+    return df
+
+def _feature_store(code):
+    try:
+        return feature_store.open_store(code)
+    except Exception as e:
+        print(f"[WARN] feature store unavailable: {e}")
+        return None
+
+def fingerprint(bars, last_row, horizon, version):
+    """Hash of a symbol's latest bars + feature vector (same hash → same prediction)."""
+    h = hashlib.sha1(pd.util.hash_pandas_object(bars.iloc[-INPUT_BARS:], index=True).to_numpy().tobytes())
+    h.update(np.asarray(last_row, dtype=np.float64).tobytes())
+    h.update(f"{horizon}|{version}".encode())
+    return h.hexdigest()[:16]
+
+def predict(m, data):
+    # 只有訓練需要 xgboost；推論走 tree_compiler 的 NumPy 陣列
+    from xgboost import XGBRegressor
+
+    horizon = m["horizon"]
+    models, last_rows, results, inputs = {}, {}, {}, {}
+    fs = _feature_store(m["code"])
+
+    # 🔁 上次的模型與輸入指紋：輸入未變的標的直接沿用前次預測（不訓練、不推論）
+    prev = tree_compiler.Ensemble.load(tree_compiler.model_file(m["code"]))
+    prev_inputs = prev.meta.get("inputs", {}) if prev is not None else {}
+    version = run_cache.code_version()
+
+    for s in m["core_watch"]:
+        try:
+            bars = data[s].dropna()
+            if len(bars) < MIN_BARS:
+                continue
+
+            # 📦 特徵庫已涵蓋到最新一根 bar 時直接讀取；否則就地計算
+            if fs is not None and fs.last_date(s) == bars.index[-1].date():
+                df = fs.frame(s, horizon)
+            else:
+                df = features(bars, horizon)
+
+            last_row = df[FEATS].iloc[-1].to_numpy(float)
+            fp = fingerprint(bars, last_row, horizon, version)
+            old = prev_inputs.get(s)
+            if old and old["fp"] == fp and s in prev:
+                results[s] = {**old["result"], "unchanged": True}
+                inputs[s] = old
+                continue
+
+            train = df.iloc[:-horizon].dropna()
+            model = XGBRegressor(
+                n_estimators=120,
+                max_depth=3,
+                learning_rate=0.05,
+                random_state=42,
+            )
+            model.fit(train[FEATS], train["target"])
+
+            sup, res = calc_pivot(bars)
+            models[s] = model
+            last_rows[s] = last_row
+            inputs[s] = {"fp": fp}
+            results[s] = {
+                "price": round(float(bars["Close"].iloc[-1]), 2),
+                "sup": float(sup),
+                "res": float(res),
+            }
+        except Exception:
+            continue
+
+    if not models:
+        if results:
+            print(f"[INFO] {m['code']} inputs unchanged for all {len(results)} symbols, reusing previous predictions")
+        return results
+
+    # 全部標的一次批次推論，並存成免 xgboost 的模型檔（報表 / 常駐監控 / 試算用）
+    ens = tree_compiler.compile_models(models, FEATS)
+    names = list(models)
+    preds = ens.predict([last_rows[s] for s in names], names)
+    for s, p in zip(names, preds):
+        results[s]["pred"] = float(p)
+        inputs[s]["result"] = results[s]
+
+    reused = [s for s in inputs if s not in models]
+    if reused:
+        ens = ens.merge(prev.subset(reused))
+    print(f"[INFO] {m['code']} trained {len(models)}, reused {len(reused)} unchanged")
+
+    try:
+        ens.save(tree_compiler.model_file(m["code"]), {
+            "horizon": horizon,
+            "trained_at": datetime.now().isoformat(timespec="seconds"),
+            "inputs": inputs,
+        })
+    except Exception as e:
+        print(f"[WARN] model export failed: {e}")
+    return results
+
+def _line(m, s, r):
+    emoji = "📈" if r["pred"] > 0 else "📉"
+    stale = "（資料未更新，沿用前次）" if r.get("unchanged") else ""
+    return (
+        f"{emoji} {market_registry.display(s, m['code'])}：預估 {r['pred']:+.2%}{stale}\n"
+        f"└ 現價 {r['price']}（支撐 {r['sup']} / 壓力 {r['res']}）\n"
+    )
+
+def build_message(m, results, date_str):
+    msg = (
+        f"📊 {m['name']} AI 進階預測報告 ({date_str})\n"
+        f"------------------------------------------\n\n"
+    )
+    unchanged = sum(1 for r in results.values() if r.get("unchanged"))
+    if results and unchanged == len(results):
+        msg += "⏸ 行情資料自上次預測後未更新（休市或資料延遲），以下沿用前次預測\n\n"
+    elif unchanged:
+        msg += f"⏸ {unchanged} 檔資料未更新，沿用前次預測\n\n"
+
+    # 🔍 Explorer（Lv2）
+    # 成交量排名前 100 名的成員（排名明細見 explorer_state/，pool 檔本身依代號排序）
+    explorer_syms = market_registry.ranked_pool(m["code"])[:100]
+    hits = [(s, results[s]) for s in explorer_syms if s in results]
+    top5 = sorted(hits, key=lambda x: x[1]["pred"], reverse=True)[:5]
+    if top5:
+        msg += "🔍 AI 海選 Top 5（潛力股）\n"
+        for s, r in top5:
+            msg += _line(m, s, r)
+        msg += "\n"
+
+    # 👁 核心監控
+    msg += f"👁 {m['core_title']}\n"
+    for s, r in sorted(results.items(), key=lambda x: x[1]["pred"], reverse=True):
+        msg += _line(m, s, r)
+
+    # 📊 回測結算
+    try:
+        bt = metrics_materializer.latest(m["code"])
+        if bt:
+            msg += (
+                "\n------------------------------------------\n"
+                f"📊 {m['name']}｜近 {m['horizon']} 日回測結算（歷史觀測）\n\n"
+                f"交易筆數：{int(bt['window_count'])}\n"
+                f"命中率：{bt['hit_rate']*100:.1f}%\n"
+                f"平均報酬：{bt['avg_return']:+.2%}\n"
+                f"最大回撤：{bt['max_drawdown']:+.2%}\n\n"
+                "📌 本結算僅為歷史統計觀測，不影響任何即時預測或系統行為\n"
+            )
+    except Exception:
+        pass
+
+    msg += "\n💡 模型為機率推估，僅供研究參考，非投資建議。"
+    return msg
+
+def report(m, results, export=True, date_str=None):
+    date_str = date_str or datetime.now().strftime("%Y-%m-%d")
+    # 訊息在交付時才渲染：回測結算 / explorer 排名可能在快取後才更新
+    msg = build_message(m, results, date_str)
+
+    # 📝 Lv1 核心預測寫入歷史（Explorer 不寫入）
+    history_store.append_predictions(m["code"], [
+        {
+            "date": date_str,
+            "symbol": s,
+            "entry_price": r["price"],
+            "pred_ret": r["pred"],
+            "horizon": m["horizon"],
+        }
+        for s, r in results.items()
+        if s in m["core_watch"]
+    ])
+    if export:
+        history_store.export_csv()
+
+    send(market_registry.webhook(m["code"]), content=msg)
+
+# ===============================
+# Run（同一 session、同樣輸入的重跑直接交付快取結果）
+# ===============================
+def _call(name, fn, *args):
+    with memory_profile.stage(name):
+        return fn(*args)
+
+def prepare(m, stage=_call):
+    """Results for the latest session (cached or freshly predicted); None on data failure.
+
+    `stage(name, fn, *args)` wraps each step (pipeline_runner passes its timer).
+    """
+    entry = stage("cache", run_cache.lookup, m)
+    if entry:
+        return entry
+
+    data = stage("fetch", fetch, m)
+    if data is None:
+        print(f"[INFO] {m['code']} AI skipped (data failure)")
+        return None
+
+    entry = stage("cache_data", run_cache.lookup, m, data)
+    if entry:
+        return entry
+
+    results = stage("predict", predict, m, data)
+    if not results:
+        return None
+    return run_cache.store(m, data, results, datetime.now().strftime("%Y-%m-%d"))
+
+def run(code, export=True):
+    """fetch → features → predict → report for one market. Returns #predictions."""
+    if risk_state.l4_active():
+        return 0
+
+    m = market_registry.get(code)
+    entry = prepare(m)
+    if not entry:
+        return 0
+
+    report(m, entry["results"], export, entry["date"])
+    return len(entry["results"])
+
+if __name__ == "__main__":
+    for c in sys.argv[1:] or market_registry.codes():
+        run(c)
+    memory_profile.report("ai_engine")
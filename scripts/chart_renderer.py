@@ -0,0 +1,262 @@
+import os
+import json
+import zlib
+import struct
+import hashlib
+
+import numpy as np
+
+# ===============================
+# Base / Manifest
+# ===============================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+MANIFEST_FILE = os.path.join(DATA_DIR, "chart_manifest.json")
+
+# 改動繪圖邏輯時遞增，讓舊圖全部失效
+RENDERER_VERSION = 2
+
+WIDTH, HEIGHT = 600, 300
+MARGIN = 20
+LINE_WIDTH = 2
+
+# PNG 左側留 y 軸刻度、上方留標題
+PNG_LEFT, PNG_TOP = 64, 32
+FONT_SCALE = 2
+
+BG = (255, 255, 255)
+GRID = (225, 225, 225)
+AXIS = (120, 120, 120)
+BASELINE = (160, 160, 160)
+LINE = (31, 119, 180)
+TEXT = (40, 40, 40)
+
+# ===============================
+# 3×5 Bitmap Font（PNG 標題 / 刻度用；僅 ASCII，其餘字元略過）
+# ===============================
+_GLYPHS = {
+    "0": "###,#.#,#.#,#.#,###", "1": ".#.,##.,.#.,.#.,###", "2": "###,..#,###,#..,###",
+    "3": "###,..#,###,..#,###", "4": "#.#,#.#,###,..#,..#", "5": "###,#..,###,..#,###",
+    "6": "###,#..,###,#.#,###", "7": "###,..#,..#,..#,..#", "8": "###,#.#,###,#.#,###",
+    "9": "###,#.#,###,..#,###",
+    "A": ".#.,#.#,###,#.#,#.#", "B": "##.,#.#,##.,#.#,##.", "C": ".##,#..,#..,#..,.##",
+    "D": "##.,#.#,#.#,#.#,##.", "E": "###,#..,##.,#..,###", "F": "###,#..,##.,#..,#..",
+    "G": ".##,#..,#.#,#.#,.##", "H": "#.#,#.#,###,#.#,#.#", "I": "###,.#.,.#.,.#.,###",
+    "J": "..#,..#,..#,#.#,.#.", "K": "#.#,#.#,##.,#.#,#.#", "L": "#..,#..,#..,#..,###",
+    "M": "#.#,###,###,#.#,#.#", "N": "##.,#.#,#.#,#.#,#.#", "O": ".#.,#.#,#.#,#.#,.#.",
+    "P": "##.,#.#,##.,#..,#..", "Q": ".#.,#.#,#.#,##.,.##", "R": "##.,#.#,##.,#.#,#.#",
+    "S": ".##,#..,.#.,..#,##.", "T": "###,.#.,.#.,.#.,.#.", "U": "#.#,#.#,#.#,#.#,###",
+    "V": "#.#,#.#,#.#,#.#,.#.", "W": "#.#,#.#,###,###,#.#", "X": "#.#,#.#,.#.,#.#,#.#",
+    "Y": "#.#,#.#,.#.,.#.,.#.", "Z": "###,..#,.#.,#..,###",
+    " ": "...,...,...,...,...", "-": "...,...,###,...,...", "+": "...,.#.,###,.#.,...",
+    ".": "...,...,...,...,.#.", "%": "#.#,..#,.#.,#..,#.#", "(": ".#.,#..,#..,#..,.#.",
+    ")": ".#.,..#,..#,..#,.#.", ":": "...,.#.,...,.#.,...", "/": "..#,..#,.#.,#..,#..",
+}
+FONT = {
+    ch: np.nonzero(np.array([[c == "#" for c in row] for row in rows.split(",")]))
+    for ch, rows in _GLYPHS.items()
+}
+GLYPH_W, GLYPH_H = 4, 5      # 含 1 px 字距
+
+# ===============================
+# Hash / Manifest
+# ===============================
+def series_hash(values, **style):
+    v = np.asarray(values, dtype=np.float64)
+    h = hashlib.sha256(v.tobytes())
+    h.update(json.dumps(style, sort_keys=True).encode("utf-8"))
+    h.update(str(RENDERER_VERSION).encode("utf-8"))
+    return h.hexdigest()
+
+def load_manifest():
+    if os.path.exists(MANIFEST_FILE):
+        try:
+            return json.load(open(MANIFEST_FILE, "r", encoding="utf-8"))
+        except Exception:
+            pass
+    return {}
+
+def save_manifest(m):
+    tmp = MANIFEST_FILE + ".tmp"
+    json.dump(m, open(tmp, "w", encoding="utf-8"), indent=2, sort_keys=True)
+    os.replace(tmp, MANIFEST_FILE)
+
+# ===============================
+# Geometry
+# ===============================
+def _project(values, width, height, baseline, left=MARGIN, top=MARGIN):
+    v = np.asarray(values, dtype=np.float64)
+    v = v[np.isfinite(v)]
+    if len(v) == 1:
+        v = np.repeat(v, 2)
+
+    lo, hi = v.min(), v.max()
+    if baseline is not None:
+        lo, hi = min(lo, baseline), max(hi, baseline)
+    if hi - lo < 1e-12:
+        lo, hi = lo - 1, hi + 1
+    pad = (hi - lo) * 0.05
+    lo, hi = lo - pad, hi + pad
+
+    x = left + np.linspace(0, width - left - MARGIN - 1, len(v))
+    scale = (height - top - MARGIN - 1) / (hi - lo)
+
+    def to_y(a):
+        return top + (hi - np.asarray(a)) * scale
+
+    return x, to_y(v), to_y, (lo, hi)
+
+# ===============================
+# PNG Writer（不依賴 matplotlib）
+# ===============================
+def _chunk(tag, data):
+    return (
+        struct.pack(">I", len(data)) + tag + data
+        + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    )
+
+def encode_png(img):
+    h, w, _ = img.shape
+    raw = np.zeros((h, w * 3 + 1), dtype=np.uint8)   # filter byte 0 / 每列
+    raw[:, 1:] = img.reshape(h, w * 3)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0))
+        + _chunk(b"IDAT", zlib.compress(raw.tobytes(), 9))
+        + _chunk(b"IEND", b"")
+    )
+
+def _stroke(img, xs, ys, color, width):
+    """Rasterise a polyline: sample every segment densely, stamp a square pen."""
+    h, w, _ = img.shape
+    x0, x1, y0, y1 = xs[:-1], xs[1:], ys[:-1], ys[1:]
+    steps = np.maximum(np.ceil(np.maximum(abs(x1 - x0), abs(y1 - y0)) * 2), 1).astype(int)
+
+    seg = np.repeat(np.arange(len(steps)), steps)
+    t = (np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(steps, steps)
+    px = np.rint(x0[seg] + (x1 - x0)[seg] * t).astype(int)
+    py = np.rint(y0[seg] + (y1 - y0)[seg] * t).astype(int)
+    px = np.append(px, int(round(xs[-1])))
+    py = np.append(py, int(round(ys[-1])))
+
+    r = width // 2
+    for dy in range(-r, width - r):
+        for dx in range(-r, width - r):
+            qx, qy = np.clip(px + dx, 0, w - 1), np.clip(py + dy, 0, h - 1)
+            img[qy, qx] = color
+
+def text_width(text, scale=FONT_SCALE):
+    return max(len(text) * GLYPH_W - 1, 0) * scale
+
+def _text(img, x, y, text, color=TEXT, scale=FONT_SCALE):
+    """Stamp ASCII text with its top-left corner at (x, y)."""
+    h, w, _ = img.shape
+    for ch in text.upper():
+        if ch in FONT:
+            gy, gx = FONT[ch]
+            for dy in range(scale):
+                for dx in range(scale):
+                    qy, qx = y + gy * scale + dy, x + gx * scale + dx
+                    ok = (qy >= 0) & (qy < h) & (qx >= 0) & (qx < w)
+                    img[qy[ok], qx[ok]] = color
+        x += GLYPH_W * scale
+
+def _ticks(lo, hi, n):
+    """n evenly spaced tick labels from hi down to lo, with just enough decimals."""
+    step = (hi - lo) / (n - 1)
+    decimals = int(min(4, max(0, np.ceil(-np.log10(step)))))
+    return [f"{v:.{decimals}f}" for v in np.linspace(hi, lo, n)]
+
+def render_png(values, path, width=WIDTH, height=HEIGHT, baseline=1.0, color=LINE, title=""):
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = BG
+
+    left, top = PNG_LEFT, PNG_TOP if title else MARGIN
+    x, y, to_y, (lo, hi) = _project(values, width, height, baseline, left, top)
+    right, bottom = width - MARGIN, height - MARGIN - 1
+
+    # 格線 + y 軸刻度
+    grid = np.linspace(top, bottom, 5)
+    for gy, label in zip(grid, _ticks(lo, hi, len(grid))):
+        img[int(gy), left:right] = GRID
+        _text(img, left - 6 - text_width(label), int(gy) - GLYPH_H * FONT_SCALE // 2, label)
+    img[top:bottom + 1, left] = AXIS
+    img[bottom, left:right] = AXIS
+
+    if baseline is not None:
+        by = int(round(float(to_y(baseline))))
+        img[by, left:right:4] = BASELINE
+    if title:
+        _text(img, left, (top - GLYPH_H * FONT_SCALE) // 2, title)
+
+    _stroke(img, x, y, color, LINE_WIDTH)
+
+    with open(path, "wb") as f:
+        f.write(encode_png(img))
+
+# ===============================
+# SVG Writer
+# ===============================
+def render_svg(values, path, width=WIDTH, height=HEIGHT, baseline=1.0, color=LINE, title=""):
+    x, y, to_y, _ = _project(values, width, height, baseline)
+    pts = " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(x, y))
+    hexc = "#%02x%02x%02x" % color
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">',
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+    ]
+    if title:
+        parts.append(f'<text x="{MARGIN}" y="14" font-size="12" font-family="sans-serif">{title}</text>')
+    if baseline is not None:
+        by = float(to_y(baseline))
+        parts.append(
+            f'<line x1="{MARGIN}" y1="{by:.1f}" x2="{width - MARGIN}" y2="{by:.1f}" '
+            'stroke="#a0a0a0" stroke-dasharray="4"/>'
+        )
+    parts.append(f'<polyline fill="none" stroke="{hexc}" stroke-width="{LINE_WIDTH}" points="{pts}"/>')
+    parts.append("</svg>")
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+
+# ===============================
+# Batch Render（content hash 快取）
+# ===============================
+def render(specs):
+    """Render many charts in one pass, skipping any whose input hash is unchanged.
+
+    specs: dicts with "path" and "values" (+ optional "baseline", "title").
+    Returns {path: changed}.
+    """
+    manifest = load_manifest()
+    result = {}
+
+    for spec in specs:
+        path = spec["path"]
+        values = np.asarray(spec["values"], dtype=np.float64)
+        baseline = spec.get("baseline", 1.0)
+        title = spec.get("title", "")
+        key = os.path.relpath(path, BASE_DIR)
+
+        digest = series_hash(values, baseline=baseline, title=title, ext=os.path.splitext(path)[1])
+        if manifest.get(key) == digest and os.path.exists(path):
+            result[path] = False
+            continue
+
+        if not np.isfinite(values).any():
+            result[path] = False
+            continue
+
+        if path.endswith(".svg"):
+            render_svg(values, path, baseline=baseline, title=title)
+        else:
+            render_png(values, path, baseline=baseline, title=title)
+
+        manifest[key] = digest
+        result[path] = True
+
+    if any(result.values()):
+        save_manifest(manifest)
+    return result
@@ -0,0 +1,313 @@
+import os
+import json
+import shutil
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows：僅保留行程內鎖
+    fcntl = None
+
+# ===============================
+# Base / Layout
+# ===============================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+# 衍生快取（可由 history.db / 下載資料重建），不進 git
+COLUMNAR_DIR = os.path.join(DATA_DIR, "columnar")
+
+FORMAT_VERSION = 1
+
+# 每個 table 一個目錄：
+#   meta.json          欄位 / 列數 / symbol 字典 / 來源水位
+#   <col>.npy          依日期排序的欄位（date 為 int64 日數）
+#   sym_rows.npy       依 (symbol, date) 排序的列號
+#   sym_dates.npy      與 sym_rows 對齊的日期（供 symbol 內二分搜尋）
+#   sym_offsets.npy    每個 symbol 在 sym_rows 的起訖
+#
+# 增量寫入：<name>.seg/<seq>/ 為與主表同格式的 append 區段，讀取時依
+# (date, symbol) 合併（後寫入者優先）；區段超過 MAX_SEGMENTS 時壓實回主表
+MAX_SEGMENTS = 16
+
+def table_dir(name):
+    return os.path.join(COLUMNAR_DIR, name)
+
+def segments_dir(name):
+    return table_dir(name) + ".seg"
+
+def _segment_names(name):
+    d = segments_dir(name)
+    if not os.path.isdir(d):
+        return []
+    return sorted(n for n in os.listdir(d) if n.isdigit())
+
+# ===============================
+# Write Lock（跨 thread / process；同 thread 可重入）
+# ===============================
+_locks = {}
+_locks_guard = threading.Lock()
+_held = threading.local()
+
+@contextmanager
+def lock(name):
+    """Exclusive write lock on one table; every writer of the table must hold it."""
+    with _locks_guard:
+        rlock = _locks.setdefault(name, threading.RLock())
+    held = _held.__dict__.setdefault("names", set())
+
+    with rlock:
+        if name in held:
+            yield
+            return
+        os.makedirs(COLUMNAR_DIR, exist_ok=True)
+        with open(os.path.join(COLUMNAR_DIR, f"{name}.lock"), "a") as fh:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            held.add(name)
+            try:
+                yield
+            finally:
+                held.discard(name)
+                if fcntl:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+def _to_days(values):
+    return pd.to_datetime(pd.Series(values)).to_numpy("datetime64[D]").astype(np.int64)
+
+# ===============================
+# Write
+# ===============================
+def write_table(name, df, date_col="date", symbol_col="symbol", source=None):
+    """Replace the whole table with df (atomic swap; drops any append segments)."""
+    meta = _write(table_dir(name), df, date_col, symbol_col, source)
+    shutil.rmtree(segments_dir(name), ignore_errors=True)
+    _cache.pop(name, None)
+    return meta
+
+def append(name, df, date_col="date", symbol_col="symbol", source=None):
+    """Add df as a new segment; rows override earlier ones with the same (date, symbol).
+
+    Writes only df's rows; source (if given) becomes the table's source
+    watermark. The caller holds lock(name).
+    """
+    if not os.path.exists(os.path.join(table_dir(name), "meta.json")):
+        return write_table(name, df, date_col, symbol_col, source)
+
+    segs = _segment_names(name)
+    seq = int(segs[-1]) + 1 if segs else 0
+    meta = _write(os.path.join(segments_dir(name), f"{seq:06d}"), df, date_col, symbol_col, source)
+    _cache.pop(name, None)
+    if len(segs) + 1 > MAX_SEGMENTS:
+        compact(name)
+    return meta
+
+def compact(name):
+    """Fold all append segments back into the main table."""
+    with lock(name):
+        t = open_table(name)
+        if t is None or not _segment_names(name):
+            return None
+        return write_table(name, t.query(), source=t.meta.get("source"))
+
+def _write(final, df, date_col="date", symbol_col="symbol", source=None):
+    d = df.copy()
+    d["_day"] = _to_days(d[date_col])
+    d = d.sort_values(["_day"], kind="stable").reset_index(drop=True)
+
+    symbols = sorted(d[symbol_col].astype(str).unique())
+    codes = pd.Categorical(d[symbol_col].astype(str), categories=symbols).codes.astype(np.int32)
+
+    tmp = f"{final}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = {}
+    np.save(os.path.join(tmp, "date.npy"), d["_day"].to_numpy(np.int64))
+    np.save(os.path.join(tmp, "symbol.npy"), codes)
+
+    for col in d.columns:
+        if col in (date_col, symbol_col, "_day"):
+            continue
+        s = d[col]
+        # 全為 None 的欄位（如未結算的 real_ret / hit）存成 NaN，不可當成 bool（NaN 會變 False）
+        if s.dtype == object and s.isna().all() and not col.endswith("date"):
+            arr = np.full(len(s), np.nan)
+        elif s.dtype == bool or s.dtype == object and s.notna().any() and s.dropna().isin([True, False]).all():
+            arr = s.fillna(False).astype(bool).to_numpy()
+        elif pd.api.types.is_integer_dtype(s):
+            arr = s.to_numpy(np.int64)
+        elif pd.api.types.is_numeric_dtype(s):
+            arr = s.to_numpy(np.float64)
+        elif col.endswith("date"):
+            arr = pd.to_datetime(s, errors="coerce").to_numpy("datetime64[D]").astype(np.int64)
+            columns[col] = "date"
+            np.save(os.path.join(tmp, f"{col}.npy"), arr)
+            continue
+        else:
+            continue  # 非數值文字欄位不進 columnar
+        columns[col] = str(arr.dtype)
+        np.save(os.path.join(tmp, f"{col}.npy"), arr)
+
+    # 每個 symbol 的列號（依日期），以 offsets 切片
+    order = np.lexsort((d["_day"].to_numpy(), codes)).astype(np.int64)
+    offsets = np.searchsorted(codes[order], np.arange(len(symbols) + 1)).astype(np.int64)
+    np.save(os.path.join(tmp, "sym_rows.npy"), order)
+    np.save(os.path.join(tmp, "sym_dates.npy"), d["_day"].to_numpy(np.int64)[order])
+    np.save(os.path.join(tmp, "sym_offsets.npy"), offsets)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "rows": int(len(d)),
+        "columns": columns,
+        "symbols": symbols,
+        "source": source,
+    }
+    json.dump(meta, open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8"), indent=2)
+
+    old = f"{final}.old{os.getpid()}"
+    if os.path.exists(final):
+        os.replace(final, old)
+    os.replace(tmp, final)
+    shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+# ===============================
+# Read（memory-mapped）
+# ===============================
+class Table:
+    def __init__(self, name, path=None):
+        self.name = name
+        self.path = path or table_dir(name)
+        self.meta = json.load(open(os.path.join(self.path, "meta.json"), "r", encoding="utf-8"))
+        self.symbols = self.meta["symbols"]
+        self._code = {s: i for i, s in enumerate(self.symbols)}
+        self._cols = {}
+
+        self.date = self._load("date")
+        self.symbol = self._load("symbol")
+        self.sym_rows = self._load("sym_rows")
+        self.sym_dates = self._load("sym_dates")
+        self.sym_offsets = np.load(os.path.join(self.path, "sym_offsets.npy"))
+
+    def _load(self, col):
+        if col not in self._cols:
+            self._cols[col] = np.load(os.path.join(self.path, f"{col}.npy"), mmap_mode="r")
+        return self._cols[col]
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def _rows(self, symbols, lo_day, hi_day):
+        if symbols is None:
+            # 全表依日期排序 → 二分搜尋得到連續區段，只觸及該區段頁面
+            lo = np.searchsorted(self.date, lo_day, "left")
+            hi = np.searchsorted(self.date, hi_day, "right")
+            return slice(lo, hi)
+
+        parts = []
+        for s in symbols:
+            c = self._code.get(str(s))
+            if c is None:
+                continue
+            a, b = self.sym_offsets[c], self.sym_offsets[c + 1]
+            dates = self.sym_dates[a:b]
+            lo = a + np.searchsorted(dates, lo_day, "left")
+            hi = a + np.searchsorted(dates, hi_day, "right")
+            parts.append(np.asarray(self.sym_rows[lo:hi]))
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts))
+
+    def query(self, symbols=None, start=None, end=None, columns=None, where=None):
+        lo_day = _to_days([start])[0] if start is not None else np.iinfo(np.int64).min
+        hi_day = _to_days([end])[0] if end is not None else np.iinfo(np.int64).max
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        rows = self._rows(symbols, lo_day, hi_day)
+        cols = columns or list(self.meta["columns"])
+
+        out = {
+            "date": np.asarray(self.date[rows]).astype("datetime64[D]"),
+            "symbol": np.asarray(self.symbols, dtype=object)[np.asarray(self.symbol[rows])]
+            if len(self.symbols) else np.empty(0, dtype=object),
+        }
+        for c in cols:
+            arr = np.asarray(self._load(c)[rows])
+            if self.meta["columns"].get(c) == "date":
+                arr = arr.astype("datetime64[D]")
+            out[c] = arr
+        df = pd.DataFrame(out)
+
+        if where:
+            for c, v in where.items():
+                df = df[df[c] == v]
+        return df.reset_index(drop=True)
+
+class SegmentedTable:
+    """Main table + append segments, merged per query (later segments win)."""
+
+    def __init__(self, name, segments):
+        self.name = name
+        self.base = Table(name)
+        self.parts = [self.base] + [
+            Table(name, os.path.join(segments_dir(name), s)) for s in segments
+        ]
+        # 來源水位以最後寫入者為準（append 可帶新的 source）
+        sources = [p.meta.get("source") for p in self.parts if p.meta.get("source") is not None]
+        self.meta = dict(self.base.meta, source=sources[-1] if sources else None)
+        self.symbols = sorted(set().union(*(p.symbols for p in self.parts)))
+
+    def __len__(self):
+        return sum(len(p) for p in self.parts)
+
+    def query(self, symbols=None, start=None, end=None, columns=None, where=None):
+        frames = []
+        for p in self.parts:
+            cols = None if columns is None else [c for c in columns if c in p.meta["columns"]]
+            frames.append(p.query(symbols=symbols, start=start, end=end, columns=cols))
+        df = pd.concat([f for f in frames if not f.empty] or frames[:1], ignore_index=True)
+        df = df.drop_duplicates(["date", "symbol"], keep="last").sort_values("date", kind="stable")
+        if columns is not None:
+            df = df.reindex(columns=["date", "symbol"] + list(columns))
+
+        if where:
+            for c, v in where.items():
+                df = df[df[c] == v]
+        return df.reset_index(drop=True)
+
+def version(name):
+    """Changes whenever the table is rewritten or gains a segment; None if absent."""
+    meta = os.path.join(table_dir(name), "meta.json")
+    if not os.path.exists(meta):
+        return None
+    segs = _segment_names(name)
+    return f"{os.path.getmtime(meta)}:{segs[-1] if segs else ''}"
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def open_table(name):
+    """Cached Table handle; reopened when the table is rebuilt or appended to."""
+    for attempt in range(3):
+        stamp = version(name)
+        if stamp is None:
+            return None
+        with _cache_lock:
+            hit = _cache.get(name)
+            if hit and hit[0] == stamp:
+                return hit[1]
+        try:
+            segs = _segment_names(name)
+            t = SegmentedTable(name, segs) if segs else Table(name)
+        except FileNotFoundError:
+            continue  # 壓實中（區段剛被併回主表），重新讀取
+        with _cache_lock:
+            _cache[name] = (stamp, t)
+        return t
+    return None
@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
+
+from scripts import history, market_registry
+from scripts.trading_calendar import last_closed_session
+
+# ===============================
+# Config
+# ===============================
+STATE_DIR = os.path.join(DATA_DIR, "contagion")   # 可由價格庫重建，不進版控
+
+HALFLIFE = 60          # 交易日
+WARM_DAYS = 400        # 冷啟動時回補的日曆天數
+MIN_OBS = 40           # 少於此觀測數的標的不列入鄰居
+TOP_K = 5
+MIN_COVERAGE = 0.5     # 最新 bar 有報價的標的比例低於此值時先不併入（盤中 / 資料未齊）
+
+# 狀態格式改變時遞增，舊狀態重建
+STATE_VERSION = 2
+
+def state_file(code):
+    return os.path.join(STATE_DIR, f"{code}.npz")
+
+# ===============================
+# EW Covariance（每根 bar O(n²) 更新）
+# ===============================
+class EWCov:
+    """Exponentially weighted mean / covariance of daily returns.
+
+    `update` folds one bar into the saved state (rank-1 update over the
+    symbols observed that day), so the full matrix never has to be
+    recomputed from the price history.
+    """
+
+    def __init__(self, symbols, halflife=HALFLIFE):
+        self.symbols = list(symbols)
+        self.col = {s: i for i, s in enumerate(self.symbols)}
+        self.lam = 0.5 ** (1.0 / halflife)
+        self.halflife = halflife
+
+        n = len(self.symbols)
+        self.mean = np.zeros(n)
+        self.cov = np.zeros((n, n))
+        self.obs = np.zeros(n, dtype=np.int64)
+        self.last = np.full(n, np.nan)
+        self.last_date = None
+
+    def remap(self, symbols):
+        """Re-key the state to a new symbol list (order-free).
+
+        Kept symbols carry their rows over, new symbols start cold,
+        removed symbols are dropped.
+        """
+        symbols = list(symbols)
+        if symbols == self.symbols:
+            return self
+        out = EWCov(symbols, self.halflife)
+        out.last_date = self.last_date
+        src = np.array([self.col.get(s, -1) for s in symbols], dtype=np.int64)
+        keep = np.flatnonzero(src >= 0)
+        old = src[keep]
+        out.mean[keep] = self.mean[old]
+        out.obs[keep] = self.obs[old]
+        out.last[keep] = self.last[old]
+        out.cov[np.ix_(keep, keep)] = self.cov[np.ix_(old, old)]
+        return out
+
+    def update(self, close, day=None):
+        """Fold one bar of closes (N-vector, NaN = no trade) into the state."""
+        close = np.asarray(close, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret = close / self.last - 1
+        ok = ~np.isnan(ret)
+        self.last = np.where(np.isnan(close), self.last, close)
+        self.last_date = day or self.last_date
+        if not ok.any():
+            return
+
+        lam = self.lam
+        if ok.all():
+            d = ret - self.mean
+            self.mean += (1 - lam) * d
+            self.cov *= lam
+            self.cov += lam * (1 - lam) * np.outer(d, d)
+        else:
+            ix = np.flatnonzero(ok)
+            d = ret[ix] - self.mean[ix]
+            self.mean[ix] += (1 - lam) * d
+            sub = np.ix_(ix, ix)
+            self.cov[sub] = lam * (self.cov[sub] + (1 - lam) * np.outer(d, d))
+        self.obs += ok
+
+    def corr(self):
+        sd = np.sqrt(np.diag(self.cov))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            c = self.cov / np.outer(sd, sd)
+        return np.nan_to_num(c)
+
+    def neighbors(self, symbol, k=TOP_K, min_obs=MIN_OBS):
+        """Top-k most correlated symbols as [(symbol, corr), ...]."""
+        i = self.col.get(symbol)
+        if i is None or self.obs[i] < min_obs:
+            return []
+        sd = np.sqrt(np.diag(self.cov))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            row = self.cov[i] / (sd[i] * sd)
+        row[(self.obs < min_obs) | ~np.isfinite(row)] = -np.inf
+        row[i] = -np.inf
+
+        k = min(k, int(np.isfinite(row).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-row, k - 1)[:k]
+        top = top[np.argsort(-row[top])]
+        return [(self.symbols[j], round(float(row[j]), 3)) for j in top]
+
+    # ===============================
+    # Persistence
+    # ===============================
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {"version": STATE_VERSION, "halflife": self.halflife, "last_date": self.last_date}
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                symbols=np.array(self.symbols),
+                mean=self.mean,
+                cov=self.cov,
+                obs=self.obs,
+                last=self.last,
+                meta=np.array(json.dumps(meta)),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return None
+        z = np.load(path, allow_pickle=False)
+        meta = json.loads(str(z["meta"]))
+        if meta.get("version") != STATE_VERSION:
+            return None
+        ew = cls(z["symbols"].tolist(), meta["halflife"])
+        ew.mean, ew.cov, ew.obs, ew.last = z["mean"], z["cov"], z["obs"], z["last"]
+        ew.last_date = meta["last_date"]
+        return ew
+
+# ===============================
+# Market State（由價格庫增量更新）
+# ===============================
+def _bars(code, symbols, start, end):
+    px = history.ensure_prices(code, symbols, start, end, columns=["Close"])
+    if px.empty:
+        return pd.DataFrame(columns=symbols)
+    px["date"] = pd.to_datetime(px["date"]).dt.normalize()
+    return px.pivot_table(index="date", columns="symbol", values="Close").reindex(columns=symbols)
+
+def _complete(bars, min_coverage=MIN_COVERAGE):
+    """Drop trailing bars that most symbols do not have yet (partial / intraday)."""
+    seen = bars.notna().any().to_numpy()
+    if not seen.any():
+        return bars.iloc[:0]
+    coverage = bars.loc[:, seen].notna().mean(axis=1).to_numpy()
+    ok = np.flatnonzero(coverage >= min_coverage)
+    return bars.iloc[:ok[-1] + 1] if len(ok) else bars.iloc[:0]
+
+def update_market(code, today=None):
+    """Fold new daily bars into the market's saved state (keyed by symbol)."""
+    today = today or last_closed_session(code)
+    symbols = [s for s in market_registry.watch_list(code) if s != market_registry.get(code)["vix"]]
+    path = state_file(code)
+    ew = EWCov.load(path)
+
+    if ew is None or ew.halflife != HALFLIFE or ew.last_date is None:
+        # 冷啟動或格式 / 參數改變：由價格庫回補
+        ew = EWCov(symbols)
+        start = today - timedelta(days=WARM_DAYS)
+    else:
+        # 股池變動只增減列，新標的由冷狀態開始累積
+        ew = ew.remap(symbols)
+        start = pd.Timestamp(ew.last_date).date() + timedelta(days=1)
+        if start > today:
+            return ew
+
+    bars = _complete(_bars(code, symbols, start, today))
+    for day, row in zip(bars.index, bars.to_numpy(np.float64)):
+        ew.update(row, day.date().isoformat())
+    ew.save(path)
+    print(f"[Contagion][{code}] {len(symbols)} symbols, +{len(bars)} bars → {ew.last_date}")
+    return ew
+
+# ===============================
+# Query
+# ===============================
+_loaded = {}
+
+def load(code):
+    """Saved state for a market, re-read only when the file changed."""
+    path = state_file(code)
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    hit = _loaded.get(code)
+    if hit is None or hit[0] != mtime:
+        _loaded[code] = (mtime, EWCov.load(path))
+    return _loaded[code][1]
+
+def neighbors(symbol, k=TOP_K):
+    ew = load(market_registry.market_of(symbol))
+    return ew.neighbors(symbol, k) if ew else []
+
+if __name__ == "__main__":
+    for c in sys.argv[1:] or market_registry.codes():
+        update_market(c)
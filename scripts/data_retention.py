@@ -0,0 +1,225 @@
+import io
+import os
+import sys
+import json
+import gzip
+import glob
+from datetime import datetime, timezone
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
+
+# ===============================
+# Layout
+#   data/<name>.csv / .jsonl                 熱區段（當月 + 尚未可封存的資料）
+#   data/archive/<name>/<YYYY-MM>.csv.gz     封存後不再改寫的月區段
+#   data/archive/<name>/<YYYY-MM>.<n>.csv.gz 月份封存後才補進 / 修改的列（後者優先）
+# ===============================
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+FORCE_SEAL_MONTHS = 3     # 超過此月數仍未結算的預測也封存；之後的結算以補充區段寫入
+
+def archive_dir(path):
+    name = os.path.basename(path).split(".")[0]
+    return os.path.join(ARCHIVE_DIR, name)
+
+def segments(path):
+    """Sealed segment files of a hot file, oldest first."""
+    ext = os.path.splitext(path)[1]
+    files = glob.glob(os.path.join(archive_dir(path), f"*{ext}.gz"))
+    return sorted(files, key=lambda f: _segment_key(os.path.basename(f)))
+
+def _segment_key(fname):
+    month, _, rest = fname.partition(".")
+    part = rest.split(".")[0]
+    return month, int(part) if part.isdigit() else 0
+
+def sealed_months(path):
+    return {_segment_key(os.path.basename(f))[0] for f in segments(path)}
+
+# ===============================
+# Reader（透明跨越所有區段）
+# ===============================
+def read_csv(path, months=None, **kwargs):
+    """Sealed segments + hot file as one DataFrame (kwargs go to pd.read_csv).
+
+    months: optional iterable of "YYYY-MM" to restrict which sealed
+    segments are opened; the hot file is always included.
+    """
+    wanted = set(months) if months is not None else None
+    frames = [
+        pd.read_csv(f, **kwargs) for f in segments(path)
+        if wanted is None or _segment_key(os.path.basename(f))[0] in wanted
+    ]
+    if os.path.exists(path) and os.path.getsize(path) > 1:
+        frames.append(pd.read_csv(path, **kwargs))
+    frames = [f for f in frames if not f.empty] or frames[-1:]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+def read_jsonl(path):
+    """Records of all segments + the hot file, oldest first."""
+    out = []
+    for f in segments(path):
+        with gzip.open(f, "rt", encoding="utf-8") as fh:
+            out += [json.loads(l) for l in fh if l.strip()]
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as fh:
+            out += [json.loads(l) for l in fh if l.strip()]
+    return out
+
+# ===============================
+# Export（封存月份的新列 / 修改列留在熱區段，下次壓實成補充區段）
+# ===============================
+def _canon(df):
+    """Text frame with numbers normalised ("1" == "1.0"), for row comparison."""
+    out = df.astype(str)
+    for c in out.columns:
+        num = pd.to_numeric(out[c], errors="coerce").astype(float)
+        out[c] = num.map(lambda v: repr(float(v))).where(num.notna(), out[c].str.strip().str.lower())
+    return out
+
+def _occurrences(df):
+    """Row tuples + running count, so identical rows are matched one-to-one."""
+    df = df.copy()
+    df["_n"] = df.groupby(list(df.columns), sort=False).cumcount()
+    return pd.MultiIndex.from_frame(df)
+
+def _as_text(df):
+    """df as it reads back from CSV (all str, blanks for NaN)."""
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)), dtype=str, keep_default_na=False)
+
+def missing_rows(df, present):
+    """Rows of df with no value-equal counterpart in present (matched one-to-one)."""
+    if df.empty or present.empty:
+        return df
+    text = _as_text(df)
+    done = _occurrences(_canon(_as_text(present).reindex(columns=text.columns, fill_value="")))
+    return df[~_occurrences(_canon(text)).isin(done)]
+
+def hot_rows(path, df):
+    """Rows of a full export whose values are not already sealed in path's archive."""
+    segs = segments(path)
+    if df.empty or not segs:
+        return df
+    sealed = pd.concat([pd.read_csv(f, dtype=str, keep_default_na=False) for f in segs], ignore_index=True)
+    return missing_rows(df, sealed)
+
+# ===============================
+# Compaction
+# ===============================
+def _month_of(v):
+    if isinstance(v, (int, float)):
+        return datetime.fromtimestamp(v, timezone.utc).strftime("%Y-%m")
+    s = str(v)
+    return s[:7] if len(s) >= 7 and s[4] == "-" else None
+
+def _months_between(a, b):
+    return (int(b[:4]) - int(a[:4])) * 12 + int(b[5:7]) - int(a[5:7])
+
+def _write_segment(path, month, text):
+    """Write a new immutable segment (deterministic gzip: identical rows → identical bytes)."""
+    d = archive_dir(path)
+    os.makedirs(d, exist_ok=True)
+    ext = os.path.splitext(path)[1]
+    n = sum(1 for f in segments(path) if _segment_key(os.path.basename(f))[0] == month)
+    target = os.path.join(d, f"{month}{ext}.gz" if n == 0 else f"{month}.{n}{ext}.gz")
+
+    tmp = target + ".tmp"
+    with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0, filename="") as gz:
+        gz.write(text.encode("utf-8"))
+    os.replace(tmp, target)
+    return target
+
+def _replace(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def compact_csv(path, time_col, sealable=None, today=None):
+    """Move finished months out of a hot CSV; returns the sealed months.
+
+    Rows of an already-sealed month become a <month>.<n> amendment segment.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) <= 1:
+        return []
+    # 全部以文字讀寫，封存內容與原檔逐字相同
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    if df.empty or time_col not in df.columns:
+        return []
+
+    current = (today or datetime.now()).strftime("%Y-%m")
+    month = df[time_col].map(_month_of)
+    sealed = []
+    for m, rows in df.groupby(month, sort=True):
+        if m >= current:
+            continue
+        forced = _months_between(m, current) > FORCE_SEAL_MONTHS
+        if sealable is not None and not forced and not sealable(rows):
+            continue
+        _write_segment(path, m, rows.to_csv(index=False, lineterminator="\n"))
+        sealed.append(m)
+
+    if sealed:
+        _replace(path, df[~month.isin(sealed)].to_csv(index=False, lineterminator="\n"))
+    return sealed
+
+def compact_jsonl(path, time_key="ts", today=None):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [l for l in f.read().splitlines() if l.strip()]
+
+    current = (today or datetime.now()).strftime("%Y-%m")
+    by_month, keep = {}, []
+    for l in lines:
+        m = _month_of(json.loads(l).get(time_key))
+        if m is not None and m < current:
+            by_month.setdefault(m, []).append(l)
+        else:
+            keep.append(l)
+
+    for m, rows in sorted(by_month.items()):
+        _write_segment(path, m, "\n".join(rows) + "\n")
+    if by_month:
+        _replace(path, "".join(l + "\n" for l in keep))
+    return sorted(by_month)
+
+def _all_settled(rows):
+    return rows["settled"].str.strip().str.lower().isin(["1", "1.0", "true"]).all()
+
+# ===============================
+# Datasets
+# ===============================
+def datasets():
+    """(hot file, time column, sealable) for every append-only log under data/."""
+    from scripts import history_store, metrics_materializer
+
+    out = [(p, "date", _all_settled) for p in history_store.HISTORY_CSV.values()]
+    out.append((history_store.OBSERVATION_CSV, "settle_date", None))
+    out += [(p, "date", None) for p in metrics_materializer.METRICS_FILES.values()]
+    out.append((os.path.join(DATA_DIR, "black_swan_history.csv"), "datetime", None))
+    return out
+
+def compact_all(today=None):
+    from scripts import risk_state
+
+    report = {}
+    for path, col, sealable in datasets():
+        report[os.path.basename(path)] = compact_csv(path, col, sealable, today)
+
+    # 轉換紀錄由 risk_state 的檔案鎖保護
+    with risk_state.transaction("data_retention"):
+        report[os.path.basename(risk_state.LOG_FILE)] = compact_jsonl(risk_state.LOG_FILE, "ts", today)
+
+    for name, months in report.items():
+        if months:
+            print(f"[Retention] {name}: sealed {', '.join(months)}")
+    return report
+
+if __name__ == "__main__":
+    compact_all()
@@ -0,0 +1,410 @@
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import shutil
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# ===============================
+# Base / Outbox
+# ===============================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+# ⚠️ Outbox 內含 webhook URL，不可放在會被 commit 的 data/ 底下
+OUTBOX_DIR = os.getenv("DISCORD_OUTBOX_DIR", os.path.join(BASE_DIR, ".outbox"))
+FAILED_DIR = os.path.join(OUTBOX_DIR, "failed")
+
+# ===============================
+# Discord Limits
+# ===============================
+MAX_CONTENT = 2000
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+REQUEST_TIMEOUT = 15
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SEC = 30
+FLUSH_TIMEOUT = float(os.getenv("DISCORD_FLUSH_TIMEOUT", "60"))
+
+# ===============================
+# Pooled Session
+# ===============================
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+# ===============================
+# Rate Limiter（Discord bucket headers）
+# ===============================
+class RateLimiter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bucket_of = {}      # webhook -> bucket id
+        self._buckets = {}        # bucket id -> {"remaining", "reset_at"}
+        self._global_until = 0.0
+
+    def _key(self, webhook):
+        return self._bucket_of.get(webhook, webhook)
+
+    def delay(self, webhook):
+        now = time.monotonic()
+        with self._lock:
+            wait = max(0.0, self._global_until - now)
+            b = self._buckets.get(self._key(webhook))
+            if b and b["remaining"] <= 0 and b["reset_at"] > now:
+                wait = max(wait, b["reset_at"] - now)
+        return wait
+
+    def wait(self, webhook):
+        d = self.delay(webhook)
+        if d > 0:
+            time.sleep(d)
+
+    def update(self, webhook, resp):
+        h = resp.headers
+        now = time.monotonic()
+        with self._lock:
+            bucket = h.get("X-RateLimit-Bucket")
+            if bucket:
+                self._bucket_of[webhook] = bucket
+            key = self._key(webhook)
+
+            remaining = h.get("X-RateLimit-Remaining")
+            reset_after = h.get("X-RateLimit-Reset-After")
+            if remaining is not None and reset_after is not None:
+                self._buckets[key] = {
+                    "remaining": int(float(remaining)),
+                    "reset_at": now + float(reset_after),
+                }
+
+            if resp.status_code == 429:
+                retry_after = _retry_after(resp)
+                is_global = (
+                    h.get("X-RateLimit-Global", "").lower() == "true"
+                    or h.get("X-RateLimit-Scope") == "global"
+                )
+                if is_global:
+                    self._global_until = now + retry_after
+                else:
+                    self._buckets[key] = {"remaining": 0, "reset_at": now + retry_after}
+
+def _retry_after(resp):
+    try:
+        return float(resp.json().get("retry_after", 1.0))
+    except Exception:
+        pass
+    try:
+        return float(resp.headers.get("Retry-After", 1.0))
+    except Exception:
+        return 1.0
+
+limiter = RateLimiter()
+
+# ===============================
+# Message Packing
+# ===============================
+def embed_chars(e):
+    n = len(e.get("title", "")) + len(e.get("description", ""))
+    n += len(e.get("footer", {}).get("text", ""))
+    n += len(e.get("author", {}).get("name", ""))
+    for f in e.get("fields", []):
+        n += len(f.get("name", "")) + len(f.get("value", ""))
+    return n
+
+def split_content(text, limit=MAX_CONTENT):
+    chunks, cur = [], ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            if cur:
+                chunks.append(cur)
+                cur = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if len(cur) + len(line) > limit:
+            chunks.append(cur)
+            cur = ""
+        cur += line
+    if cur.strip():
+        chunks.append(cur)
+    return chunks
+
+def pack(content=None, embeds=None):
+    """Split content/embeds into the fewest payloads Discord accepts."""
+    payloads = [{"content": c} for c in split_content(content or "")]
+
+    groups, cur, cur_chars = [], [], 0
+    for e in embeds or []:
+        n = embed_chars(e)
+        if cur and (len(cur) >= MAX_EMBEDS or cur_chars + n > MAX_EMBED_CHARS):
+            groups.append(cur)
+            cur, cur_chars = [], 0
+        cur.append(e)
+        cur_chars += n
+    if cur:
+        groups.append(cur)
+
+    # 最後一段文字與第一組 embeds 合併成同一則訊息
+    if payloads and groups:
+        payloads[-1]["embeds"] = groups.pop(0)
+    payloads += [{"embeds": g} for g in groups]
+    return payloads
+
+def _mergeable(webhook, embeds, rec):
+    if rec["webhook"] != webhook or rec.get("file"):
+        return False
+    p = rec["payload"]
+    if p.get("content"):
+        return False
+    merged = embeds + p.get("embeds", [])
+    return (
+        len(merged) <= MAX_EMBEDS
+        and sum(map(embed_chars, merged)) <= MAX_EMBED_CHARS
+    )
+
+# ===============================
+# Persistent Outbox
+# ===============================
+def _record_path(rid):
+    return os.path.join(OUTBOX_DIR, f"{rid}.json")
+
+def _write_atomic(path, obj):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def enqueue(webhook, payload, file_path=None):
+    os.makedirs(OUTBOX_DIR, exist_ok=True)
+    rid = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    rec = {
+        "id": rid,
+        "webhook": webhook,
+        "payload": payload,
+        "file": None,
+        "attempts": 0,
+        "next_try": 0,
+    }
+    if file_path and os.path.exists(file_path):
+        # 複製附件，避免送出前被下一次渲染覆蓋
+        stored = os.path.join(OUTBOX_DIR, f"{rid}{os.path.splitext(file_path)[1]}")
+        shutil.copyfile(file_path, stored)
+        rec["file"] = stored
+    _write_atomic(_record_path(rid), rec)
+    return rid
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+def _claim_pending():
+    """Claim deliverable records by renaming them to <id>.json.<pid>."""
+    if not os.path.isdir(OUTBOX_DIR):
+        return [], None
+
+    now = time.time()
+    pid = os.getpid()
+    claimed, next_due = [], None
+
+    # 前次執行中斷留下的 claim → 先釋放回 outbox，本輪即可重送
+    for name in os.listdir(OUTBOX_DIR):
+        if ".json." in name and not name.endswith(".tmp"):
+            owner = name.rsplit(".", 1)[-1]
+            if owner.isdigit() and int(owner) != pid and not _pid_alive(int(owner)):
+                path = os.path.join(OUTBOX_DIR, name)
+                try:
+                    os.replace(path, path.rsplit(".", 1)[0])
+                except OSError:
+                    pass
+
+    for name in sorted(os.listdir(OUTBOX_DIR)):
+        path = os.path.join(OUTBOX_DIR, name)
+        if not name.endswith(".json"):
+            continue
+
+        try:
+            rec = json.load(open(path, "r", encoding="utf-8"))
+        except Exception:
+            continue
+
+        if rec.get("next_try", 0) > now:
+            next_due = min(next_due or rec["next_try"], rec["next_try"])
+            continue
+
+        try:
+            os.replace(path, f"{path}.{pid}")
+        except OSError:
+            continue  # 被其他 process 搶先
+        claimed.append(rec)
+
+    return claimed, next_due
+
+def _release(rec, ok, permanent=False):
+    pid = os.getpid()
+    claimed = f"{_record_path(rec['id'])}.{pid}"
+
+    if ok:
+        for p in (claimed, rec.get("file")):
+            if p and os.path.exists(p):
+                os.remove(p)
+        return
+
+    rec["attempts"] += 1
+    if permanent or rec["attempts"] >= MAX_ATTEMPTS:
+        os.makedirs(FAILED_DIR, exist_ok=True)
+        _write_atomic(os.path.join(FAILED_DIR, f"{rec['id']}.json"), rec)
+        if os.path.exists(claimed):
+            os.remove(claimed)
+        print(f"[WARN] Discord delivery dropped: {rec['id']}")
+        return
+
+    rec["next_try"] = time.time() + RETRY_BACKOFF_SEC * rec["attempts"]
+    _write_atomic(_record_path(rec["id"]), rec)
+    if os.path.exists(claimed):
+        os.remove(claimed)
+
+# ===============================
+# Delivery
+# ===============================
+def post(webhook, payload, file_path=None):
+    """Deliver one payload synchronously. Returns "ok", "retry" or "drop"."""
+    session = get_session()
+
+    for _ in range(MAX_ATTEMPTS):
+        limiter.wait(webhook)
+        try:
+            if file_path and os.path.exists(file_path):
+                with open(file_path, "rb") as f:
+                    resp = session.post(
+                        webhook,
+                        data={"payload_json": json.dumps(payload)},
+                        files={"file": (os.path.basename(file_path), f)},
+                        timeout=REQUEST_TIMEOUT,
+                    )
+            else:
+                resp = session.post(webhook, json=payload, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"[WARN] Discord unavailable: {e}")
+            return "retry"
+
+        limiter.update(webhook, resp)
+
+        if resp.status_code == 429:
+            continue
+        if resp.status_code < 300:
+            return "ok"
+        if resp.status_code >= 500:
+            return "retry"
+
+        print(f"[WARN] Discord rejected message: HTTP {resp.status_code}")
+        return "drop"
+
+    return "retry"
+
+def _deliver(records):
+    i = 0
+    while i < len(records):
+        head = records[i]
+        group = [head]
+
+        # 合併同一 webhook 連續的純 embed 訊息
+        if not head.get("file") and not head["payload"].get("content"):
+            embeds = list(head["payload"].get("embeds", []))
+            while i + len(group) < len(records):
+                nxt = records[i + len(group)]
+                if not _mergeable(head["webhook"], embeds, nxt):
+                    break
+                embeds += nxt["payload"].get("embeds", [])
+                group.append(nxt)
+            payload = {"embeds": embeds} if len(group) > 1 else head["payload"]
+        else:
+            payload = head["payload"]
+
+        result = post(head["webhook"], payload, head.get("file"))
+        for r in group:
+            _release(r, result == "ok", permanent=result == "drop")
+        i += len(group)
+
+# ===============================
+# Async Drain Worker
+# ===============================
+_wakeup = threading.Condition()
+_idle = threading.Event()
+_signaled = False
+_worker = None
+
+def _drain_loop():
+    global _signaled
+    while True:
+        with _wakeup:
+            _signaled = False
+
+        records, next_due = _claim_pending()
+        if records:
+            _deliver(records)
+            continue
+
+        timeout = None if next_due is None else max(0.1, next_due - time.time())
+        with _wakeup:
+            if _signaled:
+                continue
+            _idle.set()
+            _wakeup.wait(timeout)
+
+def _kick():
+    global _worker, _signaled
+    with _wakeup:
+        _signaled = True
+        _idle.clear()
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_drain_loop, name="discord-outbox", daemon=True)
+            _worker.start()
+        _wakeup.notify_all()
+
+def send(webhook, content=None, embeds=None, file_path=None):
+    """Queue a message for asynchronous delivery; never raises on Discord errors."""
+    if not webhook:
+        return 0
+
+    payloads = pack(content, embeds)
+    for i, p in enumerate(payloads):
+        enqueue(webhook, p, file_path if i == 0 else None)
+
+    _kick()
+    return len(payloads)
+
+def flush(timeout=FLUSH_TIMEOUT):
+    """Wait until the outbox has nothing deliverable right now."""
+    if not os.path.isdir(OUTBOX_DIR):
+        return True
+    _kick()
+    return _idle.wait(timeout)
+
+def pending_count():
+    if not os.path.isdir(OUTBOX_DIR):
+        return 0
+    return sum(1 for n in os.listdir(OUTBOX_DIR) if n.endswith(".json"))
+
+# 結束前盡量送完；未送出的留在 outbox，下次執行再補送
+atexit.register(flush)
+
+if __name__ == "__main__":
+    ok = flush()
+    print(f"📮 Discord outbox drained={ok} pending={pending_count()}")
@@ -1,31 +1,24 @@
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
 
-OBS = os.path.join(DATA_DIR, "forecast_observation.csv")
+from scripts import history_store, chart_renderer, market_registry
 
-def draw(market: str, out_png: str):
-    if not os.path.exists(OBS):
-        return
-
-    df = pd.read_csv(OBS)
-    df = df[df["market"] == market]
+def chart(market: str, out_png: str):
+    df = history_store.read_observations(market)
     if df.empty:
-        return
+        return None
 
     df["cum"] = (1 + df["real_ret"]).cumprod()
+    return {"path": out_png, "values": df["cum"].to_numpy(), "title": f"{market} Equity Curve (all)"}
 
-    plt.figure(figsize=(8,4))
-    plt.plot(df["cum"])
-    plt.title(f"{market} Equity Curve")
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig(out_png)
-    plt.close()
+def draw_all(targets):
+    specs = [c for c in (chart(m, p) for m, p in targets) if c]
+    return chart_renderer.render(specs)
 
 if __name__ == "__main__":
-    draw("TW", os.path.join(DATA_DIR, "equity_TW.png"))
-    draw("US", os.path.join(DATA_DIR, "equity_US.png"))
+    # 全部歷史；performance_dashboard 的 equity_{m}.png 只畫最近視窗，兩者檔名分開
+    draw_all([(m, os.path.join(DATA_DIR, f"equity_{m}_all.png")) for m in market_registry.codes()])
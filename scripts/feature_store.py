@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import inspect
+import threading
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from scripts import columnar_store, market_registry
+
+# ===============================
+# Feature Definitions（唯一來源；ai_engine.features 亦使用）
+#   每個函式吃 close / volume（Series 或 date × symbol DataFrame），回傳同形狀
+# ===============================
+def mom20(close, volume):
+    return close.pct_change(20, fill_method=None)
+
+def bias(close, volume):
+    ma = close.rolling(20).mean()
+    return (close - ma) / ma
+
+def vol_ratio(close, volume):
+    return volume / volume.rolling(20).mean()
+
+DEFINITIONS = {f.__name__: f for f in (mom20, bias, vol_ratio)}
+HORIZONS = (1, 3, 5, 10, 20)
+FORMAT_VERSION = 1
+
+def label(close, horizon):
+    return close.shift(-horizon) / close - 1
+
+def horizons_for(code):
+    """Standard label horizons plus the market's own prediction horizon."""
+    return tuple(sorted(set(HORIZONS) | {int(market_registry.get(code)["horizon"])}))
+
+def definition_hash(horizons=HORIZONS):
+    """Changes whenever a feature's code, the label horizons or the layout change."""
+    h = hashlib.sha1(f"v{FORMAT_VERSION}|{sorted(horizons)}".encode())
+    for name, fn in DEFINITIONS.items():
+        h.update(name.encode())
+        h.update(inspect.getsource(fn).encode())
+    h.update(inspect.getsource(label).encode())
+    return h.hexdigest()[:12]
+
+# ===============================
+# Layout（data/columnar/features_<code>/<hash>/，可重建，不進 git）
+#   meta.json    日期 / symbols / 特徵 / horizons / 來源水位
+#   X.npy        float32 [date, symbol, feature]
+#   valid.npy    bool    [date, symbol]（該標的當日有成交）
+#   y_<h>.npy    float32 [date, symbol] 未來 h 個交易日報酬
+# ===============================
+def store_dir(code):
+    return os.path.join(columnar_store.COLUMNAR_DIR, f"features_{code}")
+
+def _source_key(code):
+    return columnar_store.version(f"prices_{code}")
+
+# ===============================
+# Build
+# ===============================
+def _interior_holes(valid):
+    """Columns whose traded days are not one contiguous block."""
+    first = valid.argmax(axis=0)
+    last = len(valid) - 1 - valid[::-1].argmax(axis=0)
+    span = last - first + 1
+    return np.flatnonzero(valid.any(axis=0) & (valid.sum(axis=0) != span))
+
+def compute(close, volume, horizons=HORIZONS):
+    """Features / labels for a date × symbol panel, per-symbol over traded days only."""
+    valid = (close.notna() & volume.notna()).to_numpy()
+    feats = {n: fn(close, volume) for n, fn in DEFINITIONS.items()}
+    labels = {h: label(close, h) for h in horizons}
+
+    # 停牌造成的中間缺口：逐檔以實際交易日重算（與單檔 dropna 後計算一致）
+    for j in _interior_holes(valid):
+        s = close.columns[j]
+        keep = valid[:, j]
+        c, v = close[s][keep], volume[s][keep]
+        for n, fn in DEFINITIONS.items():
+            feats[n][s] = fn(c, v).reindex(close.index)
+        for h in horizons:
+            labels[h][s] = label(c, h).reindex(close.index)
+
+    X = np.stack([feats[n].to_numpy(np.float32) for n in DEFINITIONS], axis=2)
+    X[~valid] = np.nan
+    y = {h: np.where(valid, labels[h].to_numpy(np.float32), np.nan).astype(np.float32) for h in horizons}
+    return X, y, valid
+
+def build(code, symbols=None, force=False):
+    """(Re)build the market's store from the local price table when it changed."""
+    from scripts import history
+
+    horizons = horizons_for(code)
+    key = definition_hash(horizons)
+    source = _source_key(code)
+    current = open_store(code, check=False)
+    symbols = sorted(set(symbols or market_registry.watch_list(code)))
+    if (not force and current is not None and current.hash == key
+            and current.meta["source"] == source and current.meta["requested"] == symbols):
+        return current
+
+    px = history.prices(code, symbols, columns=["Close", "Volume"])
+    if px.empty:
+        return current
+    px["date"] = pd.to_datetime(px["date"]).dt.normalize()
+    close = px.pivot(index="date", columns="symbol", values="Close").sort_index()
+    volume = px.pivot(index="date", columns="symbol", values="Volume").reindex_like(close)
+
+    X, y, valid = compute(close, volume, horizons)
+
+    root = store_dir(code)
+    final = os.path.join(root, key)
+    tmp = f"{final}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    np.save(os.path.join(tmp, "X.npy"), X)
+    np.save(os.path.join(tmp, "valid.npy"), valid)
+    for h, arr in y.items():
+        np.save(os.path.join(tmp, f"y_{h}.npy"), arr)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "hash": key,
+        "dates": close.index.to_numpy("datetime64[D]").astype(np.int64).tolist(),
+        "symbols": [str(s) for s in close.columns],
+        "requested": symbols,
+        "features": list(DEFINITIONS),
+        "horizons": list(horizons),
+        "source": source,
+    }
+    json.dump(meta, open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8"))
+
+    old = f"{final}.old{os.getpid()}"
+    if os.path.exists(final):
+        os.replace(final, old)
+    os.replace(tmp, final)
+    shutil.rmtree(old, ignore_errors=True)
+
+    # 舊版特徵定義的目錄一併清除
+    for d in os.listdir(root):
+        if d != key and ".tmp" not in d:
+            shutil.rmtree(os.path.join(root, d), ignore_errors=True)
+
+    print(f"[Features][{code}] {X.shape[0]} dates × {X.shape[1]} symbols × {X.shape[2]} features ({key})")
+    return open_store(code, check=False)
+
+# ===============================
+# Read（memory-mapped，零複製）
+# ===============================
+class FeatureSet:
+    """Memory-mapped feature cube for one market.
+
+    `X[d]` is the symbol × feature matrix of date d and `X[:, j]` the
+    date × feature history of symbol j, both views into the mapped file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.meta = json.load(open(os.path.join(path, "meta.json"), "r", encoding="utf-8"))
+        self.hash = self.meta["hash"]
+        self.dates = np.asarray(self.meta["dates"], dtype=np.int64).astype("datetime64[D]")
+        self.symbols = self.meta["symbols"]
+        self.features = self.meta["features"]
+        self.horizons = self.meta["horizons"]
+        self.col = {s: j for j, s in enumerate(self.symbols)}
+
+        self.X = np.load(os.path.join(path, "X.npy"), mmap_mode="r")
+        self.valid = np.load(os.path.join(path, "valid.npy"), mmap_mode="r")
+        self._y = {}
+
+    def __contains__(self, symbol):
+        return symbol in self.col
+
+    def y(self, horizon):
+        if horizon not in self._y:
+            self._y[horizon] = np.load(os.path.join(self.path, f"y_{horizon}.npy"), mmap_mode="r")
+        return self._y[horizon]
+
+    def on(self, day):
+        """Symbol × feature matrix for one date (view)."""
+        i = int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(day).date(), "D")))
+        if i >= len(self.dates) or self.dates[i] != np.datetime64(pd.Timestamp(day).date(), "D"):
+            raise KeyError(f"{day} not in feature store")
+        return self.X[i]
+
+    def last_row(self, symbol):
+        """Index of the symbol's latest traded date, or None."""
+        j = self.col.get(symbol)
+        if j is None or not self.valid[:, j].any():
+            return None
+        return len(self.dates) - 1 - int(self.valid[::-1, j].argmax())
+
+    def last_date(self, symbol):
+        i = self.last_row(symbol)
+        return None if i is None else self.dates[i].astype(object)
+
+    def frame(self, symbol, horizon=None):
+        """Traded-day rows of one symbol: features (+ "target" for horizon)."""
+        j = self.col[symbol]
+        keep = np.asarray(self.valid[:, j])
+        df = pd.DataFrame(np.asarray(self.X[keep, j, :]), columns=self.features,
+                          index=pd.DatetimeIndex(self.dates[keep], name="date"))
+        if horizon is not None:
+            df["target"] = np.asarray(self.y(horizon)[keep, j])
+        return df
+
+    def panel(self, horizon, symbols=None):
+        """Stacked training rows (X, y, symbol index) with finite label, across symbols."""
+        cols = [self.col[s] for s in symbols] if symbols is not None else slice(None)
+        X = self.X[:, cols, :]
+        y = self.y(horizon)[:, cols]
+        ok = np.isfinite(y)
+        return np.asarray(X[ok]), np.asarray(y[ok]), np.nonzero(ok)[1]
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def open_store(code, check=True):
+    """Current store for the market; rebuilt first when the price table changed."""
+    if check:
+        return build(code)
+    path = os.path.join(store_dir(code), definition_hash(horizons_for(code)))
+    meta = os.path.join(path, "meta.json")
+    if not os.path.exists(meta):
+        return None
+    mtime = os.path.getmtime(meta)
+    with _cache_lock:
+        hit = _cache.get(code)
+        if hit and hit[0] == mtime:
+            return hit[1]
+        fs = FeatureSet(path)
+        _cache[code] = (mtime, fs)
+        return fs
+
+if __name__ == "__main__":
+    for c in sys.argv[1:] or market_registry.codes():
+        build(c, force=True)
@@ -1,36 +1,42 @@
 import os
-import pandas as pd
-from datetime import datetime, timedelta
+import sys
+from datetime import timedelta
 import yfinance as yf
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
 
-OUT_FILE = os.path.join(DATA_DIR, "forecast_observation.csv")
+from scripts.trading_calendar import get_calendar, last_closed_session
+from scripts import history_store, metrics_materializer, market_registry
 
-def settle(history_path: str, market: str):
-    if not os.path.exists(history_path):
-        return
-
-    df = pd.read_csv(history_path)
-    if "settled" not in df.columns:
-        return
-
-    pending = df[df["settled"] == False]
+def settle(market: str):
+    # 只讀未結算列（partial index），不再整檔讀寫
+    pending = history_store.unsettled(market)
     if pending.empty:
         return
 
+    cal = get_calendar(market)
+    # 只結算已收盤的 session（每小時排程會在盤中執行，當日價格尚未定案）
+    last_closed = last_closed_session(market)
+
     rows = []
     for _, r in pending.iterrows():
         symbol = r["symbol"]
-        entry_date = pd.to_datetime(r["date"])
-        horizon = int(r.get("horizon", 5))
-        settle_date = entry_date + timedelta(days=horizon)
+        horizon = int(r.get("horizon") or market_registry.get(market)["horizon"])
+        try:
+            entry_date = cal.next_session(r["date"])
+            # 🔒 T+horizon 以交易日計算（跳過週末 / 休市）
+            settle_date = cal.offset(entry_date, horizon)
+        except ValueError:
+            continue  # 結算日超出休市日清單涵蓋範圍：待日曆更新後再結算
+        if settle_date > last_closed:
+            continue
 
         try:
             px = yf.download(
                 symbol,
-                start=entry_date.strftime("%Y-%m-%d"),
+                start=entry_date.isoformat(),
                 end=(settle_date + timedelta(days=1)).strftime("%Y-%m-%d"),
                 progress=False,
                 auto_adjust=True,
@@ -43,34 +49,27 @@ def settle(history_path: str, market: str):
             hit = int(real_ret > 0)
 
             rows.append({
+                "id": r["id"],
                 "market": market,
                 "symbol": symbol,
                 "horizon": horizon,
                 "forecast_ret": r["pred_ret"],
                 "real_ret": round(real_ret, 4),
                 "hit": hit,
-                "settle_date": settle_date.date(),
+                "settle_date": settle_date,
             })
 
-            df.loc[_,"settled"] = True
-            df.loc[_,"real_ret"] = round(real_ret, 4)
-            df.loc[_,"hit"] = hit
-
         except Exception:
             continue
 
-    if rows:
-        pd.DataFrame(rows).to_csv(
-            OUT_FILE,
-            mode="a",
-            header=not os.path.exists(OUT_FILE),
-            index=False,
-        )
-        df.to_csv(history_path, index=False)
+    # 原地更新 settled 欄位 + 寫入觀測紀錄（單一交易）
+    history_store.settle_many(rows)
 
 def main():
-    settle(os.path.join(DATA_DIR, "tw_history.csv"), "TW")
-    settle(os.path.join(DATA_DIR, "us_history.csv"), "US")
+    for m in market_registry.codes():
+        settle(m)
+    history_store.export_csv()
+    metrics_materializer.update_all()
 
 if __name__ == "__main__":
     main()
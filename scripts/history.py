@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+from datetime import date, timedelta
+
+import pandas as pd
+import yfinance as yf
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from scripts import history_store, columnar_store, market_registry
+from scripts.trading_calendar import get_calendar
+
+# ===============================
+# Read-side Query API
+#   history.query(market="TW", symbols=[...], start=..., end=..., settled=True)
+#   history.prices(market="US", symbols=[...], start=..., end=...)
+# ===============================
+PRICE_COLS = ["Open", "High", "Low", "Close", "Volume"]
+
+def _pred_table(market):
+    return f"predictions_{market}"
+
+def _price_table(market):
+    return f"prices_{market}"
+
+# ===============================
+# Predictions（由 history.db 建立 columnar 快照）
+#   快照記錄 db_id + (max_id, max_obs_id) 水位；之後只把新增 / 新結算的列
+#   寫成 append 區段（同 (date, symbol) 後者優先），db 換新才整份重建
+# ===============================
+NULLABLE_INTS = ("hit",)     # 未結算為 NaN，讀出時轉回 Int64
+
+def refresh(market, force=False):
+    """Bring the columnar snapshot up to history.db (incremental unless the db was rebuilt)."""
+    name = _pred_table(market)
+    with columnar_store.lock(name):
+        t = columnar_store.open_table(name)
+        src = (t.meta.get("source") or {}) if t else {}
+        db_id = history_store.db_id()
+
+        if force or t is None or src.get("db_id") != db_id or "max_obs_id" not in src:
+            df, mark = history_store.predictions_since(market)
+            columnar_store.write_table(name, df.drop(columns=["market"]), source={"db_id": db_id, **mark})
+        else:
+            df, mark = history_store.predictions_since(market, src["max_id"], src["max_obs_id"])
+            if df.empty:
+                # 本市場沒有變動（其他市場的新列不推進水位；下次仍是索引查詢）
+                return t
+            columnar_store.append(name, df.drop(columns=["market"]), source={"db_id": db_id, **mark})
+    return columnar_store.open_table(name)
+
+def query(market, symbols=None, start=None, end=None, settled=None, columns=None):
+    t = refresh(market)
+    where = None if settled is None else {"settled": bool(settled)}
+    if columns and settled is not None and "settled" not in columns:
+        columns = list(columns) + ["settled"]
+    df = t.query(symbols=symbols, start=start, end=end, columns=columns, where=where)
+    for c in NULLABLE_INTS:
+        if c in df.columns:
+            df[c] = df[c].astype("Int64")
+    return df
+
+# ===============================
+# Prices
+# ===============================
+def panel_to_long(data, symbols):
+    """yfinance group_by="ticker" panel → long (date, symbol, OHLCV) frame."""
+    frames = []
+    for s in symbols:
+        try:
+            df = data[s].dropna(how="all")
+        except KeyError:
+            continue
+        if df.empty:
+            continue
+        df = df[[c for c in PRICE_COLS if c in df.columns]].copy()
+        df["date"] = df.index
+        df["symbol"] = s
+        frames.append(df.reset_index(drop=True))
+    if not frames:
+        return pd.DataFrame(columns=["date", "symbol"] + PRICE_COLS)
+    return pd.concat(frames, ignore_index=True)
+
+def _changed_rows(t, long_df):
+    """Rows of long_df that are new or differ from what the table already holds."""
+    old = t.query(
+        symbols=sorted(long_df["symbol"].astype(str).unique()),
+        start=long_df["date"].min(),
+        end=long_df["date"].max(),
+        columns=[c for c in PRICE_COLS if c in long_df.columns],
+    )
+    if old.empty:
+        return long_df
+    old["date"] = pd.to_datetime(old["date"]).astype("datetime64[ns]")
+
+    m = long_df.merge(old, on=["date", "symbol"], how="left", suffixes=("", "_old"), indicator=True)
+    changed = m["_merge"] == "left_only"
+    for c in PRICE_COLS:
+        if c in long_df.columns and f"{c}_old" in m.columns:
+            a, b = m[c], m[f"{c}_old"]
+            changed |= (a != b) & ~(a.isna() & b.isna())
+    return long_df[changed.to_numpy()]
+
+def append_prices(market, long_df):
+    """Merge new bars into the market's price table (newer rows win).
+
+    Only new or revised bars are written, as an append segment under the
+    table's write lock (shared with every other price writer).
+    """
+    if long_df is None or long_df.empty:
+        return None
+
+    long_df = long_df.copy()
+    long_df["date"] = pd.to_datetime(long_df["date"]).dt.normalize().astype("datetime64[ns]")
+    long_df["symbol"] = long_df["symbol"].astype(str)
+    long_df = long_df.drop_duplicates(subset=["date", "symbol"], keep="last").reset_index(drop=True)
+
+    name = _price_table(market)
+    with columnar_store.lock(name):
+        t = columnar_store.open_table(name)
+        if t is not None and len(t):
+            long_df = _changed_rows(t, long_df)
+            if long_df.empty:
+                return None
+        return columnar_store.append(name, long_df)
+
+def store_panel(market, data, symbols):
+    return append_prices(market, panel_to_long(data, symbols))
+
+def prices(market, symbols=None, start=None, end=None, columns=None):
+    t = columnar_store.open_table(_price_table(market))
+    if t is None:
+        return pd.DataFrame(columns=["date", "symbol"] + PRICE_COLS)
+    return t.query(symbols=symbols, start=start, end=end, columns=columns)
+
+# 每個標的實際下載過的區間（含上市前 / 下市後無資料的日期），避免對
+# 沒有完整 bar 的標的每次重抓整段；衍生快取，與價格庫同放 columnar/
+def _fetched_file(market):
+    return os.path.join(columnar_store.COLUMNAR_DIR, f"{_price_table(market)}.fetched.json")
+
+def _load_fetched(market):
+    try:
+        return json.load(open(_fetched_file(market), "r", encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def _save_fetched(market, spans):
+    path = _fetched_file(market)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    json.dump(spans, open(tmp, "w", encoding="utf-8"), sort_keys=True)
+    os.replace(tmp, path)
+
+def _merge_span(old, lo, hi):
+    """Union of a recorded [lo, hi] and a new download when they touch; else the new one."""
+    if old:
+        a, b = pd.Timestamp(old[0]), pd.Timestamp(old[1])
+        if lo <= b + timedelta(days=1) and hi >= a - timedelta(days=1):
+            lo, hi = min(lo, a), max(hi, b)
+    return [lo.date().isoformat(), hi.date().isoformat()]
+
+def ensure_prices(market, symbols, start, end, columns=None):
+    """Cached bars over [start, end]; symbols the cache does not cover are fetched in one batch."""
+    symbols = sorted(set(map(str, symbols)))
+    if not symbols:
+        return prices(market, [], start, end, columns)
+
+    # 需覆蓋的交易日區間（未來日期不可能有資料）
+    cal = get_calendar(market)
+    end_day = min(pd.Timestamp(end).date(), date.today() - timedelta(days=1))
+    need_lo = pd.Timestamp(cal.next_session(start))
+    need_hi = pd.Timestamp(cal.prev_session(end_day))
+    if need_hi < need_lo:
+        return prices(market, symbols, start, end, columns)
+
+    have = prices(market, symbols, start, end, columns=["Close"])
+    span = have.groupby("symbol")["date"].agg(["min", "max"])
+    fetched = _load_fetched(market)
+
+    def known(s):
+        """(lo, hi) the cache can vouch for: stored bars, or a download that found none earlier."""
+        lo, hi = [], []
+        if s in span.index:
+            lo.append(pd.Timestamp(span.loc[s, "min"]))
+            hi.append(pd.Timestamp(span.loc[s, "max"]))
+        if s in fetched:
+            lo.append(pd.Timestamp(fetched[s][0]))
+            hi.append(pd.Timestamp(fetched[s][1]))
+        return (min(lo), max(hi)) if lo else (None, None)
+
+    missing, fetch_from = [], pd.Timestamp(end_day)
+    for s in symbols:
+        lo, hi = known(s)
+        if lo is not None and lo <= need_lo and hi >= need_hi:
+            continue
+        missing.append(s)
+        # 起點已覆蓋者只補尾端
+        head = lo is not None and lo <= need_lo
+        fetch_from = min(fetch_from, hi + timedelta(days=1) if head else pd.Timestamp(start))
+
+    if missing:
+        data = yf.download(
+            missing,
+            start=fetch_from.date(),
+            end=end_day + timedelta(days=1),
+            auto_adjust=True,
+            group_by="ticker",
+            progress=False,
+            threads=True,
+        )
+        if data is not None and not data.empty:
+            with columnar_store.lock(_price_table(market)):
+                append_prices(market, panel_to_long(data, missing))
+                spans = _load_fetched(market)
+                for s in missing:
+                    spans[s] = _merge_span(spans.get(s), fetch_from, pd.Timestamp(end_day))
+                _save_fetched(market, spans)
+
+    return prices(market, symbols, start, end, columns)
+
+if __name__ == "__main__":
+    for m in market_registry.codes():
+        t = refresh(m, force=True)
+        print(m, "predictions:", len(t), "symbols:", len(t.symbols))
@@ -0,0 +1,338 @@
+import os
+import sys
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+# ===============================
+# Base / Data
+# ===============================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+sys.path.append(BASE_DIR)
+
+from scripts import market_registry, data_retention
+
+DB_FILE = os.path.join(DATA_DIR, "history.db")
+
+# 人類可讀的 CSV 匯出（同時作為舊版資料的匯入來源）
+HISTORY_CSV = {
+    m: os.path.join(DATA_DIR, f"{m.lower()}_history.csv")
+    for m in market_registry.codes(enabled_only=False)
+}
+OBSERVATION_CSV = os.path.join(DATA_DIR, "forecast_observation.csv")
+
+PRED_COLS = [
+    "date", "symbol", "entry_price", "pred_ret", "horizon",
+    "settled", "real_ret", "hit", "settle_date",
+]
+OBS_COLS = ["market", "symbol", "horizon", "forecast_ret", "real_ret", "hit", "settle_date"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id          INTEGER PRIMARY KEY,
+    market      TEXT    NOT NULL,
+    date        TEXT    NOT NULL,
+    symbol      TEXT    NOT NULL,
+    entry_price REAL,
+    pred_ret    REAL,
+    horizon     INTEGER NOT NULL DEFAULT 5,
+    settled     INTEGER NOT NULL DEFAULT 0,
+    real_ret    REAL,
+    hit         INTEGER,
+    settle_date TEXT,
+    UNIQUE (market, date, symbol)
+);
+CREATE INDEX IF NOT EXISTS idx_pred_symbol    ON predictions (market, symbol, date);
+CREATE INDEX IF NOT EXISTS idx_pred_unsettled ON predictions (market, date) WHERE settled = 0;
+CREATE INDEX IF NOT EXISTS idx_pred_settled   ON predictions (market, settle_date, id) WHERE settled = 1;
+
+CREATE TABLE IF NOT EXISTS observations (
+    id            INTEGER PRIMARY KEY,
+    prediction_id INTEGER,
+    market        TEXT NOT NULL,
+    symbol        TEXT NOT NULL,
+    horizon       INTEGER,
+    forecast_ret  REAL,
+    real_ret      REAL,
+    hit           INTEGER,
+    settle_date   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_obs_market ON observations (market, id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# ===============================
+# Connection
+# ===============================
+_ready = set()
+_ready_lock = threading.Lock()
+
+def connect(db=None):
+    db = db or DB_FILE
+    conn = sqlite3.connect(db, timeout=30)
+    conn.row_factory = sqlite3.Row
+    with _ready_lock:
+        if db not in _ready:
+            conn.executescript(SCHEMA)
+            # 每個資料庫實體一個 id：重建後 rowid 會變，依 id 的水位需隨之失效
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('db_id', ?)", (uuid.uuid4().hex,))
+            conn.commit()
+            if db == DB_FILE:
+                _sync_from_csv(conn)
+            _ready.add(db)
+    return conn
+
+@contextmanager
+def session(db=None):
+    """Connection scoped to one transaction (commit on success, always closed)."""
+    conn = connect(db)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _sync_from_csv(conn):
+    """First open per process: bring the store up to the committed CSVs + archive.
+
+    history.db is only a cache (actions/cache may restore an older copy), so
+    rows and settlements the CSVs hold but the db lacks are added; rows only
+    the db has are kept.
+    """
+    # 封存月區段 + 補充區段 + 熱區段（history.db 不進版控，遺失 / 過期時由此補齊）
+    for market, path in HISTORY_CSV.items():
+        df = data_retention.read_csv(path, dtype={"symbol": str})
+        if df.empty:
+            continue
+        # 同一筆預測可能先以未結算封存、後以已結算補入：較晚的列優先
+        df = df.assign(_day=df["date"].astype(str).str[:10])
+        df = df.drop_duplicates(["_day", "symbol"], keep="last")
+        _insert_predictions(conn, market, df.to_dict("records"))
+
+        settled = df[df["settled"].map(_as_bool) == 1]
+        cur = conn.executemany(
+            "UPDATE predictions SET settled = 1, real_ret = ?, hit = ?, settle_date = ? "
+            "WHERE market = ? AND date = ? AND symbol = ? AND settled = 0",
+            [
+                (_clean(r["real_ret"]), _clean(r["hit"]), _clean(r["settle_date"]), market, r["_day"], r["symbol"])
+                for r in settled.to_dict("records")
+            ],
+        )
+        if cur.rowcount > 0:
+            # 結算不經 settle_many 改寫（沒有觀測水位）：換新 db_id，依 id 水位的衍生資料整份重建
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'db_id'", (uuid.uuid4().hex,))
+
+    df = data_retention.read_csv(OBSERVATION_CSV, dtype={"symbol": str})
+    if not df.empty:
+        have = _frame(conn.execute(f"SELECT {', '.join(OBS_COLS)} FROM observations"), OBS_COLS)
+        new = data_retention.missing_rows(df.reindex(columns=OBS_COLS), have)
+        conn.executemany(
+            "INSERT INTO observations (market, symbol, horizon, forecast_ret, real_ret, hit, settle_date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [tuple(_clean(r.get(c)) for c in OBS_COLS) for r in new.to_dict("records")],
+        )
+    conn.commit()
+
+def _clean(v):
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return None
+    if hasattr(v, "item"):
+        return v.item()
+    return v
+
+def _as_bool(v):
+    if isinstance(v, str):
+        return int(v.strip().lower() == "true")
+    return int(bool(_clean(v)))
+
+def _insert_predictions(conn, market, rows):
+    cur = conn.executemany(
+        "INSERT OR IGNORE INTO predictions "
+        "(market, date, symbol, entry_price, pred_ret, horizon, settled, real_ret, hit, settle_date) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                market,
+                str(r["date"])[:10],
+                r["symbol"],
+                _clean(r.get("entry_price")),
+                _clean(r.get("pred_ret")),
+                int(_clean(r.get("horizon")) or 5),
+                _as_bool(r.get("settled", False)),
+                _clean(r.get("real_ret")),
+                _clean(r.get("hit")),
+                _clean(r.get("settle_date")),
+            )
+            for r in rows
+        ],
+    )
+    return cur.rowcount
+
+def _frame(rows, cols=None):
+    df = pd.DataFrame([dict(r) for r in rows], columns=cols)
+    if "settled" in df.columns:
+        df["settled"] = df["settled"].astype(bool)
+    return df
+
+# ===============================
+# Write Path
+# ===============================
+def append_predictions(market, rows, db=None):
+    """Append-only insert; (market, date, symbol) duplicates are ignored."""
+    with session(db) as conn:
+        return _insert_predictions(conn, market, rows)
+
+def settle_many(records, db=None):
+    """In-place settlement + observation log, one transaction.
+
+    records: dicts with id, market, symbol, horizon, forecast_ret,
+    real_ret, hit, settle_date. Already-settled ids are skipped (no
+    second observation), so replaying a batch is harmless.
+    """
+    if not records:
+        return 0
+    done = 0
+    with session(db) as conn:
+        for r in records:
+            cur = conn.execute(
+                "UPDATE predictions SET settled = 1, real_ret = ?, hit = ?, settle_date = ? "
+                "WHERE id = ? AND settled = 0",
+                (r["real_ret"], r["hit"], str(r["settle_date"]), _clean(r["id"])),
+            )
+            if cur.rowcount == 0:
+                continue
+            conn.execute(
+                "INSERT INTO observations "
+                "(prediction_id, market, symbol, horizon, forecast_ret, real_ret, hit, settle_date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (_clean(r["id"]), r["market"], r["symbol"], r["horizon"], _clean(r["forecast_ret"]),
+                 r["real_ret"], r["hit"], str(r["settle_date"])),
+            )
+            done += 1
+    return done
+
+def unsettled(market, db=None):
+    with session(db) as conn:
+        rows = conn.execute(
+            "SELECT * FROM predictions WHERE market = ? AND settled = 0 ORDER BY date, id",
+            (market,),
+        ).fetchall()
+    return _frame(rows)
+
+def last_settled(market, n=50, db=None):
+    with session(db) as conn:
+        rows = conn.execute(
+            "SELECT * FROM predictions WHERE market = ? AND settled = 1 "
+            "ORDER BY settle_date DESC, id DESC LIMIT ?",
+            (market, n),
+        ).fetchall()
+    return _frame(rows[::-1])
+
+def last_rows(market, n=50, db=None):
+    with session(db) as conn:
+        rows = conn.execute(
+            "SELECT * FROM predictions WHERE market = ? ORDER BY date DESC, id DESC LIMIT ?",
+            (market, n),
+        ).fetchall()
+    return _frame(rows[::-1])
+
+def read_predictions(market=None, start=None, end=None, settled=None, db=None):
+    sql, args = "SELECT * FROM predictions WHERE 1 = 1", []
+    if market:
+        sql += " AND market = ?"
+        args.append(market)
+    if start:
+        sql += " AND date >= ?"
+        args.append(str(start)[:10])
+    if end:
+        sql += " AND date <= ?"
+        args.append(str(end)[:10])
+    if settled is not None:
+        sql += " AND settled = ?"
+        args.append(int(settled))
+    sql += " ORDER BY date, id"
+
+    with session(db) as conn:
+        rows = conn.execute(sql, args).fetchall()
+    return _frame(rows, None if rows else ["id", "market"] + PRED_COLS)
+
+def predictions_since(market, max_id=0, max_obs_id=0, db=None):
+    """Predictions added (id > max_id) or settled (observation id > max_obs_id) since a watermark.
+
+    Returns (rows, watermark) read from one snapshot of the db.
+    """
+    with session(db) as conn:
+        conn.execute("BEGIN")
+        mark = {
+            "max_id": conn.execute("SELECT COALESCE(MAX(id), 0) FROM predictions").fetchone()[0],
+            "max_obs_id": conn.execute("SELECT COALESCE(MAX(id), 0) FROM observations").fetchone()[0],
+        }
+        rows = conn.execute(
+            "SELECT * FROM predictions WHERE market = ? AND (id > ? OR id IN "
+            "(SELECT prediction_id FROM observations WHERE id > ?)) ORDER BY date, id",
+            (market, int(max_id), int(max_obs_id)),
+        ).fetchall()
+    return _frame(rows, None if rows else ["id", "market"] + PRED_COLS), mark
+
+def latest_symbols(db=None):
+    """Symbols of each market's most recent prediction date."""
+    with session(db) as conn:
+        rows = conn.execute(
+            "SELECT p.symbol FROM predictions p "
+            "JOIN (SELECT market, MAX(date) AS d FROM predictions GROUP BY market) m "
+            "ON p.market = m.market AND p.date = m.d"
+        ).fetchall()
+    return [r["symbol"] for r in rows]
+
+def db_id(db=None):
+    """Identity of this database instance (changes whenever history.db is rebuilt)."""
+    with session(db) as conn:
+        return conn.execute("SELECT value FROM meta WHERE key = 'db_id'").fetchone()["value"]
+
+def read_observations(market=None, tail=None, after_id=None, db=None):
+    sql, args = "SELECT * FROM observations WHERE 1 = 1", []
+    if market:
+        sql += " AND market = ?"
+        args.append(market)
+    if after_id is not None:
+        sql += " AND id > ?"
+        args.append(int(after_id))
+    sql += " ORDER BY id DESC" if tail else " ORDER BY id"
+    if tail:
+        sql += " LIMIT ?"
+        args.append(int(tail))
+
+    with session(db) as conn:
+        rows = conn.execute(sql, args).fetchall()
+    if tail:
+        rows = rows[::-1]
+    return _frame(rows, None if rows else ["id", "prediction_id"] + OBS_COLS)
+
+# ===============================
+# CSV Export（給人看 / git diff）
+#   已原樣封存於 data/archive/ 的列不再匯出；封存月份的晚到結算 / 觀測
+#   留在熱區段，由 data_retention 壓實成 <month>.<n> 補充區段
+# ===============================
+def export_csv(db=None):
+    for market, path in HISTORY_CSV.items():
+        df = read_predictions(market, db=db)
+        if not df.empty:
+            data_retention.hot_rows(path, df[PRED_COLS]).to_csv(path, index=False)
+
+    obs = read_observations(db=db)
+    if not obs.empty:
+        data_retention.hot_rows(OBSERVATION_CSV, obs[OBS_COLS]).to_csv(OBSERVATION_CSV, index=False)
+
+if __name__ == "__main__":
+    export_csv()
+    for m in HISTORY_CSV:
+        print(m, "unsettled:", len(unsettled(m)), "settled(last 50):", len(last_settled(m)))
@@ -1,16 +1,17 @@
 import os
-import pandas as pd
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
+
+from scripts import risk_state, data_retention
 
 FILES = [
     os.path.join(DATA_DIR, "metrics_tw.csv"),
     os.path.join(DATA_DIR, "metrics_us.csv"),
 ]
 
-L3_FLAG = os.path.join(DATA_DIR, "l3_warning.flag")
-
 N = 3  # 連續惡化次數門檻
 
 
@@ -20,18 +21,14 @@ def is_deteriorating(series):
 
 def main():
     for file in FILES:
-        if not os.path.exists(file):
-            continue
-
-        df = pd.read_csv(file)
+        df = data_retention.read_csv(file)
         if len(df) < N:
             continue
 
         recent = df["hit_rate"].tail(N).values
 
         if is_deteriorating(recent):
-            if not os.path.exists(L3_FLAG):
-                open(L3_FLAG, "w").write("auto\n")
+            if risk_state.raise_l3("hit_rate_trend", actor="hit_rate_trend_guard"):
                 print("🚨 命中率連續惡化，系統自動進入 L3 風險警示模式")
             return
 
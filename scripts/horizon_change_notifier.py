@@ -1,9 +1,13 @@
 import os
+import sys
 import json
-import requests
 from datetime import datetime
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from scripts.discord_notifier import send
+
 DATA_DIR = os.path.join(BASE_DIR, "data")
 
 POLICY_FILE = os.path.join(DATA_DIR, "horizon_policy.json")
@@ -45,7 +49,7 @@ def main():
             "timestamp": datetime.utcnow().isoformat(),
         }
 
-        requests.post(WEBHOOK, json={"embeds": [embed]}, timeout=15)
+        send(WEBHOOK, embeds=[embed])
 
     json.dump(current, open(SNAPSHOT_FILE, "w", encoding="utf-8"), indent=2, ensure_ascii=False)
 
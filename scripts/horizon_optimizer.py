@@ -1,11 +1,15 @@
 import json
 import os
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 POLICY_FILE = os.path.join(DATA_DIR, "horizon_policy.json")
+sys.path.append(BASE_DIR)
 
-DEFAULT = {"TW": 5, "US": 5}
+from scripts import market_registry
+
+DEFAULT = {c: m["horizon"] for c, m in market_registry.markets().items()}
 
 if not os.path.exists(POLICY_FILE):
     json.dump(DEFAULT, open(POLICY_FILE, "w", encoding="utf-8"), indent=2)
@@ -1,17 +1,19 @@
 import os
+import sys
+import numpy as np
 import pandas as pd
-import yfinance as yf
-import datetime
-import requests
 
 # ===============================
 # Base
 # ===============================
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
+
+from scripts.discord_notifier import send
+from scripts.trading_calendar import get_calendar
+from scripts import history_store, history, data_retention
 
-TW_HISTORY = os.path.join(DATA_DIR, "tw_history.csv")
-US_HISTORY = os.path.join(DATA_DIR, "us_history.csv")
 BLACK_SWAN = os.path.join(DATA_DIR, "black_swan_history.csv")
 
 OUTPUT = os.path.join(DATA_DIR, "l4_ai_performance_compare.csv")
@@ -21,89 +23,127 @@ DISCORD_WEBHOOK_URL = os.getenv("BLACK_SWAN_WEBHOOK_URL", "").strip()
 LOOKBACK_DAYS = 5
 LOOKFORWARD_DAYS = 5
 
+# 同時評估多種暫停長度（日曆日）；LOOKFORWARD_DAYS 對應既有欄位
+PAUSE_LENGTHS = [1, 3, 5, 10, 20]
+
+# ===============================
+# Simulated Returns（每筆預測一次，向量化）
+# ===============================
+def simulated_returns(ai, days=LOOKFORWARD_DAYS):
+    """T+days return of every prediction row, from the cached price panel.
+
+    Entry = first session on/after the prediction date, exit = entry + days
+    sessions; both looked up on a (session × symbol) grid per market.
+    """
+    out = np.full(len(ai), np.nan)
+    for market, g in ai.groupby("market", sort=False):
+        cal = get_calendar(market)
+        entry = cal.positions(g["date"].to_numpy("datetime64[D]"))
+        exit_ = entry + days
+
+        start = cal.session_at(int(entry.min()))
+        end = cal.session_at(min(int(exit_.max()), len(cal.sessions) - 1))
+        px = history.ensure_prices(market, g["symbol"].unique(), start, end, columns=["Close"])
+        if px.empty:
+            continue
+
+        # (session, symbol) 網格：一次 fancy index 取出所有進出場價
+        pos = cal.positions(px["date"].to_numpy("datetime64[D]"))
+        lo = int(entry.min())
+        n = int(max(exit_.max(), pos.max())) - lo + 1
+        codes = {s: i for i, s in enumerate(px["symbol"].unique())}
+        grid = np.full((n, len(codes)), np.nan)
+        ok = pos >= lo
+        grid[pos[ok] - lo, px["symbol"].map(codes).to_numpy()[ok]] = px["Close"].to_numpy(np.float64)[ok]
+
+        col = g["symbol"].map(codes)
+        has = col.notna().to_numpy()
+        col = col.fillna(0).astype(int).to_numpy()
+        r = grid[np.minimum(exit_ - lo, n - 1), col] / grid[entry - lo, col] - 1
+        r[~has | (exit_ - lo >= n)] = np.nan
+        out[g.index.to_numpy()] = r
+    return out
+
 # ===============================
-# Utils
+# Interval Join（事件 × 視窗，排序後二分搜尋）
 # ===============================
-def calc_return(symbol, start_date, days):
-    try:
-        df = yf.download(
-            symbol,
-            start=start_date,
-            end=start_date + datetime.timedelta(days=days + 3),
-            auto_adjust=True,
-            progress=False,
-        )
-        if len(df) < days + 1:
-            return None
-        return (df["Close"].iloc[days] - df["Close"].iloc[0]) / df["Close"].iloc[0]
-    except:
-        return None
+def window_mean(days, values, lo_days, hi_days, left_closed, right_closed):
+    """Mean / count of values whose day falls in each [lo, hi] interval.
+
+    days must be sorted; NaN values are excluded. Prefix sums make every
+    interval O(log n) regardless of how many events or windows there are.
+    """
+    ok = np.isfinite(values)
+    csum = np.concatenate([[0.0], np.cumsum(np.where(ok, values, 0.0))])
+    ccnt = np.concatenate([[0], np.cumsum(ok)])
+
+    a = np.searchsorted(days, lo_days, "left" if left_closed else "right")
+    b = np.searchsorted(days, hi_days, "right" if right_closed else "left")
+    cnt = ccnt[b] - ccnt[a]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (csum[b] - csum[a]) / cnt
+    return mean, cnt
+
+def counterfactual(bs, ai, pause_lengths=PAUSE_LENGTHS):
+    """Per-event normal-period mean prediction + simulated returns for every pause length."""
+    ai = ai.sort_values("date", kind="stable").reset_index(drop=True)
+    days = ai["date"].to_numpy("datetime64[D]").astype(np.int64)
+    sim = simulated_returns(ai)
+    pred = ai["pred_ret"].to_numpy(np.float64)
+
+    ev = pd.to_datetime(bs["datetime"]).dt.normalize().to_numpy("datetime64[D]").astype(np.int64)
+
+    out = pd.DataFrame({
+        "l4_datetime": bs["datetime"].to_numpy(),
+        "market": bs["market"].to_numpy(),
+    })
+
+    # 正常 AI 報酬：[L4 - LOOKBACK, L4)
+    normal, _ = window_mean(days, pred, ev - LOOKBACK_DAYS, ev, True, False)
+    out["normal_ai_avg_pred"] = np.round(normal, 4)
+
+    # 假設 L4 後繼續 AI：(L4, L4 + pause]，所有暫停長度一次計算
+    lengths = np.asarray(sorted(set(pause_lengths) | {LOOKFORWARD_DAYS}))
+    hi = ev[:, None] + lengths[None, :]
+    lo = np.broadcast_to(ev[:, None], hi.shape)
+    mean, cnt = window_mean(days, sim, lo.ravel(), hi.ravel(), False, True)
+    mean, cnt = mean.reshape(hi.shape), cnt.reshape(hi.shape)
+
+    j = int(np.flatnonzero(lengths == LOOKFORWARD_DAYS)[0])
+    out["simulated_ai_return_if_continue"] = np.round(mean[:, j], 4)
+    out["ai_paused"] = True
+    for k, L in enumerate(lengths):
+        out[f"sim_ret_pause_{L}d"] = np.round(mean[:, k], 4)
+        out[f"sim_n_pause_{L}d"] = cnt[:, k]
+    return out
+
+def sweep(r):
+    parts = [
+        f"{L}d {r[f'sim_ret_pause_{L}d']:+.2%}"
+        for L in sorted(set(PAUSE_LENGTHS) | {LOOKFORWARD_DAYS})
+        if pd.notna(r[f"sim_ret_pause_{L}d"])
+    ]
+    return " / ".join(parts) or "—"
 
 # ===============================
 # Main
 # ===============================
 def run():
-    if not os.path.exists(BLACK_SWAN):
+    bs = data_retention.read_csv(BLACK_SWAN)
+    if bs.empty:
         print("No black swan history")
         return
 
-    bs = pd.read_csv(BLACK_SWAN)
     bs = bs[bs["level"] == 4]
 
     if bs.empty:
         print("No L4 events found")
         return
 
-    ai_hist = []
-    for f in [TW_HISTORY, US_HISTORY]:
-        if os.path.exists(f):
-            df = pd.read_csv(f)
-            ai_hist.append(df)
-
-    ai = pd.concat(ai_hist, ignore_index=True)
+    ai = history_store.read_predictions()
     ai["date"] = pd.to_datetime(ai["date"])
 
-    rows = []
-
-    for _, row in bs.iterrows():
-        l4_time = pd.to_datetime(row["datetime"])
-        l4_date = l4_time.date()
-
-        before = ai[
-            (ai["date"] >= l4_date - datetime.timedelta(days=LOOKBACK_DAYS))
-            & (ai["date"] < l4_date)
-        ]
-
-        after = ai[
-            (ai["date"] > l4_date)
-            & (ai["date"] <= l4_date + datetime.timedelta(days=LOOKFORWARD_DAYS))
-        ]
-
-        # 正常 AI 報酬
-        normal_ret = before["pred_ret"].mean() if not before.empty else None
-
-        # 假設 L4 後繼續 AI
-        sim_rets = []
-        for _, r in after.iterrows():
-            ret = calc_return(
-                r["symbol"],
-                pd.to_datetime(r["date"]),
-                LOOKFORWARD_DAYS,
-            )
-            if ret is not None:
-                sim_rets.append(ret)
-
-        simulated_ret = sum(sim_rets) / len(sim_rets) if sim_rets else None
-
-        rows.append({
-            "l4_datetime": row["datetime"],
-            "market": row["market"],
-            "normal_ai_avg_pred": round(normal_ret, 4) if normal_ret else None,
-            "simulated_ai_return_if_continue": round(simulated_ret, 4) if simulated_ret else None,
-            "ai_paused": True,
-        })
-
-    out = pd.DataFrame(rows)
+    out = counterfactual(bs, ai)
     out.to_csv(OUTPUT, index=False)
 
     # ===============================
@@ -116,14 +156,11 @@ def run():
                 f"🕒 {r['l4_datetime']} ({r['market']})\n"
                 f"🟢 正常期 AI 預測均值：{r['normal_ai_avg_pred']}\n"
                 f"🔴 若 L4 後繼續 AI：{r['simulated_ai_return_if_continue']}\n"
+                f"⏸ 暫停長度：{sweep(r)}\n"
                 f"🛑 實際策略：停止 AI\n\n"
             )
 
-        requests.post(
-            DISCORD_WEBHOOK_URL,
-            json={"content": msg[:1900]},
-            timeout=15,
-        )
+        send(DISCORD_WEBHOOK_URL, content=msg)
 
     print("✅ L4 AI performance comparison saved →", OUTPUT)
 
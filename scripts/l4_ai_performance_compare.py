@@ -1,4 +1,4 @@
-import os, sys, datetime, requests
+import os, sys, datetime
 import pandas as pd
 
 # ===============================
@@ -8,6 +8,9 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 sys.path.append(BASE_DIR)
 
+from scripts.discord_notifier import send
+from scripts import significance
+
 CSV_FILE = os.path.join(DATA_DIR, "l4_ai_performance_history.csv")
 DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL", "").strip()
 
@@ -29,6 +32,22 @@ def delta(a, b):
     sign = "⬆️" if d > 0 else "⬇️" if d < 0 else "➡️"
     return f"{sign} {d:+.1%}"
 
+def significance_line(first, last, prefix):
+    """95% CI of the latest win rate + permutation p-value vs the first L4."""
+    a = significance.from_counts(first[f"{prefix}_count"], first[f"{prefix}_win_rate"])
+    b = significance.from_counts(last[f"{prefix}_count"], last[f"{prefix}_win_rate"])
+    if len(b) == 0:
+        return "信賴區間：樣本不足"
+
+    ci = significance.bootstrap_ci(b, b)["hit_rate"]
+    line = f"信賴區間：{ci['low']:.0%} ~ {ci['high']:.0%}"
+
+    test = significance.permutation_test(a, b) if len(a) else None
+    if test:
+        verdict = "顯著" if test["p_value"] < 0.05 else "不顯著"
+        line += f"\n差異檢定：p = {test['p_value']:.2f}（{verdict}）"
+    return line
+
 # ===============================
 # Main
 # ===============================
@@ -60,7 +79,8 @@ def run():
                 "value": (
                     f"樣本數：{first['tw_count']} ➜ {last['tw_count']}\n"
                     f"勝率：{pct(first['tw_win_rate'])} ➜ {pct(last['tw_win_rate'])} "
-                    f"{delta(first['tw_win_rate'], last['tw_win_rate'])}"
+                    f"{delta(first['tw_win_rate'], last['tw_win_rate'])}\n"
+                    f"{significance_line(first, last, 'tw')}"
                 ),
                 "inline": False,
             },
@@ -69,7 +89,8 @@ def run():
                 "value": (
                     f"樣本數：{first['us_count']} ➜ {last['us_count']}\n"
                     f"勝率：{pct(first['us_win_rate'])} ➜ {pct(last['us_win_rate'])} "
-                    f"{delta(first['us_win_rate'], last['us_win_rate'])}"
+                    f"{delta(first['us_win_rate'], last['us_win_rate'])}\n"
+                    f"{significance_line(first, last, 'us')}"
                 ),
                 "inline": False,
             },
@@ -78,7 +99,8 @@ def run():
                 "value": (
                     "• 黑天鵝期間屬極端市場，勝率非唯一指標\n"
                     "• 樣本數穩定增加代表系統持續運作\n"
-                    "• 勝率趨穩代表風控邏輯成熟"
+                    "• 勝率趨穩代表風控邏輯成熟\n"
+                    "• 差異不顯著時，勝率變動多屬樣本雜訊"
                 ),
                 "inline": False,
             },
@@ -90,11 +112,7 @@ def run():
         ],
     }
 
-    requests.post(
-        DISCORD_WEBHOOK_URL,
-        json={"embeds": [embed]},
-        timeout=15,
-    )
+    send(DISCORD_WEBHOOK_URL, embeds=[embed])
 
 if __name__ == "__main__":
     run()
@@ -1,4 +1,4 @@
-import os, sys, datetime, requests
+import os, sys, datetime
 import pandas as pd
 
 # ===============================
@@ -9,14 +9,14 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 sys.path.append(BASE_DIR)
 
+from scripts.discord_notifier import send
+from scripts import history_store, risk_state
+
 # ===============================
 # Env
 # ===============================
 DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL", "").strip()
-OBS_FLAG_FILE = os.path.join(DATA_DIR, "l4_last_end.flag")
 
-HISTORY_TW = os.path.join(DATA_DIR, "tw_history.csv")
-HISTORY_US = os.path.join(DATA_DIR, "us_history.csv")
 L4_SUMMARY_CSV = os.path.join(DATA_DIR, "l4_ai_performance_history.csv")
 
 TZ = datetime.timezone(datetime.timedelta(hours=8))
@@ -25,10 +25,8 @@ DISCLAIMER = "📌 僅為風險與市場監控，非投資建議"
 # ===============================
 # Utils
 # ===============================
-def load_history(path):
-    if not os.path.exists(path):
-        return pd.DataFrame()
-    return pd.read_csv(path)
+def load_history(market):
+    return history_store.read_predictions(market)
 
 def calc_metrics(df):
     if df.empty:
@@ -68,14 +66,14 @@ def fmt(m):
 # Main
 # ===============================
 def run():
-    if not os.path.exists(OBS_FLAG_FILE):
+    l4_end_ts = risk_state.get("l4_last_end")
+    if not l4_end_ts:
         return
 
     now = datetime.datetime.now(TZ)
-    l4_end_ts = open(OBS_FLAG_FILE).read().strip()
 
-    tw = load_history(HISTORY_TW)
-    us = load_history(HISTORY_US)
+    tw = load_history("TW")
+    us = load_history("US")
 
     tw_m = calc_metrics(tw)
     us_m = calc_metrics(us)
@@ -140,11 +138,7 @@ def run():
         ],
     }
 
-    requests.post(
-        DISCORD_WEBHOOK_URL,
-        json={"embeds": [embed]},
-        timeout=15,
-    )
+    send(DISCORD_WEBHOOK_URL, embeds=[embed])
 
 if __name__ == "__main__":
     run()
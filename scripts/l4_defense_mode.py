@@ -1,5 +1,5 @@
 import os
-import requests
+import sys
 import yfinance as yf
 import pandas as pd
 from datetime import datetime
@@ -7,9 +7,12 @@ from datetime import datetime
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
+sys.path.append(BASE_DIR)
+
+from scripts.discord_notifier import send
+from scripts import risk_state
 
 DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL", "").strip()
-L4_ACTIVE_FILE = os.getenv("L4_ACTIVE_FILE", os.path.join(DATA_DIR, "l4_active.flag"))
 
 ASSETS = {
     "BIL": "💵 現金 / 短債",
@@ -22,7 +25,7 @@ ASSETS = {
 REPORT_FILE = os.path.join(DATA_DIR, "l4_defense_report.csv")
 
 def run():
-    if not os.path.exists(L4_ACTIVE_FILE):
+    if not risk_state.l4_active():
         return
 
     prices = yf.download(
@@ -46,12 +49,7 @@ def run():
     msg += "\n⚠️ 系統已暫停進攻型 AI\n"
     msg += "➡️ 建議維持防禦資產，等待 L4 結束"
 
-    if DISCORD_WEBHOOK_URL:
-        requests.post(
-            DISCORD_WEBHOOK_URL,
-            json={"content": msg},
-            timeout=15
-        )
+    send(DISCORD_WEBHOOK_URL, content=msg)
 
     # Save record
     df = pd.DataFrame({
@@ -1,41 +1,52 @@
 import os
-import json
+import sys
 import pandas as pd
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
+
+from scripts import risk_state
 
 COMPARE_FILE = os.path.join(DATA_DIR, "l4_ai_performance_compare.csv")
-POLICY_FILE = os.path.join(DATA_DIR, "l4_pause_policy.json")
 
 DEFAULT_POLICY = {
     "pause_hours": 24,
     "reason": "default"
 }
 
-def decide_pause_hours(row):
+# (報酬門檻, 暫停時數, 原因)：由嚴重到輕微依序比對（risk_policy_replay 可替換）
+PAUSE_RULES = (
+    (-0.03, 48, "severe_drawdown"),
+    (-0.01, 24, "moderate_risk"),
+)
+LOW_IMPACT_HOURS = 12
+
+def decide_pause_hours(row, rules=PAUSE_RULES, low_impact_hours=LOW_IMPACT_HOURS):
     sim = row["simulated_ai_return_if_continue"]
 
     if sim is None:
         return 24, "no_data"
 
-    if sim < -0.03:
-        return 48, "severe_drawdown"
-    elif sim < -0.01:
-        return 24, "moderate_risk"
-    else:
-        return 12, "low_impact"
+    for threshold, hours, reason in rules:
+        if sim < threshold:
+            return hours, reason
+    return low_impact_hours, "low_impact"
+
+def save_policy(policy):
+    # 暫停政策存於 risk state（news_radar 進入 L4 時讀取）
+    risk_state.update("l4_dynamic_pause", pause_policy=policy)
 
 def run():
     if not os.path.exists(COMPARE_FILE):
         print("No comparison data, keep default")
-        json.dump(DEFAULT_POLICY, open(POLICY_FILE, "w"), indent=2)
+        save_policy(DEFAULT_POLICY)
         return
 
     df = pd.read_csv(COMPARE_FILE)
 
     if df.empty:
-        json.dump(DEFAULT_POLICY, open(POLICY_FILE, "w"), indent=2)
+        save_policy(DEFAULT_POLICY)
         return
 
     # 取最近一次 L4
@@ -48,7 +59,7 @@ def run():
         "based_on_l4": latest["l4_datetime"]
     }
 
-    json.dump(policy, open(POLICY_FILE, "w"), indent=2)
+    save_policy(policy)
     print("✅ L4 pause policy updated:", policy)
 
 if __name__ == "__main__":
@@ -1,100 +1,200 @@
 import os
+import sys
+import numpy as np
 import pandas as pd
 import yfinance as yf
-import requests
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 # ===============================
 # Path / Config
 # ===============================
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
+
+from scripts.discord_notifier import send
+from scripts.trading_calendar import get_calendar
+from scripts import market_registry, data_retention
 
 BLACK_SWAN_CSV = os.path.join(DATA_DIR, "black_swan_history.csv")
 OUTPUT_CSV = os.path.join(DATA_DIR, "l4_market_impact.csv")
 
 DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL", "").strip()
 
-MARKET_INDEX = {
-    "TW": "^TWII",
-    "US": "^GSPC"
-}
+MARKET_INDEX = {c: m["index"] for c, m in market_registry.markets().items() if m["index"]}
 
 WINDOWS = [0, 1, 3, 5, 10]
 
+# 市場模型（market model）估計視窗：事件前 [T-GAP-EST, T-GAP) 交易日
+ESTIMATION_WINDOW = 120
+ESTIMATION_GAP = 10
+MIN_ESTIMATION_OBS = 60
+
 # ===============================
-# Utilities
+# Prices（每市場一次下載）
 # ===============================
-def get_price(symbol, start, end):
-    df = yf.download(symbol, start=start, end=end, progress=False)
-    if df.empty:
-        return None
-    return df["Close"]
-
-def calc_returns(series, base_date):
-    if base_date not in series.index:
+def download(symbols, start, end):
+    """Close prices for all symbols over [start, end) in a single request."""
+    df = yf.download(
+        sorted(set(symbols)),
+        start=start,
+        end=end,
+        auto_adjust=True,
+        group_by="ticker",
+        progress=False,
+        threads=True,
+    )
+    if df is None or df.empty:
         return {}
 
-    base_price = series.loc[base_date]
-    result = {}
-
-    for d in WINDOWS:
+    out = {}
+    for s in set(symbols):
         try:
-            target_date = base_date + timedelta(days=d)
-            future = series[series.index >= target_date].iloc[0]
-            result[f"ret_{d}d"] = round((future / base_price - 1) * 100, 2)
-        except Exception:
-            result[f"ret_{d}d"] = None
-
-    return result
+            close = (df[s] if isinstance(df.columns, pd.MultiIndex) else df)["Close"].dropna()
+        except KeyError:
+            continue
+        if not close.empty:
+            out[s] = close
+    return out
+
+def on_grid(close, cal, lo, n):
+    """Close series → dense array over session positions [lo, lo+n), forward filled."""
+    pos = cal.positions(close.index.to_numpy("datetime64[D]")) - lo
+    ok = (pos >= 0) & (pos < n)
+    grid = np.full(n, np.nan)
+    grid[pos[ok]] = close.to_numpy(np.float64)[ok]
+    return pd.Series(grid).ffill().to_numpy()
 
 # ===============================
-# Main
+# Event Study（全部事件一次計算）
 # ===============================
-def run():
-    if not os.path.exists(BLACK_SWAN_CSV):
-        print("❌ black_swan_history.csv not found")
-        return
+def calc_returns(close, cal, event_pos):
+    """T+d index returns (%) for every event × window.
+
+    Base = quote on the event session; T+d = first quote on/after session T+d.
+    """
+    quote_pos = cal.positions(close.index.to_numpy("datetime64[D]"))
+    px = close.to_numpy(np.float64)
+
+    base_i = np.searchsorted(quote_pos, event_pos)
+    has_base = base_i < len(quote_pos)
+    has_base[has_base] &= quote_pos[base_i[has_base]] == event_pos[has_base]
+    base = np.where(has_base, px[np.minimum(base_i, len(px) - 1)], np.nan)
+
+    target = event_pos[:, None] + np.asarray(WINDOWS)[None, :]
+    ti = np.searchsorted(quote_pos, target)
+    future = np.where(ti < len(px), px[np.minimum(ti, len(px) - 1)], np.nan)
+
+    return np.round((future / base[:, None] - 1) * 100, 2)
+
+def market_model(stock, index, event_pos):
+    """Market-model CAR (%) per event × window, plus alpha / beta.
+
+    stock / index: daily returns on the session grid; event_pos: grid positions.
+    """
+    n_ev = len(event_pos)
+    est = event_pos[:, None] - ESTIMATION_GAP - ESTIMATION_WINDOW + np.arange(ESTIMATION_WINDOW)[None, :]
+    valid = (est >= 1)
+    est = np.clip(est, 0, len(stock) - 1)
+
+    y, x = stock[est], index[est]
+    m = valid & np.isfinite(y) & np.isfinite(x)
+    cnt = m.sum(axis=1)
+    y0, x0 = np.where(m, y, 0.0), np.where(m, x, 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx = x0.sum(axis=1) / cnt
+        my = y0.sum(axis=1) / cnt
+        dx = np.where(m, x - mx[:, None], 0.0)
+        dy = np.where(m, y - my[:, None], 0.0)
+        beta = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+        alpha = my - beta * mx
+
+    ok = cnt >= MIN_ESTIMATION_OBS
+    alpha[~ok], beta[~ok] = np.nan, np.nan
+
+    # 事件後 1..max(WINDOWS) 日異常報酬累加
+    h = max(WINDOWS)
+    fwd = event_pos[:, None] + np.arange(1, h + 1)[None, :]
+    inside = fwd < len(stock)
+    fwd = np.minimum(fwd, len(stock) - 1)
+    ar = stock[fwd] - alpha[:, None] - beta[:, None] * index[fwd]
+    ar = np.where(inside, ar, np.nan)
+    car = np.concatenate([np.zeros((n_ev, 1)), np.cumsum(ar, axis=1)], axis=1)
+
+    return np.round(car[:, WINDOWS] * 100, 2), alpha, beta
+
+def study_market(market, events):
+    """All events of one market: one download, array math for every window."""
+    index = MARKET_INDEX.get(market)
+    if not index or events.empty:
+        return None
 
-    df = pd.read_csv(BLACK_SWAN_CSV)
-    df["datetime"] = pd.to_datetime(df["datetime"])
-    df["date"] = df["datetime"].dt.date
+    cal = get_calendar(market)
+    event_pos = cal.positions(events["date"].to_numpy("datetime64[D]"))
 
-    records = []
+    lo = int(event_pos.min()) - ESTIMATION_GAP - ESTIMATION_WINDOW - 1
+    lo = max(lo, 0)
+    hi = int(event_pos.max()) + max(WINDOWS)
+    start = cal.session_at(lo)
+    end = cal.session_at(min(hi, len(cal.sessions) - 1)) + timedelta(days=1)
 
-    for _, row in df.iterrows():
-        market = row.get("market", "TW")
-        index = MARKET_INDEX.get(market)
+    symbols = [s for s in events["symbol"].dropna().astype(str).unique() if s != index]
+    prices = download([index] + symbols, start, end)
+    if index not in prices:
+        return None
 
-        if not index:
-            continue
+    out = events[["date", "market", "symbol", "level", "title"]].copy()
+    out["index"] = index
 
-        event_date = row["date"]
-        start = event_date - timedelta(days=3)
-        end = event_date + timedelta(days=15)
+    rets = calc_returns(prices[index], cal, event_pos)
+    for j, d in enumerate(WINDOWS):
+        out[f"ret_{d}d"] = rets[:, j]
 
-        price = get_price(index, start, end)
-        if price is None:
-            continue
+    # 📐 市場模型異常報酬（事件 symbol 相對大盤）
+    n = hi - lo + 1
+    idx_ret = pd.Series(on_grid(prices[index], cal, lo, n)).pct_change().to_numpy()
+    grid_pos = event_pos - lo
 
-        returns = calc_returns(price, pd.to_datetime(event_date))
+    car = np.full((len(out), len(WINDOWS)), np.nan)
+    beta = np.full(len(out), np.nan)
+    sym = out["symbol"].astype(str).to_numpy()
+    for s in symbols:
+        if s not in prices:
+            continue
+        rows = np.flatnonzero(sym == s)
+        stk_ret = pd.Series(on_grid(prices[s], cal, lo, n)).pct_change().to_numpy()
+        c, _, b = market_model(stk_ret, idx_ret, grid_pos[rows])
+        car[rows], beta[rows] = c, b
 
-        record = {
-            "date": event_date,
-            "market": market,
-            "symbol": row["symbol"],
-            "level": row["level"],
-            "title": row["title"],
-            "index": index,
-        }
-        record.update(returns)
-        records.append(record)
+    for j, d in enumerate(WINDOWS):
+        out[f"car_{d}d"] = car[:, j]
+    out["beta"] = np.round(beta, 3)
+    return out
 
-    if not records:
+# ===============================
+# Main
+# ===============================
+def run():
+    df = data_retention.read_csv(BLACK_SWAN_CSV)
+    if df.empty:
+        print("⚠️ No valid L4 events")
+        return
+    df["datetime"] = pd.to_datetime(df["datetime"])
+    df["date"] = df["datetime"].dt.normalize()
+    if "market" not in df.columns:
+        df["market"] = "TW"
+    df["market"] = df["market"].fillna("TW")
+
+    # 每個市場一次下載 + 一次陣列運算
+    frames = [study_market(m, g) for m, g in df.groupby("market", sort=False)]
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
         print("⚠️ No valid L4 events")
         return
 
-    out = pd.DataFrame(records)
+    out = pd.concat(frames).sort_index().reset_index(drop=True)
+    out["date"] = out["date"].dt.date
     out.to_csv(OUTPUT_CSV, index=False)
 
     # ===============================
@@ -103,21 +203,19 @@ def run():
     if DISCORD_WEBHOOK_URL:
         l4 = out[out["level"] == 4]
         if not l4.empty:
-            avg = l4[[c for c in out.columns if c.startswith("ret_")]].mean()
+            avg = l4[[c for c in out.columns if c.startswith(("ret_", "car_"))]].mean()
             msg = (
                 "📊 **L4 事件 × 市場影響統計**\n\n"
                 f"樣本數：{len(l4)}\n"
                 f"T+1 日：{avg['ret_1d']:.2f}%\n"
                 f"T+3 日：{avg['ret_3d']:.2f}%\n"
                 f"T+5 日：{avg['ret_5d']:.2f}%\n"
-                f"T+10 日：{avg['ret_10d']:.2f}%\n\n"
-                "（來源：歷史黑天鵝事件）"
-            )
-            requests.post(
-                DISCORD_WEBHOOK_URL,
-                json={"content": msg},
-                timeout=15
+                f"T+10 日：{avg['ret_10d']:.2f}%\n"
             )
+            if pd.notna(avg["car_5d"]):
+                msg += f"個股異常報酬 CAR（T+5 / T+10）：{avg['car_5d']:.2f}% / {avg['car_10d']:.2f}%\n"
+            msg += "\n（來源：歷史黑天鵝事件）"
+            send(DISCORD_WEBHOOK_URL, content=msg)
 
     print(f"✅ L4 market impact saved → {OUTPUT_CSV}")
 
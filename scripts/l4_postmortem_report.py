@@ -1,12 +1,8 @@
 import os
 import sys
-import csv
-import json
 import datetime
-import requests
 import warnings
 import yfinance as yf
-import pandas as pd
 
 warnings.filterwarnings("ignore")
 
@@ -18,27 +14,21 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 sys.path.append(BASE_DIR)
 
+from scripts.discord_notifier import send
+from scripts import risk_state, data_retention
+
 # ===============================
 # Environment
 # ===============================
 BLACK_SWAN_WEBHOOK_URL = os.getenv("BLACK_SWAN_WEBHOOK_URL", "").strip()
 
-L4_ACTIVE_FILE = os.path.join(DATA_DIR, "l4_active.flag")
-L4_LAST_END_FILE = os.path.join(DATA_DIR, "l4_last_end.flag")
 BLACK_SWAN_CSV = os.path.join(DATA_DIR, "black_swan_history.csv")
-POSTMORTEM_FLAG = os.path.join(DATA_DIR, "l4_postmortem_sent.flag")
 
 TZ = datetime.timezone(datetime.timedelta(hours=8))
 
 # ===============================
 # Helpers
 # ===============================
-def read_ts(path):
-    try:
-        return float(open(path).read().strip())
-    except:
-        return None
-
 def fmt(ts):
     return datetime.datetime.fromtimestamp(ts, TZ).strftime("%Y-%m-%d %H:%M")
 
@@ -70,35 +60,30 @@ def get_index_return(symbol, start_ts, end_ts):
 # ===============================
 def run():
     # 必須：L4 已結束、且還沒發過回顧
-    if os.path.exists(L4_ACTIVE_FILE):
+    state = risk_state.read()
+    if state["l4_active"]:
         return
-    if not os.path.exists(L4_LAST_END_FILE):
+    end_ts = state["l4_last_end"]
+    if not end_ts:
         return
-    if os.path.exists(POSTMORTEM_FLAG):
+    if state["postmortem_sent_for"] == end_ts:
         return
     if not BLACK_SWAN_WEBHOOK_URL:
         return
 
-    end_ts = read_ts(L4_LAST_END_FILE)
-    if not end_ts:
-        return
-
-    # 從黑天鵝紀錄反推最近一次 L4 start
-    if not os.path.exists(BLACK_SWAN_CSV):
-        return
+    # 從黑天鵝紀錄反推最近一次 L4 start（含已封存的月區段）
+    history = data_retention.read_csv(BLACK_SWAN_CSV, dtype=str, keep_default_na=False)
 
     rows = []
-    with open(BLACK_SWAN_CSV, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            try:
-                t = datetime.datetime.strptime(
-                    r["datetime"], "%Y-%m-%d %H:%M"
-                ).replace(tzinfo=TZ).timestamp()
-                if t <= end_ts:
-                    rows.append((t, r))
-            except:
-                continue
+    for r in history.to_dict("records"):
+        try:
+            t = datetime.datetime.strptime(
+                r["datetime"], "%Y-%m-%d %H:%M"
+            ).replace(tzinfo=TZ).timestamp()
+            if t <= end_ts:
+                rows.append((t, r))
+        except:
+            continue
 
     l4_rows = [r for t, r in rows if r["level"] == "4"]
     if not l4_rows:
@@ -153,14 +138,10 @@ def run():
         "📌 *提醒：僅為風險與市場監控，非投資建議*"
     )
 
-    requests.post(
-        BLACK_SWAN_WEBHOOK_URL,
-        json={"content": msg[:1900]},
-        timeout=15,
-    )
+    send(BLACK_SWAN_WEBHOOK_URL, content=msg)
 
-    # 標記已送出
-    open(POSTMORTEM_FLAG, "w").write(str(end_ts))
+    # 標記此次 L4 已送出
+    risk_state.update("l4_postmortem_report", postmortem_sent_for=end_ts)
 
 
 if __name__ == "__main__":
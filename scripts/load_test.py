@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from scripts import mock_services
+
+# ===============================
+# Latency Recorder
+# ===============================
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []
+        self.errors = 0
+
+    def wrap(self, fn, is_error=lambda r: r is None):
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            r = fn(*args, **kwargs)
+            dt = time.perf_counter() - t0
+            with self.lock:
+                self.samples.append(dt)
+                if is_error(r):
+                    self.errors += 1
+            return r
+        return timed
+
+    def summary(self, wall):
+        s = sorted(self.samples)
+
+        def pct(q):
+            if not s:
+                return None
+            return round(s[min(len(s) - 1, int(q * len(s)))] * 1000, 1)
+
+        return {
+            "calls": len(s),
+            "errors": self.errors,
+            "wall_sec": round(wall, 3),
+            "throughput_per_sec": round(len(s) / wall, 1) if wall > 0 else None,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": pct(1.0),
+        }
+
+# ===============================
+# Sandbox
+# ===============================
+def sandbox(base_url):
+    """Point every env-driven endpoint at the mock server and isolate data."""
+    tmp = tempfile.mkdtemp(prefix="sgs_load_")
+    os.environ["DISCORD_OUTBOX_DIR"] = os.path.join(tmp, "outbox")
+    os.environ["NEWS_RSS_BASE"] = f"{base_url}/rss/search"
+    os.environ["RISK_STATE_FILE"] = os.path.join(tmp, "risk_state.json")
+    for i, key in enumerate([
+        "DISCORD_WEBHOOK_URL", "NEWS_WEBHOOK_URL", "BLACK_SWAN_WEBHOOK_URL",
+        "DISCORD_WEBHOOK_TW", "DISCORD_WEBHOOK_US",
+    ]):
+        os.environ[key] = f"{base_url}/api/webhooks/{i}/mock"
+    return tmp
+
+def load(name):
+    mod = importlib.import_module(f"scripts.{name}")
+    return importlib.reload(mod)
+
+def patch_notifier(rec):
+    dn = load("discord_notifier")
+    dn.post = rec.wrap(dn.post, is_error=lambda r: r != "ok")
+    return dn
+
+def seed_history(tmp, n_symbols):
+    hs = load("history_store")
+    hs.DB_FILE = os.path.join(tmp, "history.db")
+    hs.HISTORY_CSV = {m: os.path.join(tmp, f"{m.lower()}_history.csv") for m in hs.HISTORY_CSV}
+    hs.OBSERVATION_CSV = os.path.join(tmp, "forecast_observation.csv")
+    hs.append_predictions("TW", [
+        {"date": "2025-12-26", "symbol": f"{1000 + i}.TW", "entry_price": 100.0,
+         "pred_ret": 0.01, "horizon": 5}
+        for i in range(n_symbols)
+    ])
+
+# ===============================
+# Scenarios
+# ===============================
+def scenario_news_radar(base_url, tmp, symbols=200, rounds=3):
+    seed_history(tmp, symbols)
+    rs = load("risk_state")
+    rs.LEGACY = {k: os.path.join(tmp, os.path.basename(v)) for k, v in rs.LEGACY.items()}
+    nr = load("news_radar")
+    nr.BLACK_SWAN_CSV = os.path.join(tmp, "black_swan_history.csv")
+    nr.DATA_DIR = tmp
+
+    rss = Recorder()
+    nr.get_news = rss.wrap(nr.get_news)
+    dn = patch_notifier(Recorder())
+
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        nr.run()
+    wall = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    dn.flush(120)
+    return {"rss": rss.summary(wall), "drain_sec": round(time.perf_counter() - t1, 3)}
+
+def scenario_news_burst(base_url, tmp, symbols=200, workers=16):
+    nr = load("news_radar")
+    rss = Recorder()
+    fetch = rss.wrap(nr.get_news)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(fetch, [str(1000 + i) for i in range(symbols)]))
+    return {"rss": rss.summary(time.perf_counter() - t0), "workers": workers}
+
+def scenario_reports(base_url, tmp, repeats=10):
+    for name in ["metrics_tw.csv", "metrics_us.csv"]:
+        with open(os.path.join(tmp, name), "w", encoding="utf-8") as f:
+            f.write("date,horizon,hit_rate,avg_return,cum_return,max_drawdown\n")
+            f.write("2025-12-26,5,0.55,0.004,0.08,-0.05\n")
+    perf_csv = os.path.join(tmp, "l4_ai_performance_history.csv")
+    with open(perf_csv, "w", encoding="utf-8") as f:
+        f.write("l4_end_time,l4_end_ts,tw_count,tw_win_rate,tw_avg_pred,us_count,us_win_rate,us_avg_pred\n")
+        f.write("2025-12-01 10:00,0,10,0.5,0.01,8,0.45,0.0\n")
+        f.write("2025-12-20 10:00,0,25,0.56,0.01,20,0.5,0.0\n")
+
+    calls = Recorder()
+    dn = patch_notifier(calls)
+
+    pdr = load("performance_discord_report")
+    pdr.FILES = {
+        "台股": os.path.join(tmp, "metrics_tw.csv"),
+        "美股": os.path.join(tmp, "metrics_us.csv"),
+    }
+    cmp_ = load("l4_ai_performance_compare")
+    cmp_.CSV_FILE = perf_csv
+
+    run_lat = Recorder()
+    jobs = [run_lat.wrap(pdr.main, lambda r: False), run_lat.wrap(cmp_.run, lambda r: False)]
+
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        for job in jobs:
+            job()
+    dn.flush(300)
+    wall = time.perf_counter() - t0
+
+    return {
+        "script_runs": run_lat.summary(wall),
+        "webhook_posts": calls.summary(wall),
+        "undelivered": dn.pending_count(),
+    }
+
+def scenario_notifier_burst(base_url, tmp, messages=60, webhooks=3, workers=8):
+    calls = Recorder()
+    dn = patch_notifier(calls)
+    urls = [f"{base_url}/api/webhooks/{100 + i}/burst" for i in range(webhooks)]
+
+    def one(i):
+        dn.send(urls[i % webhooks], content=f"burst message #{i}")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(one, range(messages)))
+    dn.flush(300)
+    wall = time.perf_counter() - t0
+
+    return {"webhook_posts": calls.summary(wall), "undelivered": dn.pending_count()}
+
+SCENARIOS = {
+    "news_radar": scenario_news_radar,
+    "news_burst": scenario_news_burst,
+    "reports": scenario_reports,
+    "notifier_burst": scenario_notifier_burst,
+}
+
+# ===============================
+# Main
+# ===============================
+def main():
+    ap = argparse.ArgumentParser(description="Load-test news / Discord paths against local mocks")
+    ap.add_argument("scenarios", nargs="*", default=list(SCENARIOS))
+    ap.add_argument("--latency-ms", type=float, nargs=2, default=(20, 120))
+    ap.add_argument("--error-rate", type=float, default=0.02)
+    ap.add_argument("--l3-rate", type=float, default=0.03)
+    ap.add_argument("--keep", action="store_true", help="keep sandbox directories")
+    args = ap.parse_args()
+
+    results = {}
+    for name in args.scenarios:
+        mix = dict(mock_services.DEFAULT_CONFIG["headline_mix"])
+        mix[0] += mix[3] - args.l3_rate
+        mix[3] = args.l3_rate
+
+        server, base = mock_services.start(
+            latency_ms=tuple(args.latency_ms),
+            error_rate=args.error_rate,
+            headline_mix=mix,
+        )
+        tmp = sandbox(base)
+        try:
+            print(f"▶️ {name} ...")
+            res = SCENARIOS[name](base, tmp)
+            res["server"] = mock_services.stats(server)
+            results[name] = res
+        finally:
+            server.shutdown()
+            if not args.keep:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
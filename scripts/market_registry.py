@@ -0,0 +1,138 @@
+import os
+import csv
+import json
+from functools import lru_cache
+
+# ===============================
+# Base / Registry
+# ===============================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+REGISTRY_FILE = os.getenv("MARKETS_FILE", os.path.join(DATA_DIR, "markets.json"))
+
+# 每個市場一筆設定；新增 JP / HK 只需加一筆：
+#   name / flag          顯示用
+#   enabled              pipeline_runner 是否執行
+#   suffixes             Yahoo 代號後綴（判斷 symbol 所屬市場；空 = 預設市場）
+#   timezone / hours     市場時區與盤中時段（當地時間）
+#   index                大盤指數（事件研究 / 衝擊分析）
+#   vix                  波動率指數（衝擊偵測；可省略）
+#   calendar             內建交易日規則（TW / US），或省略並提供 holidays 清單
+#   webhook_env          Discord webhook 環境變數名稱
+#   horizon              預測天數（交易日）
+#   universe_source      掛牌清單來源（universe_sync：twse / nasdaqtrader）
+#   core_watch / universe / core_title（universe 為無掛牌清單時的後備）
+DEFAULTS = {
+    "enabled": True,
+    "suffixes": [],
+    "timezone": "UTC",
+    "hours": ["09:00", "16:00"],
+    "index": None,
+    "vix": None,
+    "calendar": None,
+    "holidays": [],
+    "webhook_env": None,
+    "horizon": 5,
+    "core_watch": [],
+    "core_title": None,
+    "universe": [],
+    "universe_source": None,
+}
+
+@lru_cache(maxsize=None)
+def _load(path):
+    raw = json.load(open(path, "r", encoding="utf-8"))
+    out = {}
+    for code, cfg in raw.items():
+        m = dict(DEFAULTS)
+        m.update(cfg)
+        m["code"] = code
+        m.setdefault("name", code)
+        m.setdefault("flag", "")
+        m["core_title"] = m["core_title"] or f"{m['name']}核心監控（固定顯示）"
+        out[code] = m
+    return out
+
+def markets():
+    return _load(REGISTRY_FILE)
+
+def codes(enabled_only=True):
+    return [c for c, m in markets().items() if m["enabled"] or not enabled_only]
+
+def get(code):
+    try:
+        return markets()[code]
+    except KeyError:
+        raise KeyError(f"unknown market {code!r} (see {REGISTRY_FILE})") from None
+
+def webhook(code):
+    env = get(code)["webhook_env"]
+    return os.getenv(env, "").strip() if env else ""
+
+def pool_file(code):
+    return os.path.join(DATA_DIR, f"explorer_pool_{code.lower()}.json")
+
+def ranking_file(code):
+    # 每日成交量排名明細（可重建的快取，不進版控；pool 檔只記成員）
+    return os.path.join(DATA_DIR, "explorer_state", f"{code}_ranking.json")
+
+def ranked_pool(code):
+    """Explorer pool members by latest volume rank (pool order if no ranking is cached)."""
+    try:
+        members = json.load(open(pool_file(code), "r", encoding="utf-8")).get("symbols", [])
+    except (OSError, ValueError):
+        return []
+    try:
+        ranked = [r["symbol"] for r in json.load(open(ranking_file(code), "r", encoding="utf-8"))["ranking"]]
+    except (OSError, ValueError, KeyError):
+        return members
+    inside = set(members)
+    ordered = [s for s in ranked if s in inside]
+    return ordered + sorted(inside.difference(ordered))
+
+def universe_file(code):
+    return os.path.join(DATA_DIR, f"universe_{code.lower()}.csv")
+
+def universe(code):
+    """Listed symbols from the local universe file, else the registry's inline list."""
+    path = universe_file(code)
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            symbols = [r["symbol"] for r in csv.DictReader(f) if r.get("symbol")]
+        if symbols:
+            return symbols
+    return list(get(code)["universe"])
+
+def watch_list(code):
+    """Core watch + explorer pool + index / VIX, de-duplicated in that order."""
+    m = get(code)
+    symbols = list(m["core_watch"])
+    path = pool_file(code)
+    if os.path.exists(path):
+        try:
+            symbols += json.load(open(path, "r", encoding="utf-8")).get("symbols", [])
+        except Exception as e:
+            print(f"[WARN] {code} explorer pool unreadable: {e}")
+    symbols += [s for s in (m["index"], m["vix"]) if s]
+    return list(dict.fromkeys(symbols))
+
+# ===============================
+# Symbols
+# ===============================
+def market_of(symbol):
+    """Market whose suffix (or index) matches symbol; suffix-less markets are the fallback."""
+    fallback = None
+    for code, m in markets().items():
+        if symbol == m["index"] or any(symbol.endswith(s) for s in m["suffixes"]):
+            return code
+        if not m["suffixes"] and fallback is None:
+            fallback = code
+    return fallback
+
+def display(symbol, code=None):
+    m = get(code or market_of(symbol))
+    for s in m["suffixes"]:
+        if symbol.endswith(s):
+            return symbol[: -len(s)]
+    return symbol
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import runpy
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows：只記 tracemalloc
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.insert(0, BASE_DIR)
+
+# ===============================
+# Config（MEMORY_PROFILE=1 開啟；預設完全不做事）
+# ===============================
+REPORT_FILE = os.path.join(DATA_DIR, "memory_profile.json")   # 與 pipeline_timing.json 同層
+FRAMES = int(os.getenv("MEMORY_PROFILE_FRAMES", "8"))
+TOP_N = int(os.getenv("MEMORY_PROFILE_TOP", "15"))
+STAGE_TOP_N = 5
+
+MB = 1024 * 1024
+
+def enabled():
+    return os.getenv("MEMORY_PROFILE", "").strip() == "1"
+
+# ===============================
+# RSS（Linux 讀 /proc，其餘以 ru_maxrss 近似）
+# ===============================
+def rss_mb():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (MB if sys.platform == "darwin" else 1024), 1)
+
+# ===============================
+# Stage Recorder（可巢狀；外層 peak 會併入內層的峰值）
+# ===============================
+_stages = []
+_stack = []
+_owner = None
+_peak = 0          # 全程峰值（各 stage 會 reset_peak）
+_lock = threading.Lock()
+
+def start():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(FRAMES)
+
+REPO_DIR = os.path.join(BASE_DIR, "scripts")
+
+def _where(frame):
+    f = frame.filename
+    if f.startswith(BASE_DIR):
+        f = os.path.relpath(f, BASE_DIR)
+    elif "site-packages" in f:
+        f = f.split("site-packages" + os.sep, 1)[-1]
+    return f"{f}:{frame.lineno}"
+
+def _sites(stats, n):
+    """Top allocation sites, attributed to the innermost frame inside scripts/.
+
+    stats: Statistic / StatisticDiff grouped by "traceback"; `via` is the
+    innermost frame overall (e.g. the numpy / pandas call that allocated).
+    """
+    agg = {}
+    for s in stats:
+        size = getattr(s, "size_diff", s.size)
+        count = getattr(s, "count_diff", s.count)
+        frames = list(s.traceback)                      # 由舊到新
+        own = next((f for f in reversed(frames) if f.filename.startswith(REPO_DIR)), frames[-1])
+        site, via = _where(own), _where(frames[-1])
+        a = agg.setdefault(site, {"site": site, "bytes": 0, "count": 0, "via": {}})
+        a["bytes"] += size
+        a["count"] += count
+        a["via"][via] = a["via"].get(via, 0) + size
+
+    out = []
+    for a in sorted(agg.values(), key=lambda a: -a["bytes"])[:n]:
+        via = max(a["via"], key=a["via"].get)
+        out.append({
+            "site": a["site"],
+            "mb": round(a["bytes"] / MB, 2),
+            "count": a["count"],
+            **({"via": via} if via != a["site"] else {}),
+        })
+    return out
+
+def _snapshot():
+    """Snapshot without the profiler's own bookkeeping."""
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, os.path.abspath(__file__)),
+    ])
+
+def _fold_peak():
+    global _peak
+    _, peak = tracemalloc.get_traced_memory()
+    _peak = max(_peak, peak)
+    for f in _stack:
+        f["peak"] = max(f["peak"], peak)
+
+@contextmanager
+def stage(name):
+    """Record traced peak / retained growth / RSS of one stage (no-op unless enabled)."""
+    global _owner
+    if not enabled():
+        yield
+        return
+
+    start()
+    # tracemalloc 是全行程計數：只量單一執行緒的 stage，其他執行緒照常執行不記錄
+    me = threading.get_ident()
+    with _lock:
+        if _owner is None:
+            _owner = me
+        mine = _owner == me
+    if not mine:
+        yield
+        return
+
+    _fold_peak()
+    before = _snapshot()                 # 先拍快照，快照本身不計入本 stage
+    cur0, _ = tracemalloc.get_traced_memory()
+    frame = {"peak": cur0, "before": before}
+    _stack.append(frame)
+    tracemalloc.reset_peak()
+    rss0, t0 = rss_mb(), time.perf_counter()
+    try:
+        yield
+    finally:
+        _fold_peak()
+        _stack.pop()
+        cur1, _ = tracemalloc.get_traced_memory()
+        growth = _snapshot().compare_to(frame["before"], "traceback")
+        _stages.append({
+            "stage": name,
+            "depth": len(_stack),
+            "seconds": round(time.perf_counter() - t0, 3),
+            "peak_mb": round((frame["peak"] - cur0) / MB, 2),
+            "retained_mb": round((cur1 - cur0) / MB, 2),
+            "rss_before_mb": rss0,
+            "rss_after_mb": rss_mb(),
+            "top_growth": _sites([s for s in growth if s.size_diff > 0], STAGE_TOP_N),
+        })
+        if not _stack:
+            with _lock:
+                _owner = None
+
+# ===============================
+# Report
+# ===============================
+def report(entry):
+    """Write this process's profile to data/memory_profile.json, keyed by entry + args."""
+    if not enabled() or not tracemalloc.is_tracing():
+        return None
+    key = " ".join([entry] + sys.argv[1:])
+
+    _fold_peak()
+    snap = _snapshot()
+    payload = {
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+        "peak_traced_mb": round(_peak / MB, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_mb": rss_mb(),
+        "stages": list(_stages),
+        "top_sites": _sites(snap.statistics("traceback"), TOP_N),
+    }
+
+    reports = {}
+    if os.path.exists(REPORT_FILE):
+        try:
+            reports = json.load(open(REPORT_FILE, "r", encoding="utf-8"))
+        except Exception:
+            pass
+    reports[key] = payload
+    tmp = REPORT_FILE + ".tmp"
+    json.dump(reports, open(tmp, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+    os.replace(tmp, REPORT_FILE)
+
+    print(f"[Memory][{entry}] peak traced {payload['peak_traced_mb']} MB, peak RSS {payload['peak_rss_mb']} MB")
+    for s in sorted(_stages, key=lambda s: -s["peak_mb"])[:5]:
+        print(f"[Memory][{entry}]   {s['stage']}: peak +{s['peak_mb']} MB, retained {s['retained_mb']:+} MB")
+    return payload
+
+# ===============================
+# Main：python scripts/memory_profile.py scripts/<entry>.py [args...]
+# ===============================
+def main():
+    if len(sys.argv) < 2:
+        print("usage: memory_profile.py <script.py> [args...]")
+        sys.exit(2)
+
+    # 以 scripts.memory_profile 執行，與被測腳本內的 stage() 共用同一份紀錄
+    from scripts import memory_profile as mp
+
+    path = sys.argv[1]
+    entry = os.path.splitext(os.path.basename(path))[0]
+    os.environ["MEMORY_PROFILE"] = "1"
+    sys.argv = sys.argv[1:]
+    mp.start()
+
+    code = 0
+    try:
+        with mp.stage(entry):
+            runpy.run_path(path, run_name="__main__")
+    except SystemExit as e:
+        code = e.code
+    finally:
+        mp.report(entry)
+    sys.exit(code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
+
+from scripts import history_store, market_registry, data_retention
+
+# ===============================
+# Paths / Config
+# ===============================
+STATE_FILE = os.path.join(DATA_DIR, "metrics_state.json")
+POLICY_FILE = os.path.join(DATA_DIR, "horizon_policy.json")
+
+METRICS_FILES = {
+    m: os.path.join(DATA_DIR, f"metrics_{m.lower()}.csv")
+    for m in market_registry.codes(enabled_only=False)
+}
+
+WINDOW = 20          # 與 performance_dashboard.CHECK_WINDOW 一致
+SHORT_WINDOW = 7     # 與 performance_snapshot 預設一致
+
+# ===============================
+# Running Aggregates（每筆 O(1)）
+# ===============================
+class Aggregates:
+    def __init__(self, state=None):
+        state = state or {}
+        self.last_obs_id = state.get("last_obs_id", 0)
+        self.count = state.get("count", 0)
+        self.cum = state.get("cum", 1.0)
+        self.peak = state.get("peak", 1.0)
+        self.max_dd = state.get("max_dd", 0.0)
+        self.win = deque((tuple(x) for x in state.get("window", [])), maxlen=WINDOW)
+        self._rebuild()
+
+    def _rebuild(self):
+        # 載入時由視窗重算，避免浮點誤差跨次累積
+        items = list(self.win)
+        short = items[-SHORT_WINDOW:]
+        self.sum_ret = sum(r for r, _ in items)
+        self.sum_hit = sum(h for _, h in items)
+        self.short_ret = sum(r for r, _ in short)
+        self.short_hit = sum(h for _, h in short)
+        self.win_prod = 1.0
+        for r, _ in items:
+            self.win_prod *= 1 + r
+
+    def push(self, obs_id, ret, hit):
+        if len(self.win) >= SHORT_WINDOW:
+            r_out, h_out = self.win[-SHORT_WINDOW]
+            self.short_ret -= r_out
+            self.short_hit -= h_out
+
+        if len(self.win) == WINDOW:
+            r_out, h_out = self.win[0]
+            self.sum_ret -= r_out
+            self.sum_hit -= h_out
+            if 1 + r_out == 0:
+                self.win_prod = None
+            elif self.win_prod is not None:
+                self.win_prod /= 1 + r_out
+
+        self.win.append((ret, hit))
+        self.sum_ret += ret
+        self.sum_hit += hit
+        self.short_ret += ret
+        self.short_hit += hit
+        if self.win_prod is None:
+            self._rebuild()
+        else:
+            self.win_prod *= 1 + ret
+
+        self.count += 1
+        self.cum *= 1 + ret
+        self.peak = max(self.peak, self.cum)
+        self.max_dd = min(self.max_dd, self.cum / self.peak - 1)
+        self.last_obs_id = obs_id
+
+    def row(self, horizon):
+        n = len(self.win)
+        ns = min(n, SHORT_WINDOW)
+        return {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "horizon": horizon,
+            "count": self.count,
+            "window_count": n,
+            "hit_rate": round(self.sum_hit / n, 4),
+            "avg_return": round(self.sum_ret / n, 6),
+            "window_return": round(self.win_prod - 1, 6),
+            "cum_return": round(self.cum - 1, 6),
+            "max_drawdown": round(self.max_dd, 6),
+            "hit_rate_7": round(self.short_hit / ns, 4),
+            "avg_return_7": round(self.short_ret / ns, 6),
+            "last_obs_id": self.last_obs_id,
+        }
+
+    def state(self):
+        return {
+            "last_obs_id": self.last_obs_id,
+            "count": self.count,
+            "cum": self.cum,
+            "peak": self.peak,
+            "max_dd": self.max_dd,
+            "window": [list(x) for x in self.win],
+        }
+
+# ===============================
+# State IO
+# ===============================
+def load_state():
+    if os.path.exists(STATE_FILE):
+        try:
+            return json.load(open(STATE_FILE, "r", encoding="utf-8"))
+        except Exception:
+            pass
+    return {}
+
+def save_state(state):
+    tmp = STATE_FILE + ".tmp"
+    json.dump(state, open(tmp, "w", encoding="utf-8"), indent=2)
+    os.replace(tmp, STATE_FILE)
+
+def horizon_of(market):
+    try:
+        default = market_registry.get(market)["horizon"]
+        h = json.load(open(POLICY_FILE, "r", encoding="utf-8")).get(market, default)
+        return h.get("current", default) if isinstance(h, dict) else h
+    except Exception:
+        return 5
+
+# ===============================
+# Main
+# ===============================
+def update(market, state, db_id=None):
+    db_id = db_id or history_store.db_id()
+    prev = state.get(market) or {}
+    # 水位是 history.db 的 rowid：資料庫重建（CI 快取遺失）後改由全部觀測重算
+    if prev.get("db_id") != db_id:
+        prev = {}
+    agg = Aggregates(prev)
+
+    # 只讀取上次水位之後的新結算
+    new = history_store.read_observations(market, after_id=agg.last_obs_id)
+    new = new.dropna(subset=["real_ret", "hit"])
+    if new.empty:
+        state[market] = {**agg.state(), "db_id": db_id}
+        return None
+
+    for obs_id, ret, hit in zip(new["id"], new["real_ret"], new["hit"]):
+        agg.push(int(obs_id), float(ret), int(hit))
+
+    row = agg.row(horizon_of(market))
+    path = METRICS_FILES[market]
+    pd.DataFrame([row]).to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+    state[market] = {**agg.state(), "db_id": db_id}
+    return row
+
+def update_all():
+    state = load_state()
+    db_id = history_store.db_id()
+    rows = {m: update(m, state, db_id) for m in METRICS_FILES}
+    save_state(state)
+    return rows
+
+def window(market):
+    """Rows behind latest()'s window stats: the last WINDOW observations as (real_ret, hit)."""
+    rows = (load_state().get(market) or {}).get("window", [])
+    return pd.DataFrame(rows, columns=["real_ret", "hit"])
+
+def latest(market):
+    """Most recent materialized metrics row, or None."""
+    path = METRICS_FILES.get(market)
+    if not path:
+        return None
+    df = data_retention.read_csv(path)
+    return None if df.empty else df.iloc[-1].to_dict()
+
+if __name__ == "__main__":
+    for m, r in update_all().items():
+        print(m, r if r else "no new settlements")
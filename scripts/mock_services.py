@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+import urllib.parse
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+# ===============================
+# Defaults（可由 CLI / start() 覆寫）
+# ===============================
+DEFAULT_CONFIG = {
+    # RSS
+    "latency_ms": (20, 120),      # 每次回應延遲（均勻分布）
+    "error_rate": 0.02,           # 回傳 503 的機率
+    "items_per_feed": 5,
+    "headline_mix": {             # 頭條層級比例（0 = 一般新聞）
+        0: 0.90,
+        1: 0.04,
+        2: 0.03,
+        3: 0.03,
+    },
+    # Discord webhook bucket（接近真實：每 webhook 2 秒 5 次）
+    "webhook_limit": 5,
+    "webhook_window_sec": 2.0,
+    "webhook_latency_ms": (30, 80),
+    "webhook_global": False,      # True：所有 webhook 共用一個 bucket，429 標為 global
+    "seed": 42,
+}
+
+HEADLINES = {
+    0: ["{q} 法說會釋出展望", "{q} 營收月增", "{q} shares edge higher", "{q} announces new product"],
+    1: ["{q} 傳出裁員計畫", "{q} 工廠停產", "{q} 遭主管機關調查"],
+    2: ["{q} faces SEC lawsuit", "{q} 遭美方制裁", "{q} 債券違約風險升溫"],
+    3: ["{q} files for bankruptcy", "{q} 宣布下市", "{q} trading halt announced"],
+}
+
+# ===============================
+# Shared State
+# ===============================
+class MockState:
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.rng = random.Random(cfg["seed"])
+        self.lock = threading.Lock()
+        self.buckets = {}      # webhook path -> [window_start, used]
+        self.stats = {
+            "rss_requests": 0,
+            "rss_errors": 0,
+            "webhook_requests": 0,
+            "webhook_429": 0,
+            "webhook_messages": 0,
+            "webhook_embeds": 0,
+            "headline_levels": {str(k): 0 for k in HEADLINES},
+        }
+
+    def sleep_latency(self, key):
+        lo, hi = self.cfg[key]
+        with self.lock:
+            ms = self.rng.uniform(lo, hi)
+        time.sleep(ms / 1000)
+
+    def pick_level(self):
+        mix = self.cfg["headline_mix"]
+        with self.lock:
+            r = self.rng.random()
+        acc = 0.0
+        for level, p in sorted(mix.items()):
+            acc += p
+            if r < acc:
+                return int(level)
+        return 0
+
+    def take_token(self, path):
+        """Fixed-window bucket. Returns (allowed, remaining, reset_after)."""
+        now = time.monotonic()
+        limit, window = self.cfg["webhook_limit"], self.cfg["webhook_window_sec"]
+        with self.lock:
+            start, used = self.buckets.get(path, (now, 0))
+            if now - start >= window:
+                start, used = now, 0
+            # 與 Discord 相同以毫秒為單位，無條件進位（照 header 等待即不會提早）
+            reset_after = math.ceil(max(0.0, window - (now - start)) * 1000) / 1000
+            if used >= limit:
+                self.buckets[path] = (start, used)
+                return False, 0, reset_after
+            used += 1
+            self.buckets[path] = (start, used)
+            return True, limit - used, reset_after
+
+    def bump(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+# ===============================
+# RSS Feed
+# ===============================
+def render_rss(state, q):
+    now = time.time()
+    items = []
+    for i in range(state.cfg["items_per_feed"]):
+        level = state.pick_level()
+        with state.lock:
+            state.stats["headline_levels"][str(level)] += 1
+            title = state.rng.choice(HEADLINES[level]).format(q=q)
+        items.append(
+            "<item>"
+            f"<title>{title} - MockWire</title>"
+            f"<link>http://mock.local/news/{urllib.parse.quote(q)}/{i}</link>"
+            f"<pubDate>{formatdate(now - i * 600, usegmt=True)}</pubDate>"
+            "</item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0"><channel><title>Mock News</title>'
+        + "".join(items)
+        + "</channel></rss>"
+    ).encode("utf-8")
+
+# ===============================
+# HTTP Handler
+# ===============================
+class Handler(BaseHTTPRequestHandler):
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body=b"", headers=None, ctype="application/json"):
+        self.send_response(code)
+        if body:
+            self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+
+        if url.path == "/stats":
+            with self.state.lock:
+                body = json.dumps(self.state.stats).encode("utf-8")
+            return self._send(200, body)
+
+        if url.path.startswith("/rss"):
+            st = self.state
+            st.bump("rss_requests")
+            st.sleep_latency("latency_ms")
+            with st.lock:
+                fail = st.rng.random() < st.cfg["error_rate"]
+            if fail:
+                st.bump("rss_errors")
+                return self._send(503, b"Service Unavailable", ctype="text/plain")
+
+            q = urllib.parse.parse_qs(url.query).get("q", ["MOCK"])[0]
+            return self._send(200, render_rss(st, q), ctype="application/rss+xml")
+
+        self._send(404)
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if not url.path.startswith("/api/webhooks/"):
+            return self._send(404)
+
+        st = self.state
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        st.bump("webhook_requests")
+        st.sleep_latency("webhook_latency_ms")
+
+        is_global = st.cfg["webhook_global"]
+        allowed, remaining, reset_after = st.take_token("global" if is_global else url.path)
+        headers = {
+            "X-RateLimit-Limit": str(st.cfg["webhook_limit"]),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Bucket": f"mock-{abs(hash(url.path)) % 10**8:08d}",
+        }
+
+        if not allowed:
+            st.bump("webhook_429")
+            headers["Retry-After"] = str(max(1, round(reset_after)))
+            headers["X-RateLimit-Scope"] = "global" if is_global else "shared"
+            if is_global:
+                headers["X-RateLimit-Global"] = "true"
+            body = json.dumps({
+                "message": "You are being rate limited.",
+                "retry_after": round(reset_after, 3),
+                "global": is_global,
+            }).encode("utf-8")
+            return self._send(429, body, headers)
+
+        st.bump("webhook_messages")
+        ctype = self.headers.get("Content-Type", "")
+        if ctype.startswith("application/json"):
+            try:
+                st.bump("webhook_embeds", len(json.loads(raw).get("embeds", [])))
+            except Exception:
+                return self._send(400, b'{"message": "Cannot send an empty message"}')
+
+        self._send(204, headers=headers)
+
+# ===============================
+# Server Control
+# ===============================
+def start(port=0, **overrides):
+    """Start the mock server in a background thread. Returns (server, base_url)."""
+    cfg = dict(DEFAULT_CONFIG, **overrides)
+    handler = type("MockHandler", (Handler,), {"state": MockState(cfg)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+def stats(server):
+    st = server.RequestHandlerClass.state
+    with st.lock:
+        return json.loads(json.dumps(st.stats))
+
+def main():
+    ap = argparse.ArgumentParser(description="Local mock Google News RSS + Discord webhook")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, nargs=2, default=DEFAULT_CONFIG["latency_ms"])
+    ap.add_argument("--error-rate", type=float, default=DEFAULT_CONFIG["error_rate"])
+    ap.add_argument("--l3-rate", type=float, default=DEFAULT_CONFIG["headline_mix"][3])
+    ap.add_argument("--webhook-limit", type=int, default=DEFAULT_CONFIG["webhook_limit"])
+    ap.add_argument("--webhook-window", type=float, default=DEFAULT_CONFIG["webhook_window_sec"])
+    args = ap.parse_args()
+
+    mix = dict(DEFAULT_CONFIG["headline_mix"])
+    mix[0] += mix[3] - args.l3_rate
+    mix[3] = args.l3_rate
+
+    server, base = start(
+        args.port,
+        latency_ms=tuple(args.latency_ms),
+        error_rate=args.error_rate,
+        headline_mix=mix,
+        webhook_limit=args.webhook_limit,
+        webhook_window_sec=args.webhook_window,
+    )
+    print(f"🧪 Mock services on {base}")
+    print(f"   NEWS_RSS_BASE={base}/rss/search")
+    print(f"   BLACK_SWAN_WEBHOOK_URL={base}/api/webhooks/0/mock")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
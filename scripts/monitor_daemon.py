@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import datetime
+import threading
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.insert(0, BASE_DIR)
+
+from scripts.safe_yfinance import safe_download
+from scripts import market_registry, risk_state, news_radar, trading_calendar, shock_detector
+
+# ===============================
+# Config
+# ===============================
+POLL_SECONDS = int(os.getenv("MONITOR_POLL_SECONDS", "300"))
+NEWS_SECONDS = int(os.getenv("MONITOR_NEWS_SECONDS", "1800"))   # 0 = 不跑新聞雷達
+INTERVAL = os.getenv("MONITOR_INTERVAL", "5m")
+CAPACITY = int(os.getenv("MONITOR_CAPACITY", "240"))            # 每市場保留的 bar 數（固定記憶體）
+
+HEARTBEAT_FILE = os.path.join(DATA_DIR, "monitor_heartbeat.json")
+
+# ===============================
+# Rolling Price State（環形緩衝，只追加新 bar）
+# ===============================
+class RollingPrices:
+    """Fixed-capacity bar buffer for one market.
+
+    Keeps the last `capacity` bars of close / volume for a fixed symbol
+    list plus the forward-filled last close and today's open / volume,
+    so each poll only touches the new bars.
+    """
+
+    def __init__(self, symbols, tz, capacity=CAPACITY):
+        self.symbols = list(symbols)
+        self.col = {s: i for i, s in enumerate(self.symbols)}
+        self.tz = ZoneInfo(tz)
+        self.capacity = capacity
+
+        n = len(self.symbols)
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.close = np.full((capacity, n), np.nan, dtype=np.float32)
+        self.volume = np.zeros((capacity, n), dtype=np.float32)
+        self.size = 0
+        self.head = 0                     # 下一個寫入位置
+
+        self.last = np.full(n, np.nan, dtype=np.float32)
+        self.day_open = np.full(n, np.nan, dtype=np.float32)
+        self.day_volume = np.zeros(n, dtype=np.float32)
+        self.last_ts = 0
+        self.day = None
+
+    def _frame(self, data, field):
+        if isinstance(data.columns, pd.MultiIndex):
+            cols = [(s, field) for s in self.symbols]
+            return data.reindex(columns=pd.MultiIndex.from_tuples(cols))
+        return data[[field]].reindex(columns=[field])
+
+    def append(self, data):
+        """Add bars newer than the last seen one. Returns #bars added."""
+        if data is None or data.empty:
+            return 0
+        idx = pd.DatetimeIndex(data.index)
+        if idx.tz is None:
+            idx = idx.tz_localize("UTC")
+        stamps = idx.as_unit("s").asi8
+        new = stamps > self.last_ts
+        if not new.any():
+            return 0
+
+        close = self._frame(data, "Close").to_numpy(np.float32)[new]
+        opens = self._frame(data, "Open").to_numpy(np.float32)[new]
+        volume = np.nan_to_num(self._frame(data, "Volume").to_numpy(np.float32)[new])
+        days = idx[new].tz_convert(self.tz).date
+        stamps = stamps[new]
+
+        for i in range(len(stamps)):
+            if days[i] != self.day:
+                # 換日：重設當日開盤 / 累計量
+                self.day = days[i]
+                self.day_open[:] = np.nan
+                self.day_volume[:] = 0
+            row = close[i]
+            self.last = np.where(np.isnan(row), self.last, row)
+            self.day_open = np.where(np.isnan(self.day_open), opens[i], self.day_open)
+            self.day_volume += volume[i]
+
+            self.ts[self.head] = stamps[i]
+            self.close[self.head] = row
+            self.volume[self.head] = volume[i]
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+        self.last_ts = int(stamps[-1])
+        return len(stamps)
+
+# ===============================
+# Per-market Monitor
+# ===============================
+def _pool_mtime(code):
+    try:
+        return os.path.getmtime(market_registry.pool_file(code))
+    except OSError:
+        return None
+
+class MarketMonitor:
+    def __init__(self, code):
+        self.m = market_registry.get(code)
+        self.code = code
+        self.state = None
+        self.base = None
+        self.pool_mtime = None
+        self.last_eval = {}
+
+    def _reset(self, now):
+        self.pool_mtime = _pool_mtime(self.code)
+        symbols = market_registry.watch_list(self.code)
+        self.state = RollingPrices(symbols, self.m["timezone"])
+        # 日線基準（均值 / 標準差 / 均量 / 昨收）每個交易日只算一次
+        today = now.astimezone(self.state.tz).date()
+        self.base = shock_detector.load_baseline(self.code, symbols, before=today)
+
+    def poll(self, now):
+        """Fetch new bars through the data layer. Returns #bars added."""
+        if self.state is None or self.base is None or _pool_mtime(self.code) != self.pool_mtime:
+            self._reset(now)
+            if self.base is None:
+                return 0
+        period = "5d" if self.state.size == 0 else "1d"
+        data = safe_download(self.state.symbols, period=period, interval=INTERVAL)
+        return self.state.append(data)
+
+    def evaluate(self):
+        """One array pass over the whole watch list → market verdict."""
+        st = self.state
+        metrics = shock_detector.scan(self.base, st.last, st.day_open, st.day_volume)
+        verdict = shock_detector.assess(metrics, st.symbols, self.m["index"], self.m["vix"])
+        self.last_eval = {k: verdict[k] for k in ("breadth", "index_ret", "vix_ret", "l1", "reasons")}
+        self.last_eval["l2"] = len(verdict["l2"])
+        return verdict
+
+# ===============================
+# Daemon Loop
+# ===============================
+class Daemon:
+    def __init__(self, codes):
+        self.monitors = {c: MarketMonitor(c) for c in codes}
+        self.stop = threading.Event()
+        self.last_news = 0.0
+        self.ticks = 0
+
+    def tick(self):
+        now = datetime.datetime.now(news_radar.TZ)
+        ts = now.timestamp()
+        status = {}
+
+        # 🔁 L4 到期檢查（與 news_radar 相同政策）
+        with risk_state.transaction("monitor_daemon") as state:
+            recovered = news_radar.try_recover(state, ts) == "recovered"
+        if recovered:
+            news_radar.announce_recovery(now)
+
+        for code, mon in self.monitors.items():
+            if not trading_calendar.is_open(code, now):
+                # 收盤後清空，下個盤中重新建立（含新的 explorer pool）
+                mon.state = mon.base = None
+                status[code] = {"open": False}
+                continue
+            try:
+                added = mon.poll(now)
+                if mon.base is None:
+                    status[code] = {"open": True, "error": "baseline unavailable"}
+                    continue
+                verdict = mon.evaluate()
+                # 同一市場同一交易日只記一次 L3（與排程掃描共用去重）
+                level = shock_detector.report(mon.m, verdict, mon.state.day, now, "monitor_daemon")
+            except Exception as e:
+                print(f"[ERROR][{code}] monitor tick failed: {e}")
+                status[code] = {"open": True, "error": str(e)}
+                continue
+
+            if level:
+                print(f"[Monitor][{code}] shock L{level}: {', '.join(verdict['reasons'])}")
+            status[code] = {"open": True, "bars_added": added, "bars": mon.state.size, **mon.last_eval}
+
+        if NEWS_SECONDS and ts - self.last_news >= NEWS_SECONDS:
+            self.last_news = ts
+            try:
+                news_radar.run()
+            except Exception as e:
+                print(f"[ERROR] news_radar failed: {e}")
+
+        self.ticks += 1
+        self.heartbeat(now, status)
+
+    def heartbeat(self, now, status):
+        payload = {
+            "updated_at": now.isoformat(timespec="seconds"),
+            "pid": os.getpid(),
+            "ticks": self.ticks,
+            "mode": risk_state.mode(),
+            "markets": status,
+        }
+        tmp = HEARTBEAT_FILE + ".tmp"
+        json.dump(payload, open(tmp, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+        os.replace(tmp, HEARTBEAT_FILE)
+
+    def run(self, once=False):
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: self.stop.set())
+
+        print(f"[Monitor] markets={list(self.monitors)} poll={POLL_SECONDS}s interval={INTERVAL}")
+        while not self.stop.is_set():
+            t0 = time.monotonic()
+            self.tick()
+            if once:
+                break
+            self.stop.wait(max(0.0, POLL_SECONDS - (time.monotonic() - t0)))
+        print("[Monitor] stopped")
+
+def main():
+    ap = argparse.ArgumentParser(description="Resident intraday risk monitor")
+    ap.add_argument("--markets", nargs="*", help="market codes (default: all enabled)")
+    ap.add_argument("--once", action="store_true", help="run a single tick and exit")
+    args = ap.parse_args()
+    Daemon(args.markets or market_registry.codes()).run(once=args.once)
+
+if __name__ == "__main__":
+    main()
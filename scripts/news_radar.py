@@ -1,5 +1,4 @@
-import os, sys, json, csv, warnings, datetime, requests, feedparser, urllib.parse, subprocess
-import pandas as pd
+import os, sys, csv, warnings, datetime, feedparser, urllib.parse, subprocess
 
 # ===============================
 # Base / Data
@@ -9,18 +8,18 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 sys.path.append(BASE_DIR)
 
+from scripts.discord_notifier import send, flush
+from scripts import history_store, risk_state, market_registry, contagion
+
 # ===============================
-# Webhook / Flags
+# Webhook / Data
 # ===============================
 NEWS_WEBHOOK_URL = os.getenv("NEWS_WEBHOOK_URL", "").strip()
 BLACK_SWAN_WEBHOOK_URL = os.getenv("BLACK_SWAN_WEBHOOK_URL", "").strip()
+NEWS_RSS_BASE = os.getenv("NEWS_RSS_BASE", "https://news.google.com/rss/search").strip()
 
-L4_ACTIVE_FILE = os.path.join(DATA_DIR, "l4_active.flag")
-L3_WARNING_FILE = os.path.join(DATA_DIR, "l3_warning.flag")
-OBS_FLAG_FILE = os.path.join(DATA_DIR, "l4_last_end.flag")
-
-CACHE_FILE = os.path.join(DATA_DIR, "news_cache.json")
 BLACK_SWAN_CSV = os.path.join(DATA_DIR, "black_swan_history.csv")
+EVENT_FIELDS = ["datetime", "market", "symbol", "level", "source", "title"]
 
 TZ = datetime.timezone(datetime.timedelta(hours=8))
 warnings.filterwarnings("ignore")
@@ -30,11 +29,23 @@ warnings.filterwarnings("ignore")
 # ===============================
 L4_TIME_WINDOW_HOURS = 6
 L4_TRIGGER_COUNT = 2
-L4_BASE_PAUSE_HOURS = 24
+L4_BASE_PAUSE_HOURS = 24        # l4_dynamic_pause 未產生政策時的預設
 
 L4_COOLDOWN_HOURS = 12          # 🔒 L4 結束後冷卻期（防抖動）
 L4_EXIT_L3_THRESHOLD = 1        # 🔍 L4 結束前，最近 L3 次數門檻
 L4_EXIT_LOOKBACK_HOURS = 6
+L4_EXTEND_HOURS = 12            # 🔥 未降溫時 L4 延長時數
+
+# 政策參數（risk_policy_replay 以不同組合重播同一套邏輯）
+POLICY = {
+    "window_hours": L4_TIME_WINDOW_HOURS,
+    "trigger_count": L4_TRIGGER_COUNT,
+    "base_pause_hours": L4_BASE_PAUSE_HOURS,
+    "cooldown_hours": L4_COOLDOWN_HOURS,
+    "exit_l3_threshold": L4_EXIT_L3_THRESHOLD,
+    "exit_lookback_hours": L4_EXIT_LOOKBACK_HOURS,
+    "extend_hours": L4_EXTEND_HOURS,
+}
 
 DISCLAIMER = "📌 僅為風險與市場監控，非投資建議"
 
@@ -55,23 +66,86 @@ def get_black_swan_level(title: str) -> int:
     return 0
 
 # ===============================
-# Cache Helpers
+# Risk Policy（news_radar / monitor_daemon 共用，於 risk_state transaction 內呼叫）
 # ===============================
-def load_cache():
-    if os.path.exists(CACHE_FILE):
-        try:
-            return json.load(open(CACHE_FILE, "r", encoding="utf-8"))
-        except:
-            pass
-    return {
-        "_l3_events": [],
-        "_l4_pause_until": 0,
-        "_l4_recovered_at": 0
-    }
-
-def save_cache(c):
-    json.dump(c, open(CACHE_FILE, "w", encoding="utf-8"),
-              ensure_ascii=False, indent=2)
+def try_recover(state, ts, policy=POLICY):
+    """L4 auto recover: "recovered", "extended" or None."""
+    if not state["l4_active"] or ts <= state["l4_pause_until"]:
+        return None
+
+    recent_l3 = [
+        t for t in state["l3_events"]
+        if ts - t <= policy["exit_lookback_hours"] * 3600
+    ]
+
+    if len(recent_l3) <= policy["exit_l3_threshold"]:
+        state["l4_active"] = False
+        state["l4_last_end"] = ts
+        state["l4_recovered_at"] = ts
+        return "recovered"
+
+    # 🔥 延長 L4
+    state["l4_pause_until"] += policy["extend_hours"] * 3600
+    return "extended"
+
+def record_l3(state, ts, policy=POLICY):
+    """Record one L3 event; returns True when it escalates to L4."""
+    state["l3_events"].append(ts)
+    state["l3_events"] = [
+        t for t in state["l3_events"]
+        if ts - t <= policy["window_hours"] * 3600
+    ]
+
+    # L4 升級（含冷卻期）
+    in_cooldown = (
+        ts - (state["l4_recovered_at"] or 0)
+        < policy["cooldown_hours"] * 3600
+    )
+
+    if (
+        not state["l4_active"]
+        and not in_cooldown
+        and len(state["l3_events"]) >= policy["trigger_count"]
+    ):
+        pause_hours = state["pause_policy"].get("pause_hours", policy["base_pause_hours"])
+        state["l4_active"] = True
+        state["l4_since"] = ts
+        state["l4_pause_until"] = ts + pause_hours * 3600
+        return True
+    return False
+
+def log_events(rows):
+    """Append events to black_swan_history.csv (shared by news / market-data detectors)."""
+    if not rows:
+        return
+    new = not os.path.exists(BLACK_SWAN_CSV) or os.path.getsize(BLACK_SWAN_CSV) <= 1
+    with open(BLACK_SWAN_CSV, "w" if new else "a", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=EVENT_FIELDS, extrasaction="ignore")
+        if new:
+            w.writeheader()
+        w.writerows(rows)
+
+def announce_recovery(now):
+    send(
+        BLACK_SWAN_WEBHOOK_URL,
+        content=(
+            "📊 **L4 黑天鵝事件結束（風險降溫）**\n"
+            f"🕒 {now:%Y-%m-%d %H:%M}\n\n"
+            f"{DISCLAIMER}"
+        ),
+    )
+    # 先送出結束通知，再交給子程序發報告
+    flush()
+
+    subprocess.run(["python", "scripts/l4_ai_performance_report.py"])
+    subprocess.run(["python", "scripts/l4_ai_performance_compare.py"])
+
+def contagion_line(symbol):
+    try:
+        peers = contagion.neighbors(symbol)
+    except Exception:
+        return ""
+    return "、".join(f"{market_registry.display(p)}（ρ {c:.2f}）" for p, c in peers)
 
 # ===============================
 # News Fetch
@@ -79,7 +153,7 @@ def save_cache(c):
 def get_news(q):
     try:
         url = (
-            "https://news.google.com/rss/search?"
+            f"{NEWS_RSS_BASE}?"
             f"q={urllib.parse.quote(q)}&hl=zh-TW&gl=TW&ceid=TW:zh-TW"
         )
         feed = feedparser.parse(url)
@@ -104,115 +178,77 @@ def get_news(q):
 def run():
     now = datetime.datetime.now(TZ)
     ts = now.timestamp()
-    cache = load_cache()
 
     # ===============================
     # 🔁 L4 Auto Recover（強化版）
     # ===============================
-    if os.path.exists(L4_ACTIVE_FILE) and ts > cache["_l4_pause_until"]:
-        recent_l3 = [
-            t for t in cache["_l3_events"]
-            if ts - t <= L4_EXIT_LOOKBACK_HOURS * 3600
-        ]
-
-        if len(recent_l3) <= L4_EXIT_L3_THRESHOLD:
-            os.remove(L4_ACTIVE_FILE)
-            open(OBS_FLAG_FILE, "w").write(str(ts))
-            cache["_l4_recovered_at"] = ts
-
-            if BLACK_SWAN_WEBHOOK_URL:
-                requests.post(
-                    BLACK_SWAN_WEBHOOK_URL,
-                    json={
-                        "content": (
-                            "📊 **L4 黑天鵝事件結束（風險降溫）**\n"
-                            f"🕒 {now:%Y-%m-%d %H:%M}\n\n"
-                            f"{DISCLAIMER}"
-                        )
-                    },
-                    timeout=15,
-                )
-
-            subprocess.run(["python", "scripts/l4_ai_performance_report.py"])
-            subprocess.run(["python", "scripts/l4_ai_performance_compare.py"])
-        else:
-            # 🔥 延長 L4
-            cache["_l4_pause_until"] += 12 * 3600
+    with risk_state.transaction("news_radar") as state:
+        recovered = try_recover(state, ts) == "recovered"
+
+    if recovered:
+        announce_recovery(now)
 
     # ===============================
-    # 今日 AI 標的
+    # 今日 AI 標的（新聞抓取不持有狀態鎖）
     # ===============================
-    symbols = []
-    for f in ["tw_history.csv", "us_history.csv"]:
-        p = os.path.join(DATA_DIR, f)
-        if os.path.exists(p):
-            df = pd.read_csv(p)
-            latest = df["date"].max()
-            symbols += df[df["date"] == latest]["symbol"].tolist()
-
-    black_embeds = []
+    symbols = history_store.latest_symbols()
 
+    found = []
     for s in set(symbols):
         news = get_news(s.split(".")[0])
         if not news:
             continue
+        found.append((s, news, get_black_swan_level(news["title"])))
 
-        level = get_black_swan_level(news["title"])
-        final_level = level
+    black_embeds = []
+    events = []
 
-        # ===============================
-        # L3 記錄
-        # ===============================
-        if level == 3:
-            cache["_l3_events"].append(ts)
-            cache["_l3_events"] = [
-                t for t in cache["_l3_events"]
-                if ts - t <= L4_TIME_WINDOW_HOURS * 3600
-            ]
+    with risk_state.transaction("news_radar") as state:
+        for s, news, level in found:
+            final_level = level
 
             # ===============================
-            # L4 升級（含冷卻期）
+            # L3 記錄 / L4 升級
             # ===============================
-            in_cooldown = (
-                ts - cache.get("_l4_recovered_at", 0)
-                < L4_COOLDOWN_HOURS * 3600
-            )
-
-            if (
-                not os.path.exists(L4_ACTIVE_FILE)
-                and not in_cooldown
-                and len(cache["_l3_events"]) >= L4_TRIGGER_COUNT
-            ):
+            if level == 3 and record_l3(state, ts):
                 final_level = 4
-                cache["_l4_pause_until"] = ts + L4_BASE_PAUSE_HOURS * 3600
-                open(L4_ACTIVE_FILE, "w").write(str(ts))
-
-        # ===============================
-        # Discord Embed
-        # ===============================
-        if final_level >= 3:
-            black_embeds.append({
-                "title": f"{s} | 黑天鵝 L{final_level}",
-                "url": news["link"],
-                "color": 0x8E0000,
-                "fields": [{
+
+            # ===============================
+            # Discord Embed
+            # ===============================
+            if final_level >= 3:
+                events.append({
+                    "datetime": f"{now:%Y-%m-%d %H:%M}",
+                    "market": market_registry.market_of(s),
+                    "symbol": s,
+                    "level": final_level,
+                    "source": "news",
+                    "title": news["title"],
+                })
+                fields = [{
                     "name": f"🚨 黑天鵝 L{final_level}",
                     "value": f"[{news['title']}]({news['link']})\n🕒 {news['time']}",
                     "inline": False
                 }]
-            })
+                exposed = contagion_line(s)
+                if exposed:
+                    fields.append({"name": "🔗 高連動標的", "value": exposed, "inline": False})
+
+                black_embeds.append({
+                    "title": f"{s} | 黑天鵝 L{final_level}",
+                    "url": news["link"],
+                    "color": 0x8E0000,
+                    "fields": fields,
+                })
 
-    if black_embeds and BLACK_SWAN_WEBHOOK_URL:
-        requests.post(
+    log_events(events)
+
+    if black_embeds:
+        send(
             BLACK_SWAN_WEBHOOK_URL,
-            json={
-                "content": f"🚨 **黑天鵝警報**\n\n{DISCLAIMER}",
-                "embeds": black_embeds[:10]
-            },
-            timeout=15,
+            content=f"🚨 **黑天鵝警報**\n\n{DISCLAIMER}",
+            embeds=black_embeds,
         )
 
-    save_cache(cache)
-
 if __name__ == "__main__":
     run()
@@ -1,8 +1,6 @@
 import os
+import sys
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-import requests
 from datetime import datetime
 
 # ===============================
@@ -10,84 +8,114 @@ from datetime import datetime
 # ===============================
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
 
-TW_HISTORY = os.path.join(DATA_DIR, "tw_history.csv")
-US_HISTORY = os.path.join(DATA_DIR, "us_history.csv")
+from scripts.discord_notifier import send
+from scripts import history_store, metrics_materializer, chart_renderer, rolling_stats, significance
+from scripts import market_registry, risk_state
 
 POLICY_FILE = os.path.join(DATA_DIR, "horizon_policy.json")
-L3_FLAG = os.path.join(DATA_DIR, "l3_warning.flag")
 
 DISCORD_URL = os.getenv("DISCORD_WEBHOOK_URL", "").strip()
 
 # ===============================
 # Config
 # ===============================
-CHECK_WINDOW = 20
+CHECK_WINDOW = metrics_materializer.WINDOW
 HIT_RATE_WARN = 0.45
 HIT_RATE_L3 = 0.40
 L3_CONSECUTIVE_DAYS = 3
 
+# 命中率低於門檻且 bootstrap 顯示「真實命中率仍達門檻」的機率 < ALPHA 才調整
+SIGNIFICANCE_ALPHA = 0.10
+
 # ===============================
 def load_policy():
-    if not os.path.exists(POLICY_FILE):
-        return {"TW": 5, "US": 5}
-    return json.load(open(POLICY_FILE, "r", encoding="utf-8"))
+    policy = {c: market_registry.get(c)["horizon"] for c in market_registry.codes()}
+    if os.path.exists(POLICY_FILE):
+        policy.update(json.load(open(POLICY_FILE, "r", encoding="utf-8")))
+    return policy
 
 def save_policy(p):
     json.dump(p, open(POLICY_FILE, "w", encoding="utf-8"), indent=2)
 
 # ===============================
-def calc_equity(df):
-    df = df.dropna(subset=["real_ret", "hit"])
-    if len(df) < CHECK_WINDOW:
+def calc_equity(label):
+    # 命中率 / 視窗報酬由 metrics materializer 增量維護
+    metrics = metrics_materializer.latest(label)
+    if not metrics or metrics["window_count"] < CHECK_WINDOW:
         return None
 
-    recent = df.tail(CHECK_WINDOW).copy()
+    # 命中率點估計、bootstrap 與權益曲線共用 materializer 的同一個視窗
+    recent = metrics_materializer.window(label)
+    if len(recent) < CHECK_WINDOW:
+        return None
     recent["equity"] = (1 + recent["real_ret"]).cumprod()
-    hit_rate = recent["hit"].mean()
-    return recent, hit_rate
+    return recent, metrics
 
 # ===============================
-def plot_equity(df, label):
-    plt.figure(figsize=(6, 3))
-    plt.plot(df["equity"], linewidth=2)
-    plt.title(f"{label} Equity Curve（最近 {CHECK_WINDOW} 筆）")
-    plt.tight_layout()
+def window_summary(table, label):
+    rows = table[table["market"] == label]
+    if rows.empty:
+        return "資料不足"
+    return "\n".join(
+        f"{int(r.window)} 筆：命中 {r.hit_rate:.0%} ｜ 累積 {r.cum_return:+.2%} ｜ 回撤 {r.max_drawdown:+.2%}"
+        for r in rows.itertuples()
+        if r.count >= r.window
+    ) or "資料不足"
 
-    out = os.path.join(DATA_DIR, f"equity_{label}.png")
-    plt.savefig(out)
-    plt.close()
-    return out
+# ===============================
+def ci_summary(ci, p_warn):
+    h, m, d = ci["hit_rate"], ci["mean_return"], ci["max_drawdown"]
+    return (
+        f"命中率 {h['low']:.0%} ~ {h['high']:.0%}\n"
+        f"平均報酬 {m['low']:+.2%} ~ {m['high']:+.2%}\n"
+        f"最大回撤 {d['low']:+.2%} ~ {d['high']:+.2%}\n"
+        f"P(命中率 ≥ {HIT_RATE_WARN:.0%}) = {p_warn:.2f}"
+    )
 
 # ===============================
-def process_market(label, path, policy):
-    if not os.path.exists(path):
-        return None
+def equity_chart(df, label):
+    return {
+        "path": os.path.join(DATA_DIR, f"equity_{label}.png"),
+        "values": df["equity"].to_numpy(),
+        "title": f"{label} Equity Curve (last {CHECK_WINDOW})",
+    }
 
-    df = pd.read_csv(path)
-    result = calc_equity(df)
+# ===============================
+def process_market(label, policy):
+    result = calc_equity(label)
     if not result:
         return None
 
-    recent, hit = result
+    recent, metrics = result
+    hit = float(recent["hit"].mean())
     horizon = policy[label]
     status = "NORMAL"
 
-    if hit < HIT_RATE_L3:
+    # 小樣本命中率雜訊大：僅在顯著低於門檻時才降 horizon / 進 L3
+    ci = significance.bootstrap_ci(recent["real_ret"], recent["hit"])
+    p_l3 = significance.prob_at_least(recent["hit"], HIT_RATE_L3)
+    p_warn = significance.prob_at_least(recent["hit"], HIT_RATE_WARN)
+
+    if hit < HIT_RATE_L3 and p_l3 < SIGNIFICANCE_ALPHA:
         status = "L3"
         policy[label] = max(3, horizon - 2)
-    elif hit < HIT_RATE_WARN:
+    elif hit < HIT_RATE_WARN and p_warn < SIGNIFICANCE_ALPHA:
         policy[label] = max(3, horizon - 1)
 
-    img = plot_equity(recent, label)
+    chart = equity_chart(recent, label)
 
     return {
         "label": label,
         "hit": hit,
-        "equity": recent["equity"].iloc[-1] - 1,
+        "ci": ci,
+        "p_warn": p_warn,
+        "equity": metrics["window_return"],
         "horizon": policy[label],
         "status": status,
-        "img": img,
+        "chart": chart,
+        "img": chart["path"],
     }
 
 # ===============================
@@ -95,21 +123,27 @@ def main():
     policy = load_policy()
     reports = []
 
-    for label, path in [("TW", TW_HISTORY), ("US", US_HISTORY)]:
-        r = process_market(label, path, policy)
+    for label in market_registry.codes():
+        r = process_market(label, policy)
         if r:
             reports.append(r)
 
     save_policy(policy)
 
+    # 所有市場一次批次渲染；輸入未變動則沿用既有圖檔
+    chart_renderer.render([r["chart"] for r in reports])
+
     # ---- L3 判斷 ----
     l3_count = sum(1 for r in reports if r["status"] == "L3")
     if l3_count >= L3_CONSECUTIVE_DAYS:
-        open(L3_FLAG, "w").write(str(datetime.now()))
+        risk_state.raise_l3(f"dashboard {datetime.now():%Y-%m-%d %H:%M}", actor="performance_dashboard")
 
     if not DISCORD_URL or not reports:
         return
 
+    # 📐 多視窗比較：所有市場 × 視窗一次計算
+    windows = rolling_stats.trailing_table(history_store.read_observations(), by=("market",))
+
     # ===============================
     # Discord 推播
     # ===============================
@@ -125,17 +159,14 @@ def main():
                 {"name": "🎯 命中率", "value": f"{r['hit']:.2%}", "inline": True},
                 {"name": "💰 累積報酬", "value": f"{r['equity']:.2%}", "inline": True},
                 {"name": "⏱ Horizon", "value": f"{r['horizon']} 日", "inline": True},
+                {"name": f"📊 {significance.CI:.0%} 信賴區間（n={r['ci']['n']}）",
+                 "value": ci_summary(r["ci"], r["p_warn"]), "inline": False},
+                {"name": "📐 多視窗比較", "value": window_summary(windows, r["label"]), "inline": False},
             ],
             "footer": {"text": "Stock-Genius-System · 自動績效監控"},
         }
 
-        with open(r["img"], "rb") as f:
-            requests.post(
-                DISCORD_URL,
-                data={"payload_json": json.dumps({"embeds": [embed]})},
-                files={"file": f},
-                timeout=20,
-            )
+        send(DISCORD_URL, embeds=[embed], file_path=r["img"])
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,13 @@
 import os
-import pandas as pd
-import requests
+import sys
 from datetime import datetime
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
+
+from scripts.discord_notifier import send
+from scripts import data_retention
 
 FILES = {
     "台股": os.path.join(DATA_DIR, "metrics_tw.csv"),
@@ -65,10 +68,7 @@ def main():
     embeds = []
 
     for market, file in FILES.items():
-        if not os.path.exists(file):
-            continue
-
-        df = pd.read_csv(file)
+        df = data_retention.read_csv(file)
         if df.empty:
             continue
 
@@ -76,11 +76,7 @@ def main():
         embeds.append(build_embed(market, row))
 
     if embeds:
-        requests.post(
-            WEBHOOK,
-            json={"embeds": embeds},
-            timeout=15,
-        )
+        send(WEBHOOK, embeds=embeds)
         print("✅ 已推播 Embed 績效 Dashboard")
 
 
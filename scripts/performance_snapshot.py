@@ -1,26 +1,22 @@
 import os
-import pandas as pd
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
 
-OBS = os.path.join(DATA_DIR, "forecast_observation.csv")
+from scripts import metrics_materializer, market_registry
 
-def snapshot(market: str, window=7):
-    if not os.path.exists(OBS):
-        return None
-
-    df = pd.read_csv(OBS)
-    df = df[df["market"] == market].tail(window)
-    if df.empty:
+def snapshot(market: str):
+    m = metrics_materializer.latest(market)
+    if not m:
         return None
 
     return {
-        "hit_rate": round(df["hit"].mean(), 3),
-        "avg_ret": round(df["real_ret"].mean(), 4),
-        "count": len(df),
+        "hit_rate": round(m["hit_rate_7"], 3),
+        "avg_ret": round(m["avg_return_7"], 4),
+        "count": min(int(m["window_count"]), metrics_materializer.SHORT_WINDOW),
     }
 
 if __name__ == "__main__":
-    print("TW:", snapshot("TW"))
-    print("US:", snapshot("US"))
+    for m in market_registry.codes():
+        print(f"{m}:", snapshot(m))
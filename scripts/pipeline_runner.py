@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.insert(0, BASE_DIR)
+
+from scripts import ai_engine, forecast_observer, history_store, metrics_materializer
+from scripts import market_registry, risk_state, contagion, memory_profile
+from scripts.discord_notifier import flush
+
+TIMING_FILE = os.path.join(DATA_DIR, "pipeline_timing.json")
+
+STAGES = ("predict", "settle", "contagion")
+
+# 只有這些 stage 失敗才算市場失敗（結束碼非 0）；其餘錯誤記在 pipeline_timing.json
+CRITICAL = ("fetch", "predict", "report")
+
+# 回傳 None 即視為失敗的 stage（例如下載全數失敗）
+REQUIRED = ("fetch",)
+
+# ===============================
+# Per-market Pipeline（失敗互不影響）
+# ===============================
+class MarketRun:
+    def __init__(self, code):
+        self.code = code
+        self.timing = {}
+        self.errors = {}
+
+    def stage(self, name, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            with memory_profile.stage(f"{self.code}.{name}"):
+                out = fn(*args)
+            if out is None and name in REQUIRED:
+                self.errors[name] = "returned no data"
+                print(f"[ERROR][{self.code}] {name} returned no data")
+            return out
+        except Exception:
+            self.errors[name] = traceback.format_exc(limit=3)
+            print(f"[ERROR][{self.code}] {name} failed\n{self.errors[name]}")
+            return None
+        finally:
+            self.timing[name] = round(time.perf_counter() - t0, 3)
+
+    def status(self):
+        if any(name in self.errors for name in CRITICAL):
+            return "failed"
+        return "degraded" if self.errors else "ok"
+
+    def summary(self):
+        return {
+            "status": self.status(),
+            "seconds": round(sum(self.timing.values()), 3),
+            "stages": self.timing,
+            "errors": self.errors,
+        }
+
+def run_market(code, stages=STAGES):
+    """fetch → features/predict → report → settle → contagion for one market."""
+    run = MarketRun(code)
+    m = market_registry.get(code)
+
+    if "predict" in stages and not risk_state.l4_active():
+        entry = ai_engine.prepare(m, run.stage)
+        if entry:
+            # CSV 匯出延到所有市場完成後統一做，避免並行覆寫
+            run.stage("report", ai_engine.report, m, entry["results"], False, entry["date"])
+
+    if "settle" in stages:
+        run.stage("settle", forecast_observer.settle, code)
+
+    if "contagion" in stages:
+        run.stage("contagion", contagion.update_market, code)
+
+    return run.summary()
+
+# ===============================
+# Runner
+# ===============================
+def save_timing(payload):
+    tmp = TIMING_FILE + ".tmp"
+    json.dump(payload, open(tmp, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+    os.replace(tmp, TIMING_FILE)
+
+def run(markets=None, stages=STAGES, report=False, workers=None):
+    markets = markets or market_registry.codes()
+    t0 = time.perf_counter()
+
+    if memory_profile.enabled():
+        # 記憶體分析模式：逐一執行，各 stage 的峰值才不會互相混入
+        results = {c: run_market(c, stages) for c in markets}
+    else:
+        # 各市場並行：總耗時 ≈ 最慢的市場，而非加總
+        with ThreadPoolExecutor(max_workers=workers or len(markets) or 1) as ex:
+            futures = {c: ex.submit(run_market, c, stages) for c in markets}
+            results = {c: f.result() for c, f in futures.items()}
+    parallel = time.perf_counter() - t0
+
+    # 共用檔案（CSV / metrics / dashboard）單執行緒收尾
+    shared = MarketRun("shared")
+    shared.stage("export_csv", history_store.export_csv)
+    shared.stage("metrics", metrics_materializer.update_all)
+    if report:
+        from scripts import performance_dashboard
+        shared.stage("dashboard", performance_dashboard.main)
+    shared.stage("notify", flush)
+
+    payload = {
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+        "stages": list(stages),
+        "wall_seconds": round(time.perf_counter() - t0, 3),
+        "parallel_seconds": round(parallel, 3),
+        "markets": results,
+        "shared": shared.summary(),
+    }
+    save_timing(payload)
+    memory_profile.report("pipeline_runner")
+
+    for c, r in results.items():
+        print(f"[Pipeline][{c}] {r['status']} {r['seconds']:.1f}s {r['stages']}")
+    print(f"[Pipeline] wall {payload['wall_seconds']:.1f}s (markets {payload['parallel_seconds']:.1f}s)")
+    return payload
+
+def main():
+    ap = argparse.ArgumentParser(description="Run market pipelines concurrently")
+    ap.add_argument("--markets", nargs="*", help="market codes (default: all enabled)")
+    ap.add_argument("--stages", nargs="*", default=list(STAGES), choices=STAGES)
+    ap.add_argument("--report", action="store_true", help="run performance dashboard afterwards")
+    ap.add_argument("--workers", type=int)
+    args = ap.parse_args()
+
+    payload = run(args.markets, args.stages, args.report, args.workers)
+    # 任一市場失敗即非 0；workflow 以 || 記下失敗、後續步驟照常執行，最後才標記失敗
+    failed = [c for c, r in payload["markets"].items() if r["status"] == "failed"]
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
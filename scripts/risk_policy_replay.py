@@ -0,0 +1,233 @@
+import os
+import sys
+import time
+import argparse
+import datetime
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
+
+from scripts import news_radar, l4_dynamic_pause, history, market_registry, data_retention
+from scripts.significance import default_workers
+
+# ===============================
+# Config
+# ===============================
+OUTPUT = os.path.join(DATA_DIR, "risk_policy_sweep.csv")
+
+TICK_HOURS = 1            # news_radar 排程週期：事件於下一個格點被看到、L4 於格點解除
+LOOKAHEAD_DAYS = 5        # 誤報判定：L4 期間 + 其後幾個交易日
+FALSE_ALARM_DD = -0.02    # 期間大盤最大回撤未達此值 → 誤報
+
+# 每個欄位一組候選值；全組合（預設 2,916 組）並行重播
+GRID = {
+    "window_hours": [3, 6, 12],
+    "trigger_count": [2, 3, 4],
+    "base_pause_hours": [12, 24, 48],
+    "cooldown_hours": [6, 12, 24],
+    "exit_l3_threshold": [0, 1, 2],
+    "exit_lookback_hours": [6, 12],
+    "extend_hours": [6, 12, 24],
+    "dynamic_pause": [False, True],
+}
+
+# ===============================
+# Streams
+# ===============================
+EPOCH = pd.Timestamp(0, tz="UTC")
+
+def _epoch_seconds(dt):
+    return (dt - EPOCH).dt.total_seconds().to_numpy()
+
+def load_events(path=None, tick_hours=TICK_HOURS):
+    """L3+ events (news and market data) from the event store, snapped to the radar grid."""
+    df = data_retention.read_csv(path or news_radar.BLACK_SWAN_CSV)
+    if df.empty:
+        return np.array([])
+
+    df = df[pd.to_numeric(df["level"], errors="coerce") >= 3]
+    dt = pd.to_datetime(df["datetime"], format="%Y-%m-%d %H:%M", errors="coerce").dropna()
+    ts = _epoch_seconds(dt.dt.tz_localize(news_radar.TZ))
+
+    tick = tick_hours * 3600
+    return np.sort(np.ceil(ts / tick) * tick)
+
+def load_prices(markets, start, end):
+    """Index closes per market as (close-time ts, close) arrays."""
+    out = {}
+    for code in markets:
+        m = market_registry.get(code)
+        if not m["index"]:
+            continue
+        px = history.ensure_prices(code, [m["index"]], start, end, columns=["Close"])
+        px = px.dropna(subset=["Close"]).sort_values("date")
+        if px.empty:
+            continue
+        close_at = pd.Timedelta(m["hours"][1] + ":00")
+        t = (pd.to_datetime(px["date"]).dt.tz_localize(None) + close_at).dt.tz_localize(m["timezone"])
+        out[code] = (_epoch_seconds(t), px["Close"].to_numpy(np.float64))
+    return out
+
+# ===============================
+# Replay（虛擬時鐘，事件驅動）
+# ===============================
+def fresh_state(policy):
+    return {
+        "l4_active": False,
+        "l4_since": None,
+        "l4_pause_until": 0,
+        "l4_last_end": None,
+        "l4_recovered_at": 0,
+        "l3_events": [],
+        "pause_policy": {"pause_hours": policy["base_pause_hours"]},
+    }
+
+def period_return(prices, start, end):
+    """Mean index return across markets between two timestamps (None if uncovered)."""
+    rets = []
+    for t, c in prices.values():
+        i, j = np.searchsorted(t, [start, end], side="right") - 1
+        if i >= 0 and j > i:
+            rets.append(c[j] / c[i] - 1)
+    return float(np.mean(rets)) if rets else None
+
+def replay(events, policy, prices=None, tick_hours=TICK_HOURS):
+    """Run the live trigger / cooldown / recovery code over an event stream.
+
+    The clock jumps between events and the first radar tick after each
+    pause deadline, so quiet hours cost nothing. Returns L4 episodes as
+    (start, end) timestamps.
+    """
+    tick = tick_hours * 3600
+    state = fresh_state(policy)
+    episodes = []
+    i, n = 0, len(events)
+
+    while i < n or state["l4_active"]:
+        nxt = events[i] if i < n else np.inf
+
+        # L4 到期檢查先於同一格點的新事件（與 news_radar.run 順序相同）
+        if state["l4_active"]:
+            t = (state["l4_pause_until"] // tick + 1) * tick
+            if t <= nxt:
+                if news_radar.try_recover(state, t, policy) == "recovered":
+                    episodes.append((state["l4_since"], t))
+                    if policy.get("dynamic_pause") and prices:
+                        sim = period_return(prices, state["l4_since"], t)
+                        hours, _ = l4_dynamic_pause.decide_pause_hours(
+                            {"simulated_ai_return_if_continue": sim}
+                        )
+                        state["pause_policy"] = {"pause_hours": hours}
+                continue
+
+        news_radar.record_l3(state, events[i], policy)
+        i += 1
+
+    return episodes
+
+# ===============================
+# Scoring
+# ===============================
+def score(episodes, prices, lookahead=LOOKAHEAD_DAYS, false_alarm_dd=FALSE_ALARM_DD):
+    n = len(episodes)
+    out = {
+        "l4_count": n,
+        "pause_hours": round(float(sum(e - s for s, e in episodes)) / 3600, 1),
+        "false_alarm_rate": np.nan,
+        "avoided_drawdown": 0.0,
+        "missed_upside": 0.0,
+    }
+    if not n or not prices:
+        return out
+
+    ep = np.asarray(episodes, dtype=np.float64)
+    false_alarm, avoided, missed = [], [], []
+    for t, c in prices.values():
+        i = np.searchsorted(t, ep[:, 0], side="right") - 1
+        j = np.searchsorted(t, ep[:, 1], side="right") - 1
+        ok = (i >= 0) & (j >= i)
+        for a, b in zip(i[ok], j[ok]):
+            ret = c[b] / c[a] - 1
+            dd = c[a:min(b + lookahead, len(c) - 1) + 1].min() / c[a] - 1
+            false_alarm.append(dd > false_alarm_dd)
+            avoided.append(max(0.0, -ret))
+            missed.append(max(0.0, ret))
+
+    if false_alarm:
+        k = len(prices)
+        out["false_alarm_rate"] = round(float(np.mean(false_alarm)), 4)
+        out["avoided_drawdown"] = round(float(sum(avoided)) / k, 4)
+        out["missed_upside"] = round(float(sum(missed)) / k, 4)
+    return out
+
+# ===============================
+# Sweep（多行程並行）
+# ===============================
+def policies(grid=GRID):
+    keys = list(grid)
+    return [dict(zip(keys, vals)) for vals in itertools.product(*(grid[k] for k in keys))]
+
+def _sweep_chunk(events, prices, chunk):
+    return [{**p, **score(replay(events, p, prices), prices)} for p in chunk]
+
+def sweep(events, prices, grid=GRID, workers=None):
+    """Replay every parameter combination; returns one row per policy."""
+    combos = policies(grid)
+    workers = workers or default_workers()
+    if workers > 1 and len(combos) > workers:
+        chunks = [combos[k::workers] for k in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            rows = [r for part in ex.map(_sweep_chunk, [events] * workers, [prices] * workers, chunks) for r in part]
+    else:
+        rows = _sweep_chunk(events, prices, combos)
+
+    df = pd.DataFrame(rows)
+    df["net_avoided"] = (df["avoided_drawdown"] - df["missed_upside"]).round(4)
+    return df.sort_values(
+        ["net_avoided", "false_alarm_rate", "pause_hours"],
+        ascending=[False, True, True],
+        na_position="last",
+    ).reset_index(drop=True)
+
+def current_policy():
+    return {**news_radar.POLICY, "dynamic_pause": True}
+
+# ===============================
+# Main
+# ===============================
+def main():
+    ap = argparse.ArgumentParser(description="Replay the L3/L4 risk policy over historical events")
+    ap.add_argument("--events", help="event CSV (default: black_swan_history.csv)")
+    ap.add_argument("--markets", nargs="*", help="markets whose index scores the replay")
+    ap.add_argument("--workers", type=int)
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    events = load_events(args.events)
+    if not len(events):
+        print("No L3 events to replay")
+        return
+
+    start = datetime.date.fromtimestamp(events[0]) - datetime.timedelta(days=10)
+    end = datetime.date.fromtimestamp(events[-1]) + datetime.timedelta(days=30)
+    prices = load_prices(args.markets or market_registry.codes(), start, end)
+
+    t0 = time.perf_counter()
+    df = sweep(events, prices, workers=args.workers)
+    elapsed = time.perf_counter() - t0
+
+    base = {**current_policy(), **score(replay(events, current_policy(), prices), prices)}
+    df.to_csv(OUTPUT, index=False)
+
+    print(f"[Replay] {len(events)} L3 events, {len(df)} policies in {elapsed:.1f}s → {OUTPUT}")
+    print("[Replay] current policy:", base)
+    print(df.head(args.top).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
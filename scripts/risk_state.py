@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import copy
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows：僅保留行程內鎖
+    fcntl = None
+
+# ===============================
+# Base / Files
+# ===============================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+STATE_FILE = os.getenv("RISK_STATE_FILE", os.path.join(DATA_DIR, "risk_state.json"))
+LOG_FILE = os.path.splitext(STATE_FILE)[0] + "_log.jsonl"
+LOCK_FILE = STATE_FILE + ".lock"
+
+# 舊版散落的狀態檔（首次載入時匯入）
+LEGACY = {
+    "l4_active": os.path.join(DATA_DIR, "l4_active.flag"),
+    "l3_warning": os.path.join(DATA_DIR, "l3_warning.flag"),
+    "l4_last_end": os.path.join(DATA_DIR, "l4_last_end.flag"),
+    "postmortem": os.path.join(DATA_DIR, "l4_postmortem_sent.flag"),
+    "news_cache": os.path.join(DATA_DIR, "news_cache.json"),
+    "system_state": os.path.join(DATA_DIR, "system_state.json"),
+    "pause_policy": os.path.join(DATA_DIR, "l4_pause_policy.json"),
+}
+
+OBSERVE_HOURS = 24   # L4 結束後的風險觀察期
+
+DEFAULT_STATE = {
+    "version": 0,
+    "l4_active": False,
+    "l4_since": None,
+    "l4_pause_until": 0,
+    "l4_last_end": None,
+    "l4_recovered_at": 0,
+    "l3_warning": False,
+    "l3_since": None,
+    "l3_reason": None,
+    "l3_events": [],
+    "postmortem_sent_for": None,
+    "shock_seen": [],
+    "pause_policy": {"pause_hours": 24, "reason": "default"},
+    "since": None,
+    "last_update": None,
+    "locked_by": None,
+}
+
+# ===============================
+# Legacy Import
+# ===============================
+def _read_ts(path):
+    try:
+        return float(open(path).read().strip())
+    except Exception:
+        return None
+
+def _read_json(path):
+    try:
+        return json.load(open(path, "r", encoding="utf-8"))
+    except Exception:
+        return None
+
+def _from_legacy():
+    s = copy.deepcopy(DEFAULT_STATE)
+
+    if os.path.exists(LEGACY["l4_active"]):
+        s["l4_active"] = True
+        s["l4_since"] = _read_ts(LEGACY["l4_active"])
+    if os.path.exists(LEGACY["l3_warning"]):
+        s["l3_warning"] = True
+        s["l3_reason"] = "legacy"
+    s["l4_last_end"] = _read_ts(LEGACY["l4_last_end"])
+    s["postmortem_sent_for"] = _read_ts(LEGACY["postmortem"])
+
+    cache = _read_json(LEGACY["news_cache"]) or {}
+    s["l3_events"] = list(cache.get("_l3_events", []))
+    s["l4_pause_until"] = cache.get("_l4_pause_until", 0)
+    s["l4_recovered_at"] = cache.get("_l4_recovered_at", 0)
+
+    sys_state = _read_json(LEGACY["system_state"]) or {}
+    s["since"] = sys_state.get("since")
+    s["locked_by"] = sys_state.get("locked_by")
+
+    policy = _read_json(LEGACY["pause_policy"])
+    if policy:
+        s["pause_policy"] = policy
+    return s
+
+# ===============================
+# Locking
+# ===============================
+_local = threading.local()
+_thread_lock = threading.RLock()
+
+@contextmanager
+def _file_lock():
+    os.makedirs(os.path.dirname(LOCK_FILE) or ".", exist_ok=True)
+    with _thread_lock:
+        with open(LOCK_FILE, "a") as fh:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+# ===============================
+# Storage
+# ===============================
+def _load_disk():
+    if os.path.exists(STATE_FILE):
+        s = copy.deepcopy(DEFAULT_STATE)
+        s.update(json.load(open(STATE_FILE, "r", encoding="utf-8")))
+        return s
+    return None
+
+def _write_disk(state):
+    tmp = f"{STATE_FILE}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, STATE_FILE)
+
+def _append_log(events):
+    with open(LOG_FILE, "a", encoding="utf-8") as f:
+        for e in events:
+            f.write(json.dumps(e, ensure_ascii=False) + "\n")
+
+# ===============================
+# Transactions
+# ===============================
+@contextmanager
+def transaction(actor=None):
+    """Exclusive read-modify-write of the whole risk state.
+
+    Holds a file lock across processes; changes are written atomically
+    (tmp + rename) and every changed key is appended to the transition log.
+    Nested calls in the same thread share the outer transaction.
+    """
+    if getattr(_local, "state", None) is not None:
+        yield _local.state
+        return
+
+    with _file_lock():
+        before = _load_disk()
+        migrated = before is None
+        if migrated:
+            before = _from_legacy()
+
+        state = copy.deepcopy(before)
+        _local.state = state
+        try:
+            yield state
+        finally:
+            _local.state = None
+
+        now = time.time()
+        changes = [
+            {"ts": now, "actor": actor, "key": k, "old": before.get(k), "new": state.get(k)}
+            for k in sorted(set(state) | set(before))
+            if k not in ("version", "last_update") and state.get(k) != before.get(k)
+        ]
+        if not changes and not migrated:
+            return
+
+        state["version"] = before.get("version", 0) + 1
+        state["last_update"] = datetime.utcnow().isoformat()
+        for c in changes:
+            c["version"] = state["version"]
+        if migrated:
+            changes.insert(0, {"ts": now, "actor": actor, "key": "_migrated", "version": state["version"]})
+
+        _write_disk(state)
+        _append_log(changes)
+        _remember(state)
+
+        if migrated:
+            for path in LEGACY.values():
+                if path.endswith(".flag") and os.path.exists(path):
+                    os.remove(path)
+
+def update(actor=None, **fields):
+    with transaction(actor) as s:
+        s.update(fields)
+        return dict(s)
+
+# ===============================
+# Cached Read Path
+# ===============================
+_cache = {"key": None, "state": None}
+_cache_lock = threading.Lock()
+
+def _stat_key():
+    try:
+        st = os.stat(STATE_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _remember(state):
+    with _cache_lock:
+        _cache["key"] = _stat_key()
+        _cache["state"] = copy.deepcopy(state)
+
+def read():
+    """Current state as the caller's own copy. One stat() per call; re-parsed only on change."""
+    key = _stat_key()
+    with _cache_lock:
+        if key is not None and key == _cache["key"]:
+            # 回傳副本：呼叫端修改不可影響快取（寫入一律經由 transaction）
+            return copy.deepcopy(_cache["state"])
+
+    if key is None:
+        # 尚未建立：以一次 transaction 匯入舊檔並落盤
+        with transaction("migrate"):
+            pass
+        return read()
+
+    state = _load_disk()
+    with _cache_lock:
+        _cache["key"], _cache["state"] = key, state
+    return copy.deepcopy(state)
+
+def get(key, default=None):
+    return read().get(key, default)
+
+# ===============================
+# State Machine（L1–L4 單一來源）
+# ===============================
+def l4_active():
+    return bool(read()["l4_active"])
+
+def l3_warning():
+    return bool(read()["l3_warning"])
+
+def mode(now=None):
+    """L4 > OBSERVE（L4 結束後觀察期）> L3 > NORMAL."""
+    s = read()
+    now = now or time.time()
+    if s["l4_active"]:
+        return "L4"
+    if s["l4_last_end"] and now - float(s["l4_last_end"]) < OBSERVE_HOURS * 3600:
+        return "OBSERVE"
+    if s["l3_warning"]:
+        return "L3"
+    return "NORMAL"
+
+def enter_l4(ts, pause_until, actor=None):
+    with transaction(actor) as s:
+        s["l4_active"] = True
+        s["l4_since"] = ts
+        s["l4_pause_until"] = pause_until
+
+def exit_l4(ts, actor=None):
+    with transaction(actor) as s:
+        s["l4_active"] = False
+        s["l4_last_end"] = ts
+        s["l4_recovered_at"] = ts
+
+def raise_l3(reason, actor=None):
+    with transaction(actor) as s:
+        if not s["l3_warning"]:
+            s["l3_warning"] = True
+            s["l3_since"] = time.time()
+            s["l3_reason"] = reason
+            return True
+    return False
+
+def transitions(limit=None):
+    """Transition log entries (oldest first), across sealed monthly segments."""
+    from scripts import data_retention
+
+    rows = data_retention.read_jsonl(LOG_FILE)
+    return rows[-limit:] if limit else rows
+
+if __name__ == "__main__":
+    # 給 workflow shell 使用：python scripts/risk_state.py mode
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "show"
+    if cmd == "mode":
+        print(mode())
+    elif cmd == "l4":
+        sys.exit(0 if l4_active() else 1)
+    else:
+        print(json.dumps(read(), ensure_ascii=False, indent=2))
@@ -0,0 +1,150 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+WINDOWS = (7, 20, 60, 250)
+GROUP_COLS = ("market", "horizon")
+
+# ===============================
+# Helpers
+# ===============================
+def _prep(df, by, ret_col, hit_col):
+    by = [c for c in by if c in df.columns]
+    d = df.dropna(subset=[ret_col]).copy()
+    if hit_col not in d.columns:
+        d[hit_col] = (d[ret_col] > 0).astype(int)
+    d = d.dropna(subset=[hit_col])
+
+    # 保留原始順序（結算順序）做為時間軸
+    d["_seq"] = np.arange(len(d))
+    d = d.sort_values(by + ["_seq"], kind="stable").reset_index(drop=True)
+
+    if by:
+        gid = d.groupby(by, sort=False).ngroup().to_numpy()
+    else:
+        gid = np.zeros(len(d), dtype=int)
+    return d, by, gid
+
+def _prefix(x):
+    return np.concatenate([[0.0], np.cumsum(x, dtype=np.float64)])
+
+# ===============================
+# Trailing Table（每組 × 每視窗一列）
+# ===============================
+def trailing_table(df, windows=WINDOWS, by=GROUP_COLS, ret_col="real_ret", hit_col="hit"):
+    """Trailing-window hit rate / mean / compounded return / max drawdown.
+
+    One pass of prefix sums over all groups; every (group, window) cell is
+    then a pair of array lookups. Returns a tidy frame.
+    """
+    d, by, gid = _prep(df, by, ret_col, hit_col)
+    cols = by + ["window", "count", "hit_rate", "avg_return", "cum_return", "max_drawdown"]
+    if d.empty:
+        return pd.DataFrame(columns=cols)
+
+    r = d[ret_col].to_numpy(np.float64)
+    h = d[hit_col].to_numpy(np.float64)
+    log_eq = np.log1p(r)
+
+    R, H, L = _prefix(r), _prefix(h), _prefix(log_eq)
+
+    # 各組起訖（含）位置
+    ends = np.flatnonzero(np.r_[gid[1:] != gid[:-1], True])
+    starts = np.r_[0, ends[:-1] + 1]
+    keys = d.loc[ends, by].reset_index(drop=True)
+
+    w = np.asarray(windows)
+    n_grp, n_win = len(ends), len(w)
+
+    # (group, window) 網格
+    e = np.repeat(ends, n_win)
+    s = np.maximum(np.repeat(starts, n_win), e - np.tile(w, n_grp) + 1)
+    cnt = e - s + 1
+
+    hit_rate = (H[e + 1] - H[s]) / cnt
+    avg_ret = (R[e + 1] - R[s]) / cnt
+    cum_ret = np.expm1(L[e + 1] - L[s])
+
+    # 最大回撤：把每組最後 max(w) 筆 log-equity 排成矩陣，一次做 running max
+    w_max = int(min(w.max(), (ends - starts + 1).max()))
+    idx = ends[:, None] - np.arange(w_max)[::-1][None, :] + 1     # prefix index
+    valid = idx > starts[:, None]
+    mat = np.where(valid, L[np.clip(idx, 0, None)], np.nan)        # (groups, w_max)
+
+    max_dd = np.empty(n_grp * n_win)
+    for j, win in enumerate(w):
+        k = int(min(win, w_max))
+        seg = mat[:, -k:]
+        base = L[np.maximum(starts, ends - k + 1)][:, None]         # 視窗起點 equity = 1
+        seg = np.where(np.isnan(seg), base, seg)
+        peak = np.fmax.accumulate(np.concatenate([base, seg], axis=1), axis=1)[:, 1:]
+        max_dd[j::n_win] = np.expm1((seg - peak).min(axis=1))
+
+    out = keys.loc[keys.index.repeat(n_win)].reset_index(drop=True)
+    out["window"] = np.tile(w, n_grp)
+    out["count"] = cnt
+    out["hit_rate"] = hit_rate
+    out["avg_return"] = avg_ret
+    out["cum_return"] = cum_ret
+    out["max_drawdown"] = max_dd
+    return out[cols]
+
+# ===============================
+# Rolling Series（每列 × 每視窗）
+# ===============================
+def rolling_series(df, windows=WINDOWS, by=GROUP_COLS, ret_col="real_ret", hit_col="hit"):
+    """Full rolling history for every row and window (long format)."""
+    d, by, gid = _prep(df, by, ret_col, hit_col)
+    if d.empty:
+        return pd.DataFrame()
+
+    r = d[ret_col].to_numpy(np.float64)
+    h = d[hit_col].to_numpy(np.float64)
+    R, H, L = _prefix(r), _prefix(h), _prefix(np.log1p(r))
+
+    # 每列在組內的位置，用來截斷跨組視窗
+    first = np.r_[0, np.flatnonzero(gid[1:] != gid[:-1]) + 1]
+    grp_start = np.repeat(first, np.diff(np.r_[first, len(d)]))
+    i = np.arange(len(d))
+
+    frames = []
+    for win in windows:
+        s = np.maximum(grp_start, i - win + 1)
+        cnt = i - s + 1
+        f = d[by].copy()
+        f["seq"] = d["_seq"].to_numpy()
+        f["window"] = win
+        f["count"] = cnt
+        f["hit_rate"] = (H[i + 1] - H[s]) / cnt
+        f["avg_return"] = (R[i + 1] - R[s]) / cnt
+        f["cum_return"] = np.expm1(L[i + 1] - L[s])
+        f["max_drawdown"] = _rolling_max_dd(L, i, s, win)
+        frames.append(f)
+
+    return pd.concat(frames, ignore_index=True)
+
+def _rolling_max_dd(L, i, s, win, chunk=20000):
+    """Max drawdown over [s, i] for every row, via strided windows of log-equity."""
+    pad = np.concatenate([np.full(win, np.nan), L])          # pad[k + win] == L[k]
+    out = np.empty(len(i))
+    for a in range(0, len(i), chunk):
+        ii, ss = i[a:a + chunk], s[a:a + chunk]
+        # 視窗 = L[i+1-win .. i+1]（含起點），用 stride view 避免複製
+        view = sliding_window_view(pad, win + 1)[ii + 1]
+        pos = np.arange(win + 1)[None, :] + (ii + 1 - win)[:, None]
+        seg = np.where(pos >= ss[:, None], view, np.nan)
+        peak = np.fmax.accumulate(seg, axis=1)
+        out[a:a + chunk] = np.expm1(np.nanmin(seg - peak, axis=1))
+    return out
+
+if __name__ == "__main__":
+    from scripts import history_store
+
+    obs = history_store.read_observations()
+    print(trailing_table(obs).to_string(index=False))
@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+from datetime import date, timedelta
+from importlib import metadata
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
+
+from scripts import market_registry, tree_compiler
+from scripts.trading_calendar import last_closed_session
+
+# ===============================
+# Config
+# ===============================
+CACHE_DIR = os.path.join(DATA_DIR, "run_cache")   # 可重建，不進版控
+KEEP_DAYS = 14
+
+# 影響預測結果的程式碼（內容變動即視為新版本）
+CODE_FILES = ("ai_engine.py", "feature_store.py", "tree_compiler.py")
+PACKAGES = ("xgboost", "numpy", "pandas")
+
+# ===============================
+# Keys
+# ===============================
+def _sha(*parts):
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(p if isinstance(p, bytes) else str(p).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+def code_version():
+    parts = []
+    for name in CODE_FILES:
+        with open(os.path.join(BASE_DIR, "scripts", name), "rb") as f:
+            parts.append(f.read())
+    for pkg in PACKAGES:
+        try:
+            parts.append(f"{pkg}=={metadata.version(pkg)}")
+        except metadata.PackageNotFoundError:
+            parts.append(f"{pkg}==?")
+    return _sha(*parts)[:12]
+
+def config_version(code):
+    return _sha(json.dumps(market_registry.get(code), sort_keys=True, ensure_ascii=False))[:12]
+
+def data_hash(data):
+    """Content hash of a downloaded panel (values, index and column labels)."""
+    rows = pd.util.hash_pandas_object(data, index=True).to_numpy()
+    return _sha(rows.tobytes(), list(map(str, data.columns)))[:16]
+
+def _session_dir(code, session):
+    return os.path.join(CACHE_DIR, code, str(session))
+
+def _entry_dir(code, session, dhash):
+    key = _sha(code, session, dhash, code_version(), config_version(code))[:16]
+    return os.path.join(_session_dir(code, session), key)
+
+# ===============================
+# Lookup / Store
+#   data/run_cache/<code>/<session>/
+#     index.json           code+config 版本 → 完整資料的 data hash（免下載的快速路徑）
+#     <key>/manifest.json  results / 日期（訊息於交付時才渲染，會引用最新的回測結算與排名）
+#     <key>/model.npz      編譯後的模型
+# 下載的 panel 本身不保存：快速路徑只需 index.json，否則本來就要重新下載
+# ===============================
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write(path, payload):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def _load_entry(code, path):
+    entry = _read(os.path.join(path, "manifest.json"))
+    if entry is None:
+        return None
+    model = os.path.join(path, "model.npz")
+    if os.path.exists(model):
+        shutil.copyfile(model, tree_compiler.model_file(code))
+    print(f"[RunCache][{entry['market']}] hit {entry['session']} ({entry['data_hash']})")
+    return entry
+
+def lookup(m, data=None, now=None):
+    """Cached run for the current session, or None.
+
+    Without `data` only runs whose panel already reached the closed
+    session are reused (the inputs can no longer change); with `data`
+    the entry must match its content hash.
+    """
+    code = m["code"]
+    session = last_closed_session(code, now)
+    if data is None:
+        index = _read(os.path.join(_session_dir(code, session), "index.json")) or {}
+        dhash = index.get(f"{code_version()}:{config_version(code)}")
+        if dhash is None:
+            return None
+    else:
+        dhash = data_hash(data)
+    return _load_entry(code, _entry_dir(code, session, dhash))
+
+def store(m, data, results, date_str, now=None):
+    """Save a finished run; always returns the entry (caching is best effort)."""
+    code = m["code"]
+    session = last_closed_session(code, now)
+    dhash = data_hash(data)
+    entry = {
+        "market": code,
+        "session": str(session),
+        "data_hash": dhash,
+        "date": date_str,
+        "results": results,
+    }
+    try:
+        path = _entry_dir(code, session, dhash)
+        os.makedirs(path, exist_ok=True)
+        model = tree_compiler.model_file(code)
+        if os.path.exists(model):
+            shutil.copyfile(model, os.path.join(path, "model.npz"))
+        _write(os.path.join(path, "manifest.json"), entry)
+
+        # 資料已涵蓋收盤後的 session → 之後重跑可免下載直接交付
+        last_bar = pd.Timestamp(data.index.max()).date()
+        if last_bar >= session:
+            index_file = os.path.join(_session_dir(code, session), "index.json")
+            index = _read(index_file) or {}
+            index[f"{code_version()}:{config_version(code)}"] = dhash
+            _write(index_file, index)
+
+    except Exception as e:
+        print(f"[WARN] run cache store failed: {e}")
+        return entry
+
+    prune(code)
+    return entry
+
+def prune(code, keep_days=KEEP_DAYS):
+    """Drop this market's sessions older than keep_days (never raises)."""
+    cutoff = date.today() - timedelta(days=keep_days)
+    root = os.path.join(CACHE_DIR, code)
+    try:
+        sessions = os.listdir(root)
+    except OSError:
+        return
+    for d in sessions:
+        try:
+            old = date.fromisoformat(d) < cutoff
+        except ValueError:
+            continue
+        if old:
+            shutil.rmtree(os.path.join(root, d), ignore_errors=True)
+
+    # 舊版以 pickle 保存的下載 panel（已不再使用）
+    shutil.rmtree(os.path.join(CACHE_DIR, "panels"), ignore_errors=True)
+
+if __name__ == "__main__":
+    for c in sys.argv[1:] or market_registry.codes():
+        session = last_closed_session(c)
+        index = _read(os.path.join(_session_dir(c, session), "index.json")) or {}
+        dhash = index.get(f"{code_version()}:{config_version(c)}")
+        print(f"[RunCache][{c}] {session}: {'ready ' + dhash if dhash else 'no complete run'}")
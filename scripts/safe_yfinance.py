@@ -10,11 +10,16 @@ def safe_download(
     period="2y",
     auto_adjust=True,
     group_by="ticker",
+    interval="1d",
+    start=None,
 ):
+    # 指定 start 時只抓該日之後的 bar（增量更新）
+    span = {"start": start} if start is not None else {"period": period}
     try:
         df = yf.download(
             tickers,
-            period=period,
+            **span,
+            interval=interval,
             auto_adjust=auto_adjust,
             group_by=group_by,
             progress=False,
@@ -0,0 +1,279 @@
+import os
+import sys
+import time
+import datetime
+import warnings
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from scripts.safe_yfinance import safe_download
+from scripts.discord_notifier import send, flush
+from scripts import history, market_registry, news_radar, risk_state
+from scripts.trading_calendar import get_calendar
+
+warnings.filterwarnings("ignore")
+
+# ===============================
+# Thresholds（與新聞雷達相同等級：L1/L2 個股、L3 市場、L4 由 record_l3 升級）
+# ===============================
+WINDOW = 60              # 基準期（交易日）
+MIN_OBS = 20
+BASE_PERIOD = "6mo"
+
+Z_L1 = 2.5               # 個股報酬 z-score（下跌）
+Z_L2 = 4.0
+GAP_L2 = -0.07           # 跳空開低
+VOL_SPIKE = 4.0          # 成交量 / 基準均量
+
+BREADTH_DROP = -0.03     # 個股跌幅門檻
+BREADTH_RATIO = 0.60     # 跌破門檻的比例 → L3
+MIN_BREADTH_SYMBOLS = 20
+INDEX_DROP = -0.03       # 大盤跌幅 → L3
+INDEX_Z = 3.0            # 大盤 z-score → L3
+VIX_JUMP = 0.30          # VIX 漲幅 → L3
+
+MAX_SYMBOL_EVENTS = 20   # 每次寫入事件庫的 L2 個股上限
+STORE_COVERAGE = 0.90    # 價格庫前一 session 有資料的標的比例達此值才直接使用
+
+# ===============================
+# Baseline（每個交易日算一次）
+# ===============================
+def _last_valid(a):
+    """Last non-NaN value per column of a T×N array."""
+    ok = ~np.isnan(a)
+    pos = np.where(ok, np.arange(len(a))[:, None], -1).max(axis=0)
+    out = a[np.maximum(pos, 0), np.arange(a.shape[1])]
+    return np.where(pos >= 0, out, np.nan)
+
+def baseline(close, volume, window=WINDOW):
+    """Per-symbol daily-return mean / std, average volume and reference close.
+
+    close / volume are T×N daily arrays whose last row is the previous
+    session; everything the scan needs is reduced to N-vectors here.
+    """
+    c = np.asarray(close, dtype=np.float64)[-(window + 1):]
+    v = np.asarray(volume, dtype=np.float64)[-window:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = c[1:] / c[:-1] - 1
+        ok = ~np.isnan(r)
+        n = ok.sum(axis=0)
+        r0 = np.where(ok, r, 0.0)
+        mu = r0.sum(axis=0) / n
+        var = ((r0 - np.where(ok, mu, 0.0)) ** 2 * ok).sum(axis=0) / (n - 1)
+        vok = ~np.isnan(v)
+        avg_vol = np.where(vok, v, 0.0).sum(axis=0) / vok.sum(axis=0)
+    return {
+        "mu": mu,
+        "sd": np.sqrt(var),
+        "n": n,
+        "avg_vol": avg_vol,
+        "prev_close": _last_valid(c),
+    }
+
+# ===============================
+# Scan（每次更新一次陣列運算）
+# ===============================
+def scan(base, last, day_open=None, day_volume=None):
+    """Return z-score / gap / volume-spike metrics and a per-symbol level (0–2)."""
+    last = np.asarray(last, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = last / base["prev_close"] - 1
+        sd = np.where((base["n"] >= MIN_OBS) & (base["sd"] > 0), base["sd"], np.nan)
+        z = (ret - base["mu"]) / sd
+        gap = (np.full_like(ret, np.nan) if day_open is None
+               else np.asarray(day_open, dtype=np.float64) / base["prev_close"] - 1)
+        vol_ratio = (np.full_like(ret, np.nan) if day_volume is None
+                     else np.asarray(day_volume, dtype=np.float64) / base["avg_vol"])
+
+        level = np.zeros(len(ret), dtype=np.int8)
+        level[(z <= -Z_L1) | ((vol_ratio >= VOL_SPIKE) & (ret < 0))] = 1
+        level[(z <= -Z_L2) | (gap <= GAP_L2)] = 2
+    return {"ret": ret, "z": z, "gap": gap, "vol_ratio": vol_ratio, "level": level}
+
+def _val(a, i):
+    if i is None or np.isnan(a[i]):
+        return None
+    return round(float(a[i]), 4)
+
+def assess(metrics, symbols, index=None, vix=None):
+    """Market-level verdict: breadth collapse, index move and VIX jump → level 3."""
+    col = {s: i for i, s in enumerate(symbols)}
+    ix, vx = col.get(index), col.get(vix)
+
+    stocks = np.ones(len(symbols), dtype=bool)
+    for i in (ix, vx):
+        if i is not None:
+            stocks[i] = False
+
+    ret = metrics["ret"]
+    valid = stocks & ~np.isnan(ret)
+    n = int(valid.sum())
+    breadth = float((ret[valid] <= BREADTH_DROP).mean()) if n else 0.0
+
+    index_ret, index_z = _val(ret, ix), _val(metrics["z"], ix)
+    vix_ret = _val(ret, vx)
+
+    reasons = []
+    if n >= MIN_BREADTH_SYMBOLS and breadth >= BREADTH_RATIO:
+        reasons.append(f"{breadth:.0%} 個股跌逾 {abs(BREADTH_DROP):.0%}")
+    if index_ret is not None and (index_ret <= INDEX_DROP or (index_z or 0) <= -INDEX_Z):
+        reasons.append(f"大盤 {index_ret:+.2%}" + (f"（z {index_z:+.1f}）" if index_z is not None else ""))
+    if vix_ret is not None and vix_ret >= VIX_JUMP:
+        reasons.append(f"VIX {vix_ret:+.0%}")
+
+    # 依嚴重度排序：z 最低者優先，僅因跳空 / 量能觸發（z 為 NaN）者排在後面、再依跳空幅度
+    idx = np.flatnonzero(stocks & (metrics["level"] >= 2))
+    order = np.lexsort((
+        np.nan_to_num(metrics["gap"][idx], nan=np.inf),
+        np.nan_to_num(metrics["z"][idx], nan=np.inf),
+    ))
+    top = [symbols[i] for i in idx[order]]
+
+    return {
+        "level": 3 if reasons else 0,
+        "reasons": reasons,
+        "symbols": n,
+        "breadth": round(breadth, 4),
+        "index_ret": index_ret,
+        "vix_ret": vix_ret,
+        "l1": int((stocks & (metrics["level"] >= 1)).sum()),
+        "l2": top,
+    }
+
+# ===============================
+# Data（經由 safe_download，並寫入 columnar 價格庫）
+# ===============================
+def _field(data, symbols, field):
+    if isinstance(data.columns, pd.MultiIndex):
+        cols = pd.MultiIndex.from_tuples([(s, field) for s in symbols])
+        return data.reindex(columns=cols).to_numpy(np.float64)
+    return data[[field]].to_numpy(np.float64)
+
+def daily_panel(code, symbols, store=True):
+    """Download daily bars; store=False leaves the columnar price table untouched."""
+    data = safe_download(symbols, period=BASE_PERIOD)
+    if data is None:
+        return None
+    if store:
+        try:
+            history.store_panel(code, data, symbols)
+        except Exception as e:
+            print(f"[WARN] price store update failed: {e}")
+    return {
+        "dates": pd.DatetimeIndex(data.index),
+        "open": _field(data, symbols, "Open"),
+        "close": _field(data, symbols, "Close"),
+        "volume": _field(data, symbols, "Volume"),
+    }
+
+def stored_panel(code, symbols, before):
+    """Daily close / volume from the local price table (read-only); None if it is stale."""
+    prev = get_calendar(code).prev_session(before - datetime.timedelta(days=1))
+    start = prev - datetime.timedelta(days=WINDOW * 2)
+    px = history.prices(code, symbols, start=start, end=prev, columns=["Close", "Volume"])
+    if px.empty:
+        return None
+
+    px["date"] = pd.to_datetime(px["date"])
+    close = px.pivot(index="date", columns="symbol", values="Close").sort_index().reindex(columns=symbols)
+    if close.index[-1].date() < prev or len(close) < MIN_OBS + 1:
+        return None
+    if close.iloc[-1].notna().mean() < STORE_COVERAGE:
+        return None
+    volume = px.pivot(index="date", columns="symbol", values="Volume").reindex(index=close.index, columns=symbols)
+    return {
+        "dates": close.index,
+        "close": close.to_numpy(np.float64),
+        "volume": volume.to_numpy(np.float64),
+    }
+
+def load_baseline(code, symbols, before=None):
+    """Baseline from daily bars of sessions before `before` (a date; default: today).
+
+    Read-only: uses the price table when it already holds the previous
+    session, otherwise downloads without writing it (the scheduled jobs
+    own the table; the resident daemon only reads).
+    """
+    before = before or datetime.date.today()
+    p = stored_panel(code, symbols, before) or daily_panel(code, symbols, store=False)
+    if p is None:
+        return None
+    keep = p["dates"].date < before
+    return baseline(p["close"][keep], p["volume"][keep])
+
+# ===============================
+# Events（共用事件庫與 L3/L4 規則）
+# ===============================
+def report(m, verdict, session, now, source):
+    """Record a market shock once per market/session; returns the final level or None."""
+    if not verdict["level"]:
+        return None
+
+    key = f"{m['code']}:{session}"
+    ts = now.timestamp()
+    with risk_state.transaction(source) as state:
+        if key in state["shock_seen"]:
+            return None
+        # 只保留最近幾筆，避免狀態檔無限成長
+        state["shock_seen"] = state["shock_seen"][-20:] + [key]
+        level = 4 if news_radar.record_l3(state, ts) else 3
+
+    stamp = f"{now:%Y-%m-%d %H:%M}"
+    rows = [{
+        "datetime": stamp, "market": m["code"], "symbol": m["index"] or m["code"],
+        "level": level, "source": source, "title": "、".join(verdict["reasons"]),
+    }]
+    rows += [
+        {"datetime": stamp, "market": m["code"], "symbol": s, "level": 2,
+         "source": source, "title": "price shock"}
+        for s in verdict["l2"][:MAX_SYMBOL_EVENTS]
+    ]
+    news_radar.log_events(rows)
+
+    top = "、".join(market_registry.display(s, m["code"]) for s in verdict["l2"][:10])
+    send(
+        news_radar.BLACK_SWAN_WEBHOOK_URL,
+        content=(
+            f"🚨 **市場衝擊 L{level}｜{m['flag']} {m['name']}**\n"
+            f"🕒 {stamp}\n"
+            f"{'、'.join(verdict['reasons'])}\n"
+            + (f"📉 異常個股：{top}\n" if top else "")
+            + f"\n{news_radar.DISCLAIMER}"
+        ),
+    )
+    flush()
+    return level
+
+# ===============================
+# Daily Scan（排程用）
+# ===============================
+def run_market(code, now=None):
+    m = market_registry.get(code)
+    symbols = market_registry.watch_list(code)
+    p = daily_panel(code, symbols)
+    if p is None or len(p["dates"]) < MIN_OBS + 2:
+        print(f"[INFO] {code} shock scan skipped (data failure)")
+        return None
+
+    t0 = time.perf_counter()
+    base = baseline(p["close"][:-1], p["volume"][:-1])
+    metrics = scan(base, p["close"][-1], p["open"][-1], p["volume"][-1])
+    verdict = assess(metrics, symbols, m["index"], m["vix"])
+    print(
+        f"[Shock][{code}] {len(symbols)} symbols in {time.perf_counter() - t0:.3f}s "
+        f"breadth={verdict['breadth']:.0%} L1={verdict['l1']} L2={len(verdict['l2'])} "
+        f"{verdict['reasons'] or 'no shock'}"
+    )
+
+    session = p["dates"][-1].date().isoformat()
+    now = now or datetime.datetime.now(news_radar.TZ)
+    report(m, verdict, session, now, "shock_detector")
+    return verdict
+
+if __name__ == "__main__":
+    for c in sys.argv[1:] or market_registry.codes():
+        run_market(c)
@@ -0,0 +1,147 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# ===============================
+# Config
+# ===============================
+N_BOOT = 5000
+N_PERM = 5000
+CI = 0.95
+SEED = 42
+
+# 每批重抽樣矩陣上限（元素數），控制記憶體
+MAX_CELLS = 4_000_000
+
+STATS = ("hit_rate", "mean_return", "max_drawdown")
+
+# ===============================
+# Vectorised Statistics（每列一個樣本）
+# ===============================
+def _row_stats(ret, hit):
+    out = {
+        "hit_rate": hit.mean(axis=1),
+        "mean_return": ret.mean(axis=1),
+    }
+    log_eq = np.cumsum(np.log1p(ret), axis=1)
+    peak = np.maximum.accumulate(np.maximum(log_eq, 0.0), axis=1)   # 起點 equity = 1
+    out["max_drawdown"] = np.expm1((log_eq - peak).min(axis=1))
+    return out
+
+def _boot_chunk(ret, hit, n_boot, seed):
+    rng = np.random.default_rng(seed)
+    n = len(ret)
+    rows = max(1, MAX_CELLS // max(n, 1))
+    parts = {k: [] for k in STATS}
+    done = 0
+    while done < n_boot:
+        b = min(rows, n_boot - done)
+        idx = rng.integers(0, n, size=(b, n))
+        s = _row_stats(ret[idx], hit[idx])
+        for k in STATS:
+            parts[k].append(s[k])
+        done += b
+    return {k: np.concatenate(v) for k, v in parts.items()}
+
+def _as_arrays(returns, hits=None):
+    ret = np.asarray(returns, dtype=np.float64)
+    ok = np.isfinite(ret)
+    if hits is None:
+        hit = (ret > 0).astype(np.float64)
+    else:
+        hit = np.asarray(hits, dtype=np.float64)
+        ok &= np.isfinite(hit)
+    return ret[ok], hit[ok]
+
+# ===============================
+# Bootstrap
+# ===============================
+def bootstrap_samples(returns, hits=None, n_boot=N_BOOT, seed=SEED, workers=1):
+    """Bootstrap distributions of every statistic, as one array op per batch."""
+    ret, hit = _as_arrays(returns, hits)
+    if len(ret) == 0:
+        return None
+
+    if workers and workers > 1 and n_boot >= 4 * workers:
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        sizes = [n_boot // workers + (i < n_boot % workers) for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            chunks = list(ex.map(_boot_chunk, [ret] * workers, [hit] * workers, sizes, seeds))
+        return {k: np.concatenate([c[k] for c in chunks]) for k in STATS}
+
+    return _boot_chunk(ret, hit, n_boot, seed)
+
+def bootstrap_ci(returns, hits=None, n_boot=N_BOOT, ci=CI, seed=SEED, workers=1):
+    """Percentile confidence intervals for hit rate, mean return and max drawdown."""
+    ret, hit = _as_arrays(returns, hits)
+    boot = bootstrap_samples(ret, hit, n_boot, seed, workers)
+    if boot is None:
+        return None
+
+    point = {k: float(v[0]) for k, v in _row_stats(ret[None, :], hit[None, :]).items()}
+    a = (1 - ci) / 2
+    return {
+        k: {
+            "estimate": point[k],
+            "low": float(np.quantile(boot[k], a)),
+            "high": float(np.quantile(boot[k], 1 - a)),
+        }
+        for k in STATS
+    } | {"n": int(len(ret)), "n_boot": int(n_boot)}
+
+def prob_at_least(hits, threshold, n_boot=N_BOOT, seed=SEED):
+    """Bootstrap probability that the true hit rate is >= threshold.
+
+    Small values mean the observed shortfall is unlikely to be noise.
+    """
+    hit = np.asarray(hits, dtype=np.float64)
+    hit = hit[np.isfinite(hit)]
+    if len(hit) == 0:
+        return None
+    boot = _boot_chunk(hit, hit, n_boot, seed)["hit_rate"]
+    return float((boot >= threshold).mean())
+
+def from_counts(count, rate):
+    """0/1 hit sample rebuilt from an aggregate (count, win rate) pair."""
+    if count is None or rate is None or not np.isfinite(count) or not np.isfinite(rate):
+        return np.empty(0)
+    n = int(count)
+    wins = int(round(rate * n))
+    return np.r_[np.ones(wins), np.zeros(n - wins)]
+
+# ===============================
+# Permutation Test（兩組差異）
+# ===============================
+def permutation_test(a, b, stat="mean", n_perm=N_PERM, seed=SEED):
+    """Two-sided permutation test for a difference in means (or hit rates)."""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    a, b = a[np.isfinite(a)], b[np.isfinite(b)]
+    if stat == "hit_rate":
+        a, b = (a > 0).astype(np.float64), (b > 0).astype(np.float64)
+    if len(a) == 0 or len(b) == 0:
+        return None
+
+    pooled = np.concatenate([a, b])
+    observed = b.mean() - a.mean()
+    rng = np.random.default_rng(seed)
+
+    rows = max(1, MAX_CELLS // len(pooled))
+    extreme, done = 0, 0
+    while done < n_perm:
+        k = min(rows, n_perm - done)
+        perm = rng.permuted(np.broadcast_to(pooled, (k, len(pooled))), axis=1)
+        diff = perm[:, len(a):].mean(axis=1) - perm[:, :len(a)].mean(axis=1)
+        extreme += int((np.abs(diff) >= abs(observed) - 1e-12).sum())
+        done += k
+
+    return {
+        "diff": float(observed),
+        "p_value": float((extreme + 1) / (n_perm + 1)),
+        "n_a": int(len(a)),
+        "n_b": int(len(b)),
+    }
+
+def default_workers():
+    return max(1, min(4, (os.cpu_count() or 1) - 1))
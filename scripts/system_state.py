@@ -1,28 +1,24 @@
-import json
 import os
-from datetime import datetime
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-STATE_FILE = os.path.join(BASE_DIR, "data", "system_state.json")
+sys.path.append(BASE_DIR)
 
-DEFAULT_STATE = {
-    "mode": "NORMAL",
-    "since": datetime.utcnow().isoformat(),
-    "last_update": None,
-    "locked_by": None
-}
+from scripts import risk_state
 
+# 相容介面：狀態統一存於 data/risk_state.json（見 risk_state）
 def load_state():
-    if not os.path.exists(STATE_FILE):
-        save_state(DEFAULT_STATE)
-        return DEFAULT_STATE
-    with open(STATE_FILE, "r") as f:
-        return json.load(f)
+    s = risk_state.read()
+    return {
+        "mode": risk_state.mode(),
+        "since": s["since"],
+        "last_update": s["last_update"],
+        "locked_by": s["locked_by"],
+    }
 
 def save_state(state: dict):
-    state["last_update"] = datetime.utcnow().isoformat()
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2)
+    fields = {k: state[k] for k in ("since", "locked_by") if k in state}
+    risk_state.update("system_state", **fields)
 
 def get_mode() -> str:
-    return load_state().get("mode", "NORMAL")
+    return risk_state.mode()
@@ -0,0 +1,230 @@
+import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from scripts import market_registry
+
+# ===============================
+# Range
+#   規則推算的市場（US）涵蓋 CAL_START–CAL_END；依清單的市場（TW / registry）
+#   只涵蓋清單有資料的年份，範圍外查詢一律 ValueError（不可把休市日當交易日）
+# ===============================
+CAL_START = "2000-01-01"
+CAL_END = "2030-12-31"
+RANGE_WARN_DAYS = 60     # 清單涵蓋期剩餘天數低於此值時提醒更新
+
+# ===============================
+# 🇹🇼 TWSE 休市日（含農曆年前無交易日、颱風停市）
+# ⚠️ 依證交所每年公告更新；日曆只涵蓋此清單內的年份
+# ===============================
+TW_HOLIDAYS = [
+    # 2024
+    "2024-01-01", "2024-02-06", "2024-02-07", "2024-02-08", "2024-02-09",
+    "2024-02-12", "2024-02-13", "2024-02-14", "2024-02-28", "2024-04-04",
+    "2024-04-05", "2024-05-01", "2024-06-10", "2024-07-24", "2024-07-25",
+    "2024-09-17", "2024-10-02", "2024-10-03", "2024-10-10", "2024-10-31",
+    # 2025
+    "2025-01-01", "2025-01-23", "2025-01-24", "2025-01-27", "2025-01-28",
+    "2025-01-29", "2025-01-30", "2025-01-31", "2025-02-28", "2025-04-03",
+    "2025-04-04", "2025-05-01", "2025-05-30", "2025-09-29", "2025-10-06",
+    "2025-10-10", "2025-10-24", "2025-12-25",
+    # 2026
+    "2026-01-01", "2026-02-12", "2026-02-13", "2026-02-16", "2026-02-17",
+    "2026-02-18", "2026-02-19", "2026-02-20", "2026-02-27", "2026-04-03",
+    "2026-04-06", "2026-05-01", "2026-06-19", "2026-09-25", "2026-09-28",
+    "2026-10-09", "2026-10-26", "2026-12-25",
+]
+
+# ===============================
+# 🇺🇸 NYSE 休市日（規則推算 + 臨時休市）
+# ===============================
+US_SPECIAL_CLOSURES = [
+    "2001-09-11", "2001-09-12", "2001-09-13", "2001-09-14",
+    "2004-06-11", "2007-01-02", "2012-10-29", "2012-10-30",
+    "2018-12-05", "2025-01-09",
+]
+
+def _nth_weekday(year, month, weekday, n):
+    d = datetime.date(year, month, 1)
+    d += datetime.timedelta(days=(weekday - d.weekday()) % 7)
+    return d + datetime.timedelta(weeks=n - 1)
+
+def _last_weekday(year, month, weekday):
+    d = datetime.date(year, month + 1, 1) - datetime.timedelta(days=1)
+    return d - datetime.timedelta(days=(d.weekday() - weekday) % 7)
+
+def _easter(year):
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return datetime.date(year, month, day)
+
+def _observed(d):
+    if d.weekday() == 5:
+        return d - datetime.timedelta(days=1)
+    if d.weekday() == 6:
+        return d + datetime.timedelta(days=1)
+    return d
+
+def us_holidays(year):
+    days = [
+        _nth_weekday(year, 1, 0, 3),                          # MLK Day
+        _nth_weekday(year, 2, 0, 3),                          # Presidents' Day
+        _easter(year) - datetime.timedelta(days=2),           # Good Friday
+        _last_weekday(year, 5, 0),                            # Memorial Day
+        _observed(datetime.date(year, 7, 4)),                 # Independence Day
+        _nth_weekday(year, 9, 0, 1),                          # Labor Day
+        _nth_weekday(year, 11, 3, 4),                         # Thanksgiving
+        _observed(datetime.date(year, 12, 25)),               # Christmas
+    ]
+    # 元旦落在週六時不補假（NYSE 規則）
+    new_year = datetime.date(year, 1, 1)
+    if new_year.weekday() != 5:
+        days.append(_observed(new_year))
+    if year >= 2022:
+        days.append(_observed(datetime.date(year, 6, 19)))    # Juneteenth
+    return days
+
+# ===============================
+# Calendar
+# ===============================
+def to_day(d):
+    if isinstance(d, np.datetime64):
+        return d.astype("datetime64[D]")
+    if isinstance(d, str):
+        return np.datetime64(d[:10], "D")
+    if hasattr(d, "date") and callable(d.date):
+        d = d.date()
+    return np.datetime64(d, "D")
+
+class TradingCalendar:
+    """Precomputed session index: all lookups are array indexing, O(1)."""
+
+    def __init__(self, market, holidays, start=CAL_START, end=CAL_END):
+        self.market = market
+        self.start = np.datetime64(start, "D")
+        self.end = np.datetime64(end, "D")
+        days = np.arange(self.start, self.end + 1)
+
+        # 1970-01-01 為週四 → (+3) % 7 得到 Mon=0
+        weekday = (days.astype(np.int64) + 3) % 7
+        hol = np.array(sorted({to_day(h) for h in holidays}), dtype="datetime64[D]")
+        is_session = (weekday < 5) & ~np.isin(days, hol)
+
+        self.sessions = days[is_session]
+        self._is_session = is_session
+        # 每個日曆日 → 當日或之後第一個交易日的位置
+        self._next_pos = np.cumsum(is_session) - is_session
+        self._n = len(self.sessions)
+
+    def _offset_days(self, d):
+        i = int((to_day(d) - self.start).astype(np.int64))
+        if i < 0 or i >= len(self._next_pos):
+            raise ValueError(f"{d} outside {self.market} calendar range ({self.start} – {self.end})")
+        return i
+
+    def is_session(self, d):
+        return bool(self._is_session[self._offset_days(d)])
+
+    def position(self, d):
+        """Session position of d, or of the next session if d is closed."""
+        return int(self._next_pos[self._offset_days(d)])
+
+    def positions(self, dates):
+        days = np.asarray(dates, dtype="datetime64[D]")
+        idx = (days - self.start).astype(np.int64)
+        if len(idx) and (idx.min() < 0 or idx.max() >= len(self._next_pos)):
+            raise ValueError(f"dates outside {self.market} calendar range ({self.start} – {self.end})")
+        return self._next_pos[idx]
+
+    def session_at(self, pos):
+        if pos < 0 or pos >= self._n:
+            raise ValueError(f"session position {pos} outside calendar range")
+        return self.sessions[pos].astype(object)
+
+    def next_session(self, d):
+        """Session on or after d."""
+        return self.session_at(self.position(d))
+
+    def prev_session(self, d):
+        """Session on or before d."""
+        i = self._offset_days(d)
+        pos = int(self._next_pos[i]) - (0 if self._is_session[i] else 1)
+        return self.session_at(pos)
+
+    def offset(self, d, n):
+        """T+n: n sessions after the session on or after d."""
+        return self.session_at(self.position(d) + n)
+
+    def offsets(self, dates, n):
+        """Vectorised offset(); returns datetime64[D] array (NaT past range)."""
+        pos = self.positions(dates) + np.asarray(n)
+        out = np.full(pos.shape, np.datetime64("NaT"), dtype="datetime64[D]")
+        ok = (pos >= 0) & (pos < self._n)
+        out[ok] = self.sessions[pos[ok]]
+        return out
+
+    def sessions_between(self, a, b):
+        return self.position(b) - self.position(a)
+
+@lru_cache(maxsize=None)
+def get_calendar(market):
+    try:
+        cfg = market_registry.get(market)
+    except KeyError:
+        cfg = {"calendar": market, "holidays": []}
+
+    # 內建規則（TW / US）+ registry 額外休市日；其他市場只用 registry 清單
+    rule = cfg.get("calendar") or market
+    holidays = list(cfg.get("holidays") or [])
+    if rule == "US":
+        y0, y1 = int(CAL_START[:4]), int(CAL_END[:4])
+        holidays += [d for y in range(y0, y1 + 1) for d in us_holidays(y)]
+        holidays += US_SPECIAL_CLOSURES
+        return TradingCalendar(market, holidays)
+
+    if rule == "TW":
+        holidays += TW_HOLIDAYS
+    if not holidays:
+        # 未提供任何休市日：明確宣告為僅排除週末的日曆
+        return TradingCalendar(market, holidays)
+
+    years = sorted({str(h)[:4] for h in holidays})
+    cal = TradingCalendar(market, holidays, f"{years[0]}-01-01", f"{years[-1]}-12-31")
+    left = (cal.end - np.datetime64(datetime.date.today(), "D")).astype(int)
+    if left < RANGE_WARN_DAYS:
+        print(f"[WARN][Calendar] {market} holidays end {cal.end}; update the holiday list")
+    return cal
+
+def market_of(symbol):
+    return market_registry.market_of(symbol)
+
+def calendar_for(symbol):
+    return get_calendar(market_of(symbol))
+
+def is_open(market, now=None):
+    """True while the market is in its regular session (registry hours, local time)."""
+    cfg = market_registry.get(market)
+    tz = ZoneInfo(cfg["timezone"])
+    local = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(tz)
+    if not get_calendar(market).is_session(local.date()):
+        return False
+    start, end = (datetime.time.fromisoformat(h) for h in cfg["hours"])
+    return start <= local.time() <= end
+
+def last_closed_session(market, now=None):
+    """Most recent session whose regular hours have ended (local time)."""
+    cfg = market_registry.get(market)
+    local = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(ZoneInfo(cfg["timezone"]))
+    closed = local.time() > datetime.time.fromisoformat(cfg["hours"][1])
+    day = local.date() if closed else local.date() - datetime.timedelta(days=1)
+    return get_calendar(market).prev_session(day)
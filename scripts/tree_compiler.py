@@ -0,0 +1,255 @@
+import os
+import sys
+import json
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+sys.path.append(BASE_DIR)
+
+# 注意：本模組不 import xgboost；編譯只需 booster 的 JSON dump
+
+MODEL_DIR = os.path.join(DATA_DIR, "models")   # 可重建，不進版控
+
+def model_file(code):
+    return os.path.join(MODEL_DIR, f"{code}.npz")
+
+# ===============================
+# Compile（XGBoost JSON → 扁平陣列）
+# ===============================
+def _base_score(raw):
+    return float(str(raw).strip("[]"))
+
+def compile_models(models, feature_names=None):
+    """Flatten fitted regressors {name: XGBRegressor | Booster} into one Ensemble.
+
+    Only reg:squarederror-style (identity link) numeric-split models are
+    supported, which is what ai_engine trains.
+    """
+    # 節點 0 保留為值 0 的葉節點，供樹數不同的模型補齊
+    feature, threshold, left, right, default_left, value = [0], [0.0], [-1], [-1], [True], [0.0]
+    roots, base, names, depth = [], [], [], 0
+
+    for name, model in models.items():
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        spec = json.loads(booster.save_raw("json"))["learner"]
+        base.append(_base_score(spec["learner_model_param"]["base_score"]))
+
+        tree_roots = []
+        for t in spec["gradient_booster"]["model"]["trees"]:
+            off = len(feature)
+            lc = np.asarray(t["left_children"])
+            rc = np.asarray(t["right_children"])
+            leaf = lc == -1
+            if any(t.get("split_type", [])):
+                raise ValueError(f"{name}: categorical splits are not supported")
+
+            feature += list(np.where(leaf, 0, t["split_indices"]))
+            threshold += list(np.where(leaf, 0.0, t["split_conditions"]))
+            value += list(np.where(leaf, t["split_conditions"], 0.0))
+            left += list(np.where(leaf, -1, lc + off))
+            right += list(np.where(leaf, -1, rc + off))
+            default_left += [bool(d) for d in t["default_left"]]
+            tree_roots.append(off)
+            depth = max(depth, _depth(lc, rc))
+
+        roots.append(tree_roots)
+        names.append(name)
+
+    n_trees = max((len(r) for r in roots), default=0)
+    root = np.zeros((len(roots), n_trees), dtype=np.int32)
+    for i, r in enumerate(roots):
+        root[i, :len(r)] = r
+
+    return Ensemble(
+        names=names,
+        feature=np.asarray(feature, dtype=np.int32),
+        threshold=np.asarray(threshold, dtype=np.float32),
+        left=np.asarray(left, dtype=np.int32),
+        right=np.asarray(right, dtype=np.int32),
+        default_left=np.asarray(default_left, dtype=bool),
+        value=np.asarray(value, dtype=np.float32),
+        root=root,
+        base=np.asarray(base, dtype=np.float64),
+        depth=depth,
+        feature_names=list(feature_names or []),
+    )
+
+def _depth(lc, rc):
+    d, frontier = 0, [0]
+    while True:
+        frontier = [c for n in frontier for c in (lc[n], rc[n]) if c != -1]
+        if not frontier:
+            return d
+        d += 1
+
+# ===============================
+# Vectorised Predictor
+# ===============================
+class Ensemble:
+    """Flat node arrays for many tree ensembles, scored together with NumPy.
+
+    Every row walks all trees of its own model in lock-step: `depth`
+    gather steps over an (rows × trees) index matrix, then one sum.
+    """
+
+    FIELDS = ("feature", "threshold", "left", "right", "default_left", "value", "root", "base")
+
+    def __init__(self, names, feature, threshold, left, right, default_left,
+                 value, root, base, depth, feature_names=()):
+        self.names = list(names)
+        self.index = {n: i for i, n in enumerate(self.names)}
+        self.feature, self.threshold = feature, threshold
+        self.left, self.right, self.default_left = left, right, default_left
+        self.value, self.root, self.base = value, root, base
+        self.depth = int(depth)
+        self.feature_names = list(feature_names)
+        self.is_leaf = left == -1
+        self.meta = {}
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def predict(self, X, names):
+        """X: rows × features; names: model per row (len(X) names, or one name for all)."""
+        X = np.asarray(X, dtype=np.float32)
+        if isinstance(names, str):
+            names = [names] * len(X)
+        model = np.fromiter((self.index[n] for n in names), dtype=np.int64, count=len(X))
+
+        node = self.root[model]                      # rows × trees
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.threshold[node])
+            nxt = np.where(go_left, self.left[node], self.right[node])
+            node = np.where(self.is_leaf[node], node, nxt)
+
+        return self.base[model] + self.value[node].sum(axis=1, dtype=np.float64)
+
+    # ===============================
+    # Subset / Merge（沿用未重訓標的的樹）
+    # ===============================
+    def subset(self, names):
+        """Ensemble of only `names`, with unreachable nodes dropped."""
+        rows = [self.index[n] for n in names]
+        root = self.root[rows]
+
+        reach, frontier = [np.zeros(1, dtype=np.int64)], np.unique(root)
+        while frontier.size:
+            reach.append(frontier)
+            kids = np.concatenate([self.left[frontier], self.right[frontier]])
+            frontier = np.unique(kids[kids != -1])
+        keep = np.unique(np.concatenate(reach))              # 0（補齊用葉節點）排第一
+
+        remap = np.full(len(self.feature), -1, dtype=np.int32)
+        remap[keep] = np.arange(len(keep), dtype=np.int32)
+        left, right = self.left[keep], self.right[keep]
+        return Ensemble(
+            names=[self.names[i] for i in rows],
+            feature=self.feature[keep],
+            threshold=self.threshold[keep],
+            left=np.where(left == -1, -1, remap[left]).astype(np.int32),
+            right=np.where(right == -1, -1, remap[right]).astype(np.int32),
+            default_left=self.default_left[keep],
+            value=self.value[keep],
+            root=remap[root],
+            base=self.base[rows],
+            depth=self.depth,
+            feature_names=self.feature_names,
+        )
+
+    def merge(self, other):
+        """Both ensembles in one; `self` wins on duplicate names."""
+        if self.feature_names != other.feature_names:
+            raise ValueError("cannot merge ensembles with different features")
+        other = other.subset([n for n in other.names if n not in self.index])
+        off = len(self.feature)
+
+        def shift(a):
+            return np.where(a == -1, -1, a + off).astype(np.int32)
+
+        n_trees = max(self.root.shape[1], other.root.shape[1])
+        root = np.zeros((len(self.names) + len(other.names), n_trees), dtype=np.int32)
+        root[:len(self.names), :self.root.shape[1]] = self.root
+        root[len(self.names):, :other.root.shape[1]] = other.root + off
+
+        return Ensemble(
+            names=self.names + other.names,
+            feature=np.concatenate([self.feature, other.feature]),
+            threshold=np.concatenate([self.threshold, other.threshold]),
+            left=np.concatenate([self.left, shift(other.left)]),
+            right=np.concatenate([self.right, shift(other.right)]),
+            default_left=np.concatenate([self.default_left, other.default_left]),
+            value=np.concatenate([self.value, other.value]),
+            root=root,
+            base=np.concatenate([self.base, other.base]),
+            depth=max(self.depth, other.depth),
+            feature_names=self.feature_names,
+        )
+
+    # ===============================
+    # Persistence
+    # ===============================
+    def save(self, path, meta=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        info = {"depth": self.depth, "feature_names": self.feature_names, **(meta or {})}
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                names=np.array(self.names),
+                meta=np.array(json.dumps(info)),
+                **{k: getattr(self, k) for k in self.FIELDS},
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return None
+        z = np.load(path, allow_pickle=False)
+        info = json.loads(str(z["meta"]))
+        ens = cls(
+            names=z["names"].tolist(),
+            depth=info["depth"],
+            feature_names=info["feature_names"],
+            **{k: z[k] for k in cls.FIELDS},
+        )
+        ens.meta = info
+        return ens
+
+# ===============================
+# Scoring-only Run（不需 xgboost，使用本地價格庫）
+# ===============================
+def score_market(code):
+    """Score each saved model on its latest bar in the feature store; {symbol: pred}."""
+    from scripts import feature_store
+
+    ens = Ensemble.load(model_file(code))
+    fs = feature_store.open_store(code) if ens is not None else None
+    if fs is None:
+        return {}
+    cols = [fs.features.index(f) for f in ens.feature_names]
+
+    names, rows = [], []
+    for s in ens.names:
+        i = fs.last_row(s)
+        if i is None:
+            continue
+        x = fs.X[i, fs.col[s], cols]
+        if np.isnan(x).any():
+            continue
+        names.append(s)
+        rows.append(x)
+
+    if not rows:
+        return {}
+    preds = ens.predict(np.vstack(rows), names)
+    return dict(zip(names, map(float, preds)))
+
+if __name__ == "__main__":
+    from scripts import market_registry
+    for c in sys.argv[1:] or market_registry.codes():
+        for s, p in sorted(score_market(c).items(), key=lambda x: -x[1]):
+            print(f"[Score][{c}] {market_registry.display(s, c)} {p:+.2%}")
@@ -0,0 +1,126 @@
+import io
+import os
+import re
+import sys
+import csv
+
+import requests
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from scripts import market_registry
+
+# ===============================
+# Sources（全市場掛牌清單 → data/universe_<code>.csv）
+# ===============================
+TWSE_ISIN_URL = "https://isin.twse.com.tw/isin/C_public.jsp?strMode={mode}"
+TWSE_MODES = {2: ("TWSE", ".TW"), 4: ("TPEx", ".TWO")}    # 上市 / 上櫃
+TWSE_COMMON_STOCK = "ESVUFR"
+
+NASDAQ_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
+OTHER_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+OTHER_EXCHANGES = {"N": "NYSE", "A": "NYSE American", "P": "NYSE Arca", "Z": "Cboe BZX", "V": "IEX"}
+US_EXCLUDE = re.compile(r"\b(Warrants?|Units?|Rights?|Preferred|Notes?|Debentures?)\b", re.I)
+
+FIELDS = ["symbol", "name", "exchange"]
+TIMEOUT = 30
+
+def _get(url, encoding=None):
+    r = requests.get(url, timeout=TIMEOUT)
+    r.raise_for_status()
+    if encoding:
+        r.encoding = encoding
+    return r.text
+
+def parse_twse(html, exchange, suffix):
+    table = pd.read_html(io.StringIO(html), header=0)[0]
+    code_col, cfi_col = table.columns[0], "CFICode"
+    rows = []
+    for raw, cfi in zip(table[code_col].astype(str), table.get(cfi_col, pd.Series(dtype=str)).astype(str)):
+        if cfi != TWSE_COMMON_STOCK:
+            continue
+        parts = raw.replace("　", " ").split(None, 1)
+        if len(parts) != 2 or not parts[0].isdigit():
+            continue
+        rows.append({"symbol": parts[0] + suffix, "name": parts[1].strip(), "exchange": exchange})
+    return rows
+
+def fetch_twse():
+    rows = []
+    for mode, (exchange, suffix) in TWSE_MODES.items():
+        rows += parse_twse(_get(TWSE_ISIN_URL.format(mode=mode), "big5hkscs"), exchange, suffix)
+    return rows
+
+def _pipe_table(text):
+    lines = [l for l in text.splitlines() if l and not l.startswith("File Creation Time")]
+    return pd.read_csv(io.StringIO("\n".join(lines)), sep="|", dtype=str).fillna("")
+
+def parse_nasdaqtrader(nasdaq_text, other_text):
+    rows = []
+    nq = _pipe_table(nasdaq_text)
+    nq = nq[(nq["Test Issue"] == "N") & (nq["ETF"] == "N")]
+    rows += [
+        {"symbol": s, "name": n, "exchange": "NASDAQ"}
+        for s, n in zip(nq["Symbol"], nq["Security Name"])
+    ]
+
+    ot = _pipe_table(other_text)
+    ot = ot[(ot["Test Issue"] == "N") & (ot["ETF"] == "N") & ot["Exchange"].isin(list(OTHER_EXCHANGES))]
+    rows += [
+        {"symbol": s, "name": n, "exchange": OTHER_EXCHANGES[e]}
+        for s, n, e in zip(ot["ACT Symbol"], ot["Security Name"], ot["Exchange"])
+    ]
+
+    out = []
+    for r in rows:
+        if "$" in r["symbol"] or US_EXCLUDE.search(r["name"]):
+            continue
+        # Yahoo 以 "-" 表示股別（BRK.B → BRK-B）
+        r["symbol"] = r["symbol"].replace(".", "-")
+        out.append(r)
+    return out
+
+def fetch_nasdaqtrader():
+    return parse_nasdaqtrader(_get(NASDAQ_LISTED_URL), _get(OTHER_LISTED_URL))
+
+SOURCES = {
+    "twse": fetch_twse,
+    "nasdaqtrader": fetch_nasdaqtrader,
+}
+
+# ===============================
+# Main
+# ===============================
+def sync(code):
+    """Refresh the market's universe file; keeps the previous file on failure."""
+    source = market_registry.get(code)["universe_source"]
+    if source not in SOURCES:
+        print(f"[Universe][{code}] no listing source configured")
+        return None
+
+    try:
+        rows = SOURCES[source]()
+    except Exception as e:
+        print(f"[WARN][{code}] universe source {source} unavailable: {e}")
+        return None
+    if not rows:
+        print(f"[WARN][{code}] universe source {source} returned nothing")
+        return None
+
+    rows = list({r["symbol"]: r for r in rows}.values())
+    path = market_registry.universe_file(code)
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+    os.replace(tmp, path)
+
+    print(f"[Universe][{code}] {len(rows)} listed symbols → {path}")
+    return len(rows)
+
+if __name__ == "__main__":
+    for c in sys.argv[1:] or market_registry.codes():
+        sync(c)
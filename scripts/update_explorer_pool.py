@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# ===============================
+# Base / Data
+# ===============================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+sys.path.insert(0, BASE_DIR)
+
+from scripts.safe_yfinance import safe_download
+from scripts import market_registry, history, memory_profile
+from scripts.trading_calendar import last_closed_session
+
+STATE_DIR = os.path.join(DATA_DIR, "explorer_state")       # 可重建，不進版控
+
+POOL_SIZE = 500
+CHUNK = int(os.getenv("EXPLORER_CHUNK", "200"))            # 每批下載的標的數（記憶體上限）
+BUDGET_SECONDS = int(os.getenv("EXPLORER_BUDGET", "2400"))  # 週更工作的掃描時間上限
+PERIOD = "1mo"            # 新標的首次回補
+VOLUME_DAYS = 20
+MIN_BARS = 15
+MAX_GAP_DAYS = 40         # 狀態過舊時改用完整回補
+DAILY_CANDIDATES = 3      # 日更只刷新前 POOL_SIZE × 3 名（其餘由週更補上）
+
+def state_file(code):
+    return os.path.join(STATE_DIR, f"{code}.npz")
+
+def _num(x, digits=None):
+    """JSON-safe float: NaN → None."""
+    x = float(x)
+    if np.isnan(x):
+        return None
+    return round(x, digits) if digits is not None else x
+
+def _write_json(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2, allow_nan=False)
+    os.replace(tmp, path)
+
+# ===============================
+# Rolling Volume State（每檔最近 VOLUME_DAYS 根日線）
+# ===============================
+class VolumeState:
+    """Last VOLUME_DAYS daily volumes / closes per symbol, oldest → newest.
+
+    A refresh folds in only the bars newer than each symbol's last_date
+    and ranks straight from these arrays.
+    """
+
+    def __init__(self, symbols=()):
+        self.symbols = list(symbols)
+        n = len(self.symbols)
+        self.volume = np.full((n, VOLUME_DAYS), np.nan)
+        self.close = np.full((n, VOLUME_DAYS), np.nan)
+        self.last_date = np.full(n, np.datetime64("NaT"), dtype="datetime64[D]")
+        self._index()
+
+    def _index(self):
+        self.col = {s: i for i, s in enumerate(self.symbols)}
+
+    def sync(self, universe):
+        """Align rows to the universe: keep known symbols, add new ones empty."""
+        new = VolumeState(universe)
+        have = [(i, self.col[s]) for i, s in enumerate(new.symbols) if s in self.col]
+        if have:
+            dst, src = map(list, zip(*have))
+            new.volume[dst] = self.volume[src]
+            new.close[dst] = self.close[src]
+            new.last_date[dst] = self.last_date[src]
+        return new
+
+    def fold(self, symbol, dates, volume, close):
+        i = self.col[symbol]
+        last = self.last_date[i]
+        keep = np.ones(len(dates), dtype=bool) if np.isnat(last) else dates > last
+        if not keep.any():
+            return 0
+        self.volume[i] = np.concatenate([self.volume[i], volume[keep]])[-VOLUME_DAYS:]
+        self.close[i] = np.concatenate([self.close[i], close[keep]])[-VOLUME_DAYS:]
+        self.last_date[i] = dates[keep][-1]
+        return int(keep.sum())
+
+    def ranking(self, k=POOL_SIZE, min_bars=MIN_BARS):
+        """Top-k rows by average volume (vectorised over the whole state)."""
+        bars = (~np.isnan(self.volume)).sum(axis=1)
+        with np.errstate(invalid="ignore"):
+            avg = np.nanmean(self.volume, axis=1)
+            dollar = np.nanmean(self.volume * self.close, axis=1)
+        avg = np.where(bars >= min_bars, avg, -np.inf)
+
+        k = min(k, int(np.isfinite(avg).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-avg, k - 1)[:k]
+        top = sorted(top, key=lambda i: (-avg[i], self.symbols[i]))
+        last_close = self.close[np.arange(len(self.symbols)), VOLUME_DAYS - 1]
+        return [{
+            "symbol": self.symbols[i],
+            "rank": n + 1,
+            "avg_volume": _num(avg[i]),
+            "avg_dollar_volume": _num(dollar[i]),
+            "close": _num(last_close[i], 4),    # 最新一根缺 bar 時為 None
+            "bars": int(bars[i]),
+        } for n, i in enumerate(top)]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, symbols=np.array(self.symbols), volume=self.volume,
+                     close=self.close, last_date=self.last_date)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        z = np.load(path, allow_pickle=False)
+        st = cls()
+        st.symbols = z["symbols"].tolist()
+        st.volume, st.close, st.last_date = z["volume"], z["close"], z["last_date"]
+        st._index()
+        return st
+
+# ===============================
+# Incremental Fetch（只抓上次之後的 bar）
+# ===============================
+def fetch_plan(state, target, symbols):
+    """Group stale symbols by fetch start; None = full PERIOD backfill."""
+    target = np.datetime64(target, "D")
+    groups = {}
+    for s in symbols:
+        last = state.last_date[state.col[s]]
+        if not np.isnat(last) and last >= target:
+            continue
+        if np.isnat(last) or (target - last).astype(int) > MAX_GAP_DAYS:
+            start = None
+        else:
+            start = str(last + 1)
+        groups.setdefault(start, []).append(s)
+    return groups
+
+def refresh(code, state, symbols, target, budget=BUDGET_SECONDS):
+    """Fetch and fold new bars for `symbols`; new bars also go to the price store."""
+    t0 = time.monotonic()
+    fetched, bars, frames = 0, 0, []
+
+    for start, group in fetch_plan(state, target, symbols).items():
+        for i in range(0, len(group), CHUNK):
+            if time.monotonic() - t0 > budget:
+                print(f"[WARN][{code}] refresh budget reached after {fetched} symbols")
+                return fetched, bars, frames
+            part = group[i:i + CHUNK]
+            data = safe_download(part, period=PERIOD, start=start)
+            fetched += len(part)
+            if data is None:
+                continue
+
+            for s in part:
+                try:
+                    df = data[s] if data.columns.nlevels > 1 else data
+                    df = df.dropna(subset=["Close", "Volume"])
+                except (KeyError, TypeError):
+                    continue
+                if df.empty:
+                    continue
+                dates = pd.DatetimeIndex(df.index).tz_localize(None).values.astype("datetime64[D]")
+                bars += state.fold(
+                    s, dates,
+                    df["Volume"].to_numpy(np.float64),
+                    df["Close"].to_numpy(np.float64),
+                )
+            frames.append(history.panel_to_long(data, part))
+            del data
+
+    return fetched, bars, frames
+
+# ===============================
+# Main（全市場清單見 data/universe_<code>.csv，缺檔時用 markets.json 的 universe）
+# ===============================
+def run(code, daily=False, full=False):
+    universe = market_registry.universe(code)
+    path = state_file(code)
+    state = (VolumeState() if full else VolumeState.load(path)).sync(universe)
+    target = last_closed_session(code)
+
+    if daily:
+        # 日更：只刷新上次排名前段的候選（新標的留給週更）
+        known = [r["symbol"] for r in state.ranking(POOL_SIZE * DAILY_CANDIDATES)]
+        symbols = known or universe
+    else:
+        symbols = universe
+
+    print(f"[Explorer][{code}] Refreshing {len(symbols)} / {len(universe)} symbols up to {target}...")
+    t0 = time.monotonic()
+    with memory_profile.stage(f"{code}.refresh"):
+        fetched, bars, frames = refresh(code, state, symbols, target)
+    state.save(path)
+
+    frames = [f for f in frames if not f.empty]
+    if frames:
+        try:
+            with memory_profile.stage(f"{code}.store"):
+                history.append_prices(code, pd.concat(frames, ignore_index=True))
+        except Exception as e:
+            print(f"[WARN] price store update failed: {e}")
+
+    top = state.ranking(POOL_SIZE)
+    if not top:
+        print(f"[WARN][{code}] No valid volume data, keep previous pool")
+        return
+
+    # 排名明細（每日變動）只放快取；進版控的 pool 檔只在成員改變時改寫
+    scan_seconds = round(time.monotonic() - t0, 1)
+    _write_json(market_registry.ranking_file(code), {
+        "market": code,
+        "updated_at": datetime.now().isoformat(),
+        "as_of": str(target),
+        "universe_size": len(universe),
+        "refreshed": fetched,
+        "new_bars": bars,
+        "scan_seconds": scan_seconds,
+        "ranking": top,
+    })
+
+    members = sorted(r["symbol"] for r in top)
+    pool = market_registry.pool_file(code)
+    try:
+        previous = json.load(open(pool, "r", encoding="utf-8")).get("symbols")
+    except (OSError, ValueError):
+        previous = None
+    if previous == members:
+        print(f"[Explorer][{code}] Pool unchanged ({len(members)} symbols), {fetched} fetched / {bars} new bars in {scan_seconds}s")
+        return
+
+    _write_json(pool, {
+        "market": code,
+        "updated_at": datetime.now().isoformat(),
+        "as_of": str(target),
+        "count": len(members),
+        "symbols": members,
+    })
+    print(f"[Explorer][{code}] Pool updated: {len(members)} symbols, {fetched} fetched / {bars} new bars in {scan_seconds}s")
+
+def main():
+    ap = argparse.ArgumentParser(description="Refresh explorer pools from the rolling volume state")
+    ap.add_argument("markets", nargs="*", help="market codes (default: all enabled)")
+    ap.add_argument("--daily", action="store_true", help="refresh only the current top candidates")
+    ap.add_argument("--full", action="store_true", help="discard saved state and rescan")
+    args = ap.parse_args()
+    for c in args.markets or market_registry.codes():
+        run(c, daily=args.daily, full=args.full)
+
+if __name__ == "__main__":
+    main()
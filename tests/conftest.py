@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """history_store / data_retention pointed at an empty tmp data dir."""
+    from scripts import data_retention, history_store
+
+    monkeypatch.setattr(data_retention, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(history_store, "DB_FILE", str(tmp_path / "history.db"))
+    monkeypatch.setattr(history_store, "HISTORY_CSV", {"TW": str(tmp_path / "tw_history.csv")})
+    monkeypatch.setattr(history_store, "OBSERVATION_CSV", str(tmp_path / "forecast_observation.csv"))
+    history_store._ready.discard(history_store.DB_FILE)
+    yield tmp_path
+    history_store._ready.discard(history_store.DB_FILE)
@@ -0,0 +1,106 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts import contagion, market_registry
+
+DAYS = pd.bdate_range("2026-01-05", periods=80)
+SYMBOLS = ["A", "B", "C", "D"]
+
+# ===============================
+# Fixtures
+# ===============================
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(7)
+    common = rng.normal(0, 0.01, len(DAYS))
+    rets = common[:, None] * [1.0, 0.8, -0.5, 0.0] + rng.normal(0, 0.01, (len(DAYS), len(SYMBOLS)))
+    px = pd.DataFrame(100 * np.cumprod(1 + rets, axis=0), index=DAYS, columns=SYMBOLS)
+    px.iloc[10:20, 3] = np.nan      # D 停牌一段時間
+    return px
+
+@pytest.fixture
+def market(tmp_path, monkeypatch, prices):
+    pool = list(SYMBOLS)
+    monkeypatch.setattr(contagion, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(market_registry, "get", lambda code: {"vix": "^VIX"})
+    monkeypatch.setattr(market_registry, "watch_list", lambda code: list(pool))
+
+    def bars(code, symbols, start, end):
+        return prices.loc[pd.Timestamp(start):pd.Timestamp(end)].reindex(columns=symbols)
+
+    monkeypatch.setattr(contagion, "_bars", bars)
+    return pool
+
+def _by_symbol(ew):
+    """cov keyed by (symbol, symbol), independent of column order."""
+    return {(a, b): ew.cov[i, j] for a, i in ew.col.items() for b, j in ew.col.items()}
+
+def _day(i):
+    return DAYS[i].date()
+
+# ===============================
+# Incremental == rebuild
+# ===============================
+def test_incremental_matches_full_rebuild(market, tmp_path):
+    contagion.update_market("TW", today=_day(30))
+    for i in range(31, len(DAYS)):
+        inc = contagion.update_market("TW", today=_day(i))
+
+    full = contagion.EWCov(SYMBOLS)
+    for day, row in zip(DAYS, contagion._bars("TW", SYMBOLS, DAYS[0], DAYS[-1]).to_numpy()):
+        full.update(row, day.date().isoformat())
+
+    assert inc.last_date == full.last_date
+    np.testing.assert_allclose(inc.cov, full.cov, rtol=1e-12, atol=1e-18)
+    np.testing.assert_array_equal(inc.obs, full.obs)
+
+def test_pool_reorder_keeps_state(market, monkeypatch):
+    before = contagion.update_market("TW", today=_day(60))
+    market.reverse()
+
+    calls = []
+    bars = contagion._bars
+    monkeypatch.setattr(contagion, "_bars", lambda *a: calls.append(a[2]) or bars(*a))
+    after = contagion.update_market("TW", today=_day(61))
+
+    # 只補新的一根 bar，沒有回補 WARM_DAYS
+    assert calls == [_day(61)]
+    assert after.symbols == SYMBOLS[::-1]
+    reference = before.remap(SYMBOLS)
+    reference.update(bars("TW", SYMBOLS, _day(61), _day(61)).to_numpy()[0], _day(61).isoformat())
+    got, want = _by_symbol(after), _by_symbol(reference)
+    assert got.keys() == want.keys()
+    for k in want:
+        assert got[k] == pytest.approx(want[k], rel=1e-12, abs=1e-18)
+
+def test_pool_change_adds_cold_and_drops_removed(market):
+    before = contagion.update_market("TW", today=_day(60))
+    market.remove("C")
+    market.append("E")
+    after = contagion.update_market("TW", today=_day(60))
+
+    assert after.symbols == ["A", "B", "D", "E"]
+    assert after.obs[after.col["E"]] == 0 and not after.cov[after.col["E"]].any()
+    assert after.obs[after.col["A"]] == before.obs[before.col["A"]]
+    assert after.cov[after.col["A"], after.col["B"]] == before.cov[before.col["A"], before.col["B"]]
+
+# ===============================
+# Partial bars
+# ===============================
+def test_partial_last_bar_is_not_folded(market, prices):
+    prices.iloc[61, 1:] = np.nan        # 盤中：只有 A 有最新報價
+    ew = contagion.update_market("TW", today=_day(61))
+    assert ew.last_date == _day(60).isoformat()
+
+    prices.iloc[61, 1:] = prices.iloc[60, 1:]    # 收盤後資料補齊
+    ew = contagion.update_market("TW", today=_day(61))
+    assert ew.last_date == _day(61).isoformat()
+
+def test_old_state_version_rebuilds(market, tmp_path, monkeypatch):
+    contagion.update_market("TW", today=_day(30))
+    monkeypatch.setattr(contagion, "STATE_VERSION", contagion.STATE_VERSION + 1)
+    assert contagion.EWCov.load(contagion.state_file("TW")) is None
+    assert date.fromisoformat(contagion.update_market("TW", today=_day(31)).last_date) == _day(31)
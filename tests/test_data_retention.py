@@ -0,0 +1,71 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from scripts import data_retention, history_store
+
+TODAY = datetime(2026, 10, 19)   # 2026-06 距今 > FORCE_SEAL_MONTHS → 強制封存
+
+# ===============================
+# Helpers
+# ===============================
+def _compact():
+    data_retention.compact_csv(history_store.HISTORY_CSV["TW"], "date", data_retention._all_settled, TODAY)
+    data_retention.compact_csv(history_store.OBSERVATION_CSV, "settle_date", None, TODAY)
+
+def _settle(row, real_ret, settle_date):
+    history_store.settle_many([{
+        "id": int(row["id"]), "market": "TW", "symbol": row["symbol"], "horizon": 5,
+        "forecast_ret": row["pred_ret"], "real_ret": real_ret, "hit": int(real_ret > 0),
+        "settle_date": settle_date,
+    }])
+
+def _rebuild():
+    os.remove(history_store.DB_FILE)
+    history_store._ready.discard(history_store.DB_FILE)
+    return history_store.read_predictions("TW"), history_store.read_observations()
+
+def _hot_months(path, col="date"):
+    return set(pd.read_csv(path, dtype=str)[col].str[:7])
+
+# ===============================
+# Seal → settle late → rebuild
+# ===============================
+@pytest.mark.parametrize("compact_late", [True, False])
+def test_late_settlement_survives_rebuild(store, compact_late):
+    history_store.append_predictions("TW", [
+        {"date": "2026-06-01", "symbol": "2330.TW", "entry_price": 900.0, "pred_ret": 0.01, "horizon": 5},
+        {"date": "2026-06-02", "symbol": "2317.TW", "entry_price": 150.0, "pred_ret": -0.02, "horizon": 5},
+    ])
+    first, late = history_store.unsettled("TW").to_dict("records")
+    _settle(first, 0.02, "2026-06-08")
+
+    history_store.export_csv()
+    _compact()
+    hot = history_store.HISTORY_CSV["TW"]
+    assert data_retention.sealed_months(hot) == {"2026-06"}
+    assert _hot_months(hot) == set()
+
+    # 封存後才結算：預測與觀測都屬於已封存月份
+    _settle(late, -0.03, "2026-06-30")
+    history_store.export_csv()
+    assert _hot_months(hot) == {"2026-06"}
+    assert _hot_months(history_store.OBSERVATION_CSV, "settle_date") == {"2026-06"}
+
+    if compact_late:
+        _compact()
+        names = sorted(os.listdir(data_retention.archive_dir(hot)))
+        assert names == ["2026-06.1.csv.gz", "2026-06.csv.gz"]
+
+        # 補充區段寫入後再匯出 / 壓實不再重複封存
+        history_store.export_csv()
+        _compact()
+        assert sorted(os.listdir(data_retention.archive_dir(hot))) == names
+        assert _hot_months(hot) == set()
+
+    preds, obs = _rebuild()
+    assert len(preds) == 2 and preds["settled"].all()
+    assert preds.set_index("symbol").loc["2317.TW", "real_ret"] == pytest.approx(-0.03)
+    assert sorted(obs["settle_date"]) == ["2026-06-08", "2026-06-30"]
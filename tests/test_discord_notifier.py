@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import subprocess
+
+import pytest
+import requests
+
+from scripts import discord_notifier as dn
+from scripts import mock_services
+
+# ===============================
+# Fixtures
+# ===============================
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    path = tmp_path / "outbox"
+    monkeypatch.setattr(dn, "OUTBOX_DIR", str(path))
+    monkeypatch.setattr(dn, "FAILED_DIR", str(path / "failed"))
+    monkeypatch.setattr(dn, "limiter", dn.RateLimiter())
+    return path
+
+@pytest.fixture
+def mock():
+    servers = []
+
+    def start(**overrides):
+        server, base = mock_services.start(webhook_latency_ms=(0, 1), **overrides)
+        servers.append(server)
+        return server, base
+
+    yield start
+    for s in servers:
+        s.shutdown()
+        s.server_close()
+
+def _exhaust(hook, n):
+    for _ in range(n):
+        assert requests.post(hook, json={"content": "x"}).status_code == 204
+
+# ===============================
+# Rate Limits
+# ===============================
+def test_bucket_429_waits_for_reset_and_retries(outbox, mock):
+    server, base = mock(webhook_limit=2, webhook_window_sec=0.5)
+    hook = f"{base}/api/webhooks/1/a"
+    _exhaust(hook, 2)
+
+    t0 = time.monotonic()
+    assert dn.post(hook, {"content": "hi"}) == "ok"
+    assert time.monotonic() - t0 >= 0.3
+
+    st = mock_services.stats(server)
+    assert st["webhook_429"] == 1
+    assert st["webhook_messages"] == 3
+    assert dn.limiter._bucket_of[hook].startswith("mock-")
+
+def test_bucket_headers_pace_requests_without_429(outbox, mock):
+    server, base = mock(webhook_limit=2, webhook_window_sec=0.3)
+    hook = f"{base}/api/webhooks/1/a"
+
+    assert [dn.post(hook, {"content": str(i)}) for i in range(6)] == ["ok"] * 6
+
+    st = mock_services.stats(server)
+    assert st["webhook_429"] == 0
+    assert st["webhook_messages"] == 6
+
+def test_global_429_blocks_every_webhook(outbox, mock):
+    server, base = mock(webhook_limit=1, webhook_window_sec=0.5, webhook_global=True)
+    a, b = f"{base}/api/webhooks/1/a", f"{base}/api/webhooks/2/b"
+    _exhaust(a, 1)
+
+    resp = requests.post(b, json={"content": "y"})
+    assert resp.status_code == 429
+    dn.limiter.update(b, resp)
+    assert dn.limiter.delay(a) > 0
+    assert dn.limiter.delay(f"{base}/api/webhooks/3/never-used") > 0
+
+    assert dn.post(a, {"content": "z"}) == "ok"
+    assert mock_services.stats(server)["webhook_429"] == 1
+
+# ===============================
+# Packing
+# ===============================
+def test_pack_respects_embed_count_and_char_limits():
+    small = [{"title": f"e{i}"} for i in range(25)]
+    assert [len(p["embeds"]) for p in dn.pack(embeds=small)] == [10, 10, 5]
+
+    big = [{"description": "x" * 2500} for _ in range(5)]
+    payloads = dn.pack(embeds=big)
+    assert [len(p["embeds"]) for p in payloads] == [2, 2, 1]
+    for p in payloads:
+        assert sum(map(dn.embed_chars, p["embeds"])) <= dn.MAX_EMBED_CHARS
+
+def test_pack_splits_content_and_attaches_first_embed_group():
+    text = "\n".join(f"line {i:04d}" for i in range(600))
+    payloads = dn.pack(text, [{"title": "t"}] * 12)
+
+    contents = [p["content"] for p in payloads if "content" in p]
+    assert len(contents) > 1
+    assert all(len(c) <= dn.MAX_CONTENT for c in contents)
+    assert "".join(contents) == text
+    assert len(payloads[len(contents) - 1]["embeds"]) == 10
+    assert payloads[-1] == {"embeds": [{"title": "t"}] * 2}
+
+# ===============================
+# Outbox
+# ===============================
+def test_queued_embed_messages_are_merged(outbox, mock):
+    server, base = mock()
+    hook = f"{base}/api/webhooks/1/a"
+    for i in range(11):
+        dn.enqueue(hook, {"embeds": [{"title": f"e{i}"}]})
+    dn.enqueue(hook, {"content": "text"})
+
+    records, _ = dn._claim_pending()
+    dn._deliver(records)
+
+    st = mock_services.stats(server)
+    assert st["webhook_messages"] == 3          # 10 embeds + 1 embed + 文字
+    assert st["webhook_embeds"] == 11
+    assert os.listdir(outbox) == []
+
+def test_claim_left_by_dead_process_is_replayed(outbox, mock):
+    server, base = mock()
+    hook = f"{base}/api/webhooks/1/a"
+
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    lost = dn._record_path(dn.enqueue(hook, {"content": "left behind"}))
+    os.replace(lost, f"{lost}.{dead.pid}")
+
+    # 仍在執行中的 process 所持有的 claim 不可被搶走
+    live = dn._record_path(dn.enqueue(hook, {"content": "in flight"}))
+    os.replace(live, f"{live}.{os.getppid()}")
+
+    assert dn.pending_count() == 0
+    assert dn.flush(timeout=10)
+
+    assert mock_services.stats(server)["webhook_messages"] == 1
+    assert sorted(os.listdir(outbox)) == [os.path.basename(live) + f".{os.getppid()}"]
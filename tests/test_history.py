@@ -0,0 +1,109 @@
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts import columnar_store, history, history_store
+
+# ===============================
+# Fixtures
+# ===============================
+@pytest.fixture
+def columnar(store, monkeypatch):
+    monkeypatch.setattr(columnar_store, "COLUMNAR_DIR", str(store / "columnar"))
+    columnar_store._cache.clear()
+    yield store
+    columnar_store._cache.clear()
+
+def _pred(day, symbol):
+    return {"date": day, "symbol": symbol, "entry_price": 100.0, "pred_ret": 0.01, "horizon": 5}
+
+def _settle(row, real_ret, settle_date):
+    return {
+        "id": int(row["id"]), "market": "TW", "symbol": row["symbol"], "horizon": 5,
+        "forecast_ret": row["pred_ret"], "real_ret": real_ret, "hit": int(real_ret > 0),
+        "settle_date": settle_date,
+    }
+
+def _segments():
+    return columnar_store._segment_names(history._pred_table("TW"))
+
+# ===============================
+# Prediction snapshot
+# ===============================
+def test_refresh_appends_only_changes(columnar):
+    history_store.append_predictions("TW", [_pred("2026-10-01", "2330.TW"), _pred("2026-10-01", "2317.TW")])
+    df = history.query("TW")
+    assert len(df) == 2 and _segments() == []
+    assert df["id"].dtype == np.int64 and df["hit"].dtype == "Int64"
+
+    # 開啟 db / 其他市場寫入不觸發重寫
+    history_store.append_predictions("US", [_pred("2026-10-01", "AAPL")])
+    history.query("TW")
+    assert _segments() == []
+
+    row = history_store.unsettled("TW").iloc[0]
+    history_store.settle_many([_settle(row, 0.03, "2026-10-08")])
+    history_store.append_predictions("TW", [_pred("2026-10-02", "2330.TW")])
+    df = history.query("TW")
+    assert _segments() == ["000000"]
+    assert len(df) == 3
+    got = df.set_index(["date", "symbol"]).loc[(pd.Timestamp("2026-10-01"), row["symbol"])]
+    assert bool(got["settled"]) and got["real_ret"] == pytest.approx(0.03) and got["hit"] == 1
+
+    pd.testing.assert_frame_equal(df, history.query("TW"))
+    assert history.query("TW", settled=True)["symbol"].tolist() == [row["symbol"]]
+
+def test_refresh_rebuilds_for_a_new_db(columnar):
+    history_store.append_predictions("TW", [_pred("2026-10-01", "2330.TW")])
+    history.query("TW")
+    history_store.append_predictions("TW", [_pred("2026-10-02", "2330.TW")])
+    history.query("TW")
+    assert _segments() == ["000000"]
+
+    history_store._ready.discard(history_store.DB_FILE)
+    os.remove(history_store.DB_FILE)
+    history_store.append_predictions("TW", [_pred("2026-10-05", "2454.TW")])
+    df = history.query("TW")
+    assert _segments() == [] and df["symbol"].tolist() == ["2454.TW"]
+
+# ===============================
+# ensure_prices
+# ===============================
+LISTED = {"OLD": pd.Timestamp("2020-01-01"), "NEW": pd.Timestamp("2026-09-15")}
+
+@pytest.fixture
+def downloads(columnar, monkeypatch):
+    calls = []
+
+    def download(symbols, start, end, **kw):
+        calls.append((tuple(symbols), pd.Timestamp(start)))
+        days = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+        frames = {}
+        for s in symbols:
+            idx = days[days >= LISTED[s]]
+            frames[s] = pd.DataFrame(
+                {"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": np.arange(len(idx)) + 10.0, "Volume": 100},
+                index=idx,
+            ).reindex(days)
+        return pd.concat(frames, axis=1)
+
+    monkeypatch.setattr(history.yf, "download", download)
+    return calls
+
+def test_late_listing_is_not_refetched(downloads):
+    history.ensure_prices("US", ["OLD", "NEW"], date(2026, 9, 1), date(2026, 9, 30))
+    assert downloads == [(("NEW", "OLD"), pd.Timestamp("2026-09-01"))]
+
+    # NEW 在 start 之後才上市：下載紀錄已涵蓋，不再重抓
+    px = history.ensure_prices("US", ["OLD", "NEW"], date(2026, 9, 1), date(2026, 9, 30))
+    assert len(downloads) == 1
+    assert px.groupby("symbol")["date"].min()["NEW"] == pd.Timestamp("2026-09-15")
+
+    # 區間往後延伸：只補尾端
+    history.ensure_prices("US", ["OLD", "NEW"], date(2026, 9, 1), date(2026, 10, 9))
+    assert downloads[1] == (("NEW", "OLD"), pd.Timestamp("2026-10-01"))
+    history.ensure_prices("US", ["OLD", "NEW"], date(2026, 9, 1), date(2026, 10, 9))
+    assert len(downloads) == 2
@@ -0,0 +1,123 @@
+import gzip
+import os
+import shutil
+
+import pandas as pd
+
+from scripts import data_retention, history_store
+
+def _pred(day, symbol, pred_ret=0.01):
+    return {"date": day, "symbol": symbol, "entry_price": 100.0, "pred_ret": pred_ret, "horizon": 5}
+
+def _settle(row, real_ret, settle_date):
+    return {
+        "id": int(row["id"]), "market": "TW", "symbol": row["symbol"], "horizon": 5,
+        "forecast_ret": row["pred_ret"], "real_ret": real_ret, "hit": int(real_ret > 0),
+        "settle_date": settle_date,
+    }
+
+def _reopen():
+    history_store._ready.discard(history_store.DB_FILE)
+
+# ===============================
+# Stale cache（actions/cache 還原較舊的 history.db）
+# ===============================
+def test_stale_db_catches_up_with_committed_csv(store):
+    history_store.append_predictions("TW", [_pred("2026-10-01", "2330.TW"), _pred("2026-10-02", "2317.TW")])
+    first = history_store.unsettled("TW").iloc[0]
+    history_store.settle_many([_settle(first, 0.02, "2026-10-08")])
+    history_store.export_csv()
+    shutil.copy(history_store.DB_FILE, store / "stale.db")
+
+    # 另一次執行：新預測 + 結算，提交 CSV
+    history_store.append_predictions("TW", [_pred("2026-10-05", "2454.TW")])
+    late = history_store.unsettled("TW").iloc[0]
+    history_store.settle_many([_settle(late, -0.01, "2026-10-09")])
+    history_store.export_csv()
+    committed = open(history_store.HISTORY_CSV["TW"]).read()
+    committed_obs = open(history_store.OBSERVATION_CSV).read()
+
+    # 下一次執行還原到舊快取
+    shutil.copy(store / "stale.db", history_store.DB_FILE)
+    _reopen()
+    preds = history_store.read_predictions("TW").set_index("symbol")
+    assert len(preds) == 3
+    assert preds.loc["2317.TW", "settled"] and preds.loc["2317.TW", "real_ret"] == -0.01
+    assert len(history_store.read_observations()) == 2
+
+    history_store.export_csv()
+    assert open(history_store.HISTORY_CSV["TW"]).read() == committed
+    assert open(history_store.OBSERVATION_CSV).read() == committed_obs
+
+    # 再開一次不會重複補入
+    _reopen()
+    assert len(history_store.read_observations()) == 2
+    assert len(history_store.read_predictions("TW")) == 3
+
+def test_db_only_rows_are_kept(store):
+    history_store.append_predictions("TW", [_pred("2026-10-01", "2330.TW")])
+    history_store.export_csv()
+    history_store.append_predictions("TW", [_pred("2026-10-02", "2317.TW")])   # 尚未匯出
+    _reopen()
+    assert sorted(history_store.read_predictions("TW")["symbol"]) == ["2317.TW", "2330.TW"]
+
+# ===============================
+# Legacy / archive import
+# ===============================
+def test_import_keeps_latest_row_per_prediction(store):
+    cols = ",".join(history_store.PRED_COLS)
+    archive = data_retention.archive_dir(history_store.HISTORY_CSV["TW"])
+    os.makedirs(archive)
+    with gzip.open(os.path.join(archive, "2026-06.csv.gz"), "wt") as f:
+        f.write(f"{cols}\n2026-06-01,2330.TW,100.0,0.01,5,False,,,\n")
+    with gzip.open(os.path.join(archive, "2026-06.1.csv.gz"), "wt") as f:
+        f.write(f"{cols}\n2026-06-01,2330.TW,100.0,0.01,5,True,0.02,1,2026-06-08\n")
+    # 熱區段重複列（舊版 CSV 可能重複寫入）
+    with open(history_store.HISTORY_CSV["TW"], "w") as f:
+        f.write(f"{cols}\n2026-10-01,2317.TW,50.0,0.02,5,False,,,\n2026-10-01,2317.TW,50.0,0.02,5,False,,,\n")
+
+    preds = history_store.read_predictions("TW").set_index("symbol")
+    assert len(preds) == 2
+    assert preds.loc["2330.TW", "settled"] and preds.loc["2330.TW", "real_ret"] == 0.02
+    assert not preds.loc["2317.TW", "settled"]
+
+# ===============================
+# settle_many
+# ===============================
+def test_settle_many_is_idempotent(store):
+    history_store.append_predictions("TW", [_pred("2026-10-01", "2330.TW")])
+    row = history_store.unsettled("TW").iloc[0]
+    first = _settle(row, 0.02, "2026-10-08")
+
+    assert history_store.settle_many([first]) == 1
+    assert history_store.settle_many([first, _settle(row, -0.5, "2026-10-09")]) == 0
+
+    pred = history_store.read_predictions("TW").iloc[0]
+    assert pred["real_ret"] == 0.02 and pred["settle_date"] == "2026-10-08"
+    obs = history_store.read_observations()
+    assert len(obs) == 1 and obs["prediction_id"].tolist() == [row["id"]]
+    assert history_store.unsettled("TW").empty
+
+# ===============================
+# export_csv + hot_rows
+# ===============================
+def test_export_skips_only_rows_sealed_with_the_same_values(store):
+    history_store.append_predictions("TW", [_pred("2026-06-01", "2330.TW"), _pred("2026-06-01", "2317.TW")])
+    rows = history_store.unsettled("TW")
+    history_store.settle_many([_settle(r, 0.01, "2026-06-08") for r in rows.to_dict("records")])
+    history_store.export_csv()
+    assert len(pd.read_csv(history_store.HISTORY_CSV["TW"])) == 2
+
+    data_retention.compact_csv(history_store.HISTORY_CSV["TW"], "date", data_retention._all_settled)
+    data_retention.compact_csv(history_store.OBSERVATION_CSV, "settle_date")
+    history_store.export_csv()
+    assert pd.read_csv(history_store.HISTORY_CSV["TW"]).empty
+    assert pd.read_csv(history_store.OBSERVATION_CSV).empty
+
+    # 值相同的觀測也一對一比對：第二筆同值觀測仍需匯出
+    history_store.append_predictions("TW", [_pred("2026-06-02", "2330.TW")])
+    row = history_store.unsettled("TW").iloc[0]
+    history_store.settle_many([_settle(row, 0.01, "2026-06-08")])
+    history_store.export_csv()
+    assert pd.read_csv(history_store.HISTORY_CSV["TW"])["date"].tolist() == ["2026-06-02"]
+    assert len(pd.read_csv(history_store.OBSERVATION_CSV)) == 1
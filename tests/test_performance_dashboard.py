@@ -0,0 +1,36 @@
+import pytest
+
+from scripts import history_store, metrics_materializer, performance_dashboard, significance
+
+@pytest.fixture
+def metrics(store, monkeypatch):
+    monkeypatch.setattr(metrics_materializer, "STATE_FILE", str(store / "metrics_state.json"))
+    monkeypatch.setattr(metrics_materializer, "POLICY_FILE", str(store / "horizon_policy.json"))
+    monkeypatch.setattr(metrics_materializer, "METRICS_FILES", {"TW": str(store / "metrics_tw.csv")})
+    return store
+
+def test_gate_uses_the_materialized_window(metrics):
+    n = metrics_materializer.WINDOW + 10
+    history_store.append_predictions("TW", [
+        {"date": f"2026-08-{i + 1:02d}", "symbol": "2330.TW", "entry_price": 100.0, "pred_ret": 0.01, "horizon": 5}
+        for i in range(n)
+    ])
+    rows = history_store.unsettled("TW").to_dict("records")
+    # 觀測 id 順序與 settle_date 順序不同：最早的 10 筆最後才結算、且全部落空
+    records = []
+    for k, r in enumerate(rows[10:] + rows[:10]):
+        hit = 0 if k >= n - 10 else k % 2
+        records.append({
+            "id": r["id"], "market": "TW", "symbol": r["symbol"], "horizon": 5, "forecast_ret": 0.01,
+            "real_ret": 0.01 if hit else -0.01, "hit": hit, "settle_date": r["date"],
+        })
+    history_store.settle_many(records)
+    metrics_materializer.update_all()
+
+    r = performance_dashboard.process_market("TW", {"TW": 5})
+    hits = history_store.read_observations("TW", tail=metrics_materializer.WINDOW)["hit"]
+
+    assert r["hit"] == pytest.approx(metrics_materializer.latest("TW")["hit_rate"], abs=1e-4)
+    assert r["hit"] == pytest.approx(hits.mean())
+    assert r["ci"]["n"] == metrics_materializer.WINDOW
+    assert r["p_warn"] == significance.prob_at_least(hits, performance_dashboard.HIT_RATE_WARN)
@@ -0,0 +1,28 @@
+import pytest
+
+from scripts import pipeline_runner
+
+def _boom():
+    raise RuntimeError("boom")
+
+def test_fetch_without_data_fails_the_market():
+    run = pipeline_runner.MarketRun("TW")
+    assert run.stage("fetch", lambda: None) is None
+    assert run.status() == "failed"
+    assert "fetch" in run.summary()["errors"]
+
+def test_non_critical_errors_degrade():
+    run = pipeline_runner.MarketRun("TW")
+    run.stage("fetch", lambda: {"ok": 1})
+    run.stage("settle", _boom)
+    run.stage("contagion", lambda: None)
+    assert run.status() == "degraded"
+    assert set(run.errors) == {"settle"}
+
+def test_exit_code_flags_any_failed_market(monkeypatch):
+    payload = {"markets": {"TW": {"status": "failed"}, "US": {"status": "ok"}}}
+    monkeypatch.setattr(pipeline_runner, "run", lambda *a: payload)
+    monkeypatch.setattr("sys.argv", ["pipeline_runner.py"])
+    with pytest.raises(SystemExit) as e:
+        pipeline_runner.main()
+    assert e.value.code == 1
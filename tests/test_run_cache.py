@@ -0,0 +1,43 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from scripts import ai_engine, market_registry, metrics_materializer, run_cache, tree_compiler
+
+NOW = datetime.datetime(2026, 10, 19, 12, 0, tzinfo=datetime.timezone.utc)   # 台股已收盤
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_cache, "CACHE_DIR", str(tmp_path / "run_cache"))
+    monkeypatch.setattr(tree_compiler, "MODEL_DIR", str(tmp_path / "models"))
+    return tmp_path
+
+def _panel():
+    idx = pd.bdate_range("2026-10-01", "2026-10-19")
+    return pd.DataFrame({("2330.TW", "Close"): range(len(idx))}, index=idx, dtype=float)
+
+RESULTS = {"2330.TW": {"pred": 0.012, "price": 1000.0, "sup": 980.0, "res": 1020.0}}
+
+def test_hit_returns_results_only(cache):
+    m = market_registry.get("TW")
+    run_cache.store(m, _panel(), RESULTS, "2026-10-19", now=NOW)
+
+    fast = run_cache.lookup(m, now=NOW)
+    assert fast["results"] == RESULTS and "message" not in fast
+    assert run_cache.lookup(m, _panel(), now=NOW)["data_hash"] == fast["data_hash"]
+
+def test_cached_run_renders_the_current_backtest(cache, monkeypatch):
+    m = market_registry.get("TW")
+    run_cache.store(m, _panel(), RESULTS, "2026-10-19", now=NOW)
+    sent = []
+    monkeypatch.setattr(ai_engine, "send", lambda url, content: sent.append(content))
+    monkeypatch.setattr(ai_engine.history_store, "append_predictions", lambda *a: 0)
+
+    for rate in (0.5, 0.65):
+        bt = {"window_count": 20, "hit_rate": rate, "avg_return": 0.001, "max_drawdown": -0.02}
+        monkeypatch.setattr(metrics_materializer, "latest", lambda code, bt=bt: bt)
+        entry = run_cache.lookup(m, now=NOW)
+        ai_engine.report(m, entry["results"], False, entry["date"])
+
+    assert "命中率：50.0%" in sent[0] and "命中率：65.0%" in sent[1]
@@ -0,0 +1,45 @@
+import numpy as np
+
+from scripts import shock_detector as sd
+
+SYMBOLS = ["A", "B", "C", "D", "^TWII", "^VIX"]
+
+def _metrics(z, gap, level, ret=None):
+    n = len(z)
+    return {
+        "ret": np.asarray(ret if ret is not None else [-0.01] * n, dtype=np.float64),
+        "z": np.asarray(z, dtype=np.float64),
+        "gap": np.asarray(gap, dtype=np.float64),
+        "vol_ratio": np.full(n, np.nan),
+        "level": np.asarray(level, dtype=np.int8),
+    }
+
+# ===============================
+# Scan
+# ===============================
+def test_scan_flags_gap_without_z():
+    base = {
+        "mu": np.zeros(3), "sd": np.array([0.01, np.nan, 0.01]), "n": np.array([60, 5, 60]),
+        "avg_vol": np.ones(3), "prev_close": np.array([100.0, 100.0, 100.0]),
+    }
+    m = sd.scan(base, [99.5, 92.0, 95.0], day_open=[100.0, 91.0, 99.0])
+    assert np.isnan(m["z"][1])
+    assert m["level"].tolist() == [0, 2, 2]    # B：基準不足（z = NaN）但跳空 -9%
+
+# ===============================
+# Assess
+# ===============================
+def test_assess_keeps_flagged_symbol_with_nan_z():
+    m = _metrics(z=[-0.1, np.nan, -0.2], gap=[0.0, -0.09, 0.0], level=[0, 2, 0])
+    assert sd.assess(m, ["A", "B", "C"])["l2"] == ["B"]
+
+def test_assess_orders_by_z_then_gap():
+    m = _metrics(
+        z=[np.nan, -5.0, np.nan, -4.5, -9.0, 0.0],
+        gap=[-0.08, -0.01, -0.12, 0.0, -0.1, 0.0],
+        level=[2, 2, 2, 2, 2, 0],
+    )
+    out = sd.assess(m, SYMBOLS, index="^TWII", vix="^VIX")
+    # 指數不列入個股；z 可比較者在前，僅跳空者依跳空幅度
+    assert out["l2"] == ["B", "D", "C", "A"]
+    assert out["l1"] == 4
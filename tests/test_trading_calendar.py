@@ -0,0 +1,70 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from scripts import trading_calendar
+from scripts.trading_calendar import TradingCalendar, get_calendar
+
+D = datetime.date
+
+# ===============================
+# Sessions across weekends / holidays
+# ===============================
+def test_tw_lunar_new_year_is_skipped():
+    cal = get_calendar("TW")
+    # 2026 春節：02-12（四）～ 02-20（五）休市
+    assert cal.next_session(D(2026, 2, 12)) == D(2026, 2, 23)
+    assert cal.prev_session(D(2026, 2, 20)) == D(2026, 2, 11)
+    assert cal.offset(D(2026, 2, 10), 1) == D(2026, 2, 11)
+    assert cal.offset(D(2026, 2, 11), 1) == D(2026, 2, 23)
+    assert not cal.is_session(D(2026, 2, 16))
+
+def test_weekend_and_offset():
+    cal = get_calendar("TW")
+    assert cal.next_session(D(2026, 10, 17)) == D(2026, 10, 19)    # 週六 → 週一
+    assert cal.prev_session(D(2026, 10, 18)) == D(2026, 10, 16)    # 週日 → 週五
+    assert cal.offset(D(2026, 10, 16), 5) == D(2026, 10, 23)
+    # 10-26 光復節補假
+    assert cal.offset(D(2026, 10, 23), 1) == D(2026, 10, 27)
+    assert cal.sessions_between(D(2026, 10, 16), D(2026, 10, 23)) == 5
+
+def test_us_rule_holidays():
+    cal = get_calendar("US")
+    assert cal.offset(D(2026, 11, 25), 1) == D(2026, 11, 27)       # Thanksgiving
+    assert cal.next_session(D(2027, 7, 4)) == D(2027, 7, 6)        # 週日 → 週一補假
+    assert cal.end == np.datetime64("2030-12-31")
+
+def test_offsets_matches_offset():
+    cal = get_calendar("TW")
+    days = [D(2026, 2, 10), D(2026, 2, 13), D(2026, 10, 17)]
+    out = cal.offsets(np.array(days, dtype="datetime64[D]"), 3)
+    assert [d.astype(object) for d in out] == [cal.offset(d, 3) for d in days]
+
+# ===============================
+# Range guard
+# ===============================
+def test_tw_range_is_limited_to_holiday_years():
+    cal = get_calendar("TW")
+    assert (cal.start, cal.end) == (np.datetime64("2024-01-01"), np.datetime64("2026-12-31"))
+    with pytest.raises(ValueError, match="outside TW calendar range"):
+        cal.offset(D(2027, 2, 5), 5)
+    with pytest.raises(ValueError):
+        cal.next_session(D(2023, 12, 29))
+    with pytest.raises(ValueError):
+        cal.offset(D(2026, 12, 28), 5)        # 結算日落在涵蓋期之後
+
+def test_registry_holidays_define_range(monkeypatch):
+    monkeypatch.setattr(trading_calendar.market_registry, "get",
+                        lambda code: {"calendar": "XX", "holidays": ["2026-01-01", "2026-05-01"]})
+    get_calendar.cache_clear()
+    try:
+        cal = get_calendar("XX")
+        assert (cal.start, cal.end) == (np.datetime64("2026-01-01"), np.datetime64("2026-12-31"))
+        assert cal.next_session(D(2026, 5, 1)) == D(2026, 5, 4)
+    finally:
+        get_calendar.cache_clear()
+
+def test_weekend_only_calendar_keeps_full_range():
+    cal = TradingCalendar("XX", [])
+    assert cal.next_session(D(2029, 6, 2)) == D(2029, 6, 4)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from scripts import tree_compiler
+
+xgb = pytest.importorskip("xgboost")
+
+N_FEATURES = 6
+TOL = 1e-5     # float32 門檻比較；實測與 xgboost 差異 < 1e-6
+
+def _fit(seed, n_estimators):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(400, N_FEATURES)).astype(np.float32)
+    y = X[:, 0] - 0.5 * X[:, 1] * X[:, 2] + rng.normal(0, 0.1, 400)
+    X[rng.random(X.shape) < 0.15] = np.nan       # 訓練資料含缺值 → 學到 default 方向
+    model = xgb.XGBRegressor(n_estimators=n_estimators, max_depth=4, learning_rate=0.2, random_state=seed)
+    return model.fit(X, y)
+
+@pytest.fixture(scope="module")
+def models():
+    return {"A": _fit(1, 20), "B": _fit(2, 35), "C": _fit(3, 8)}
+
+@pytest.fixture(scope="module")
+def X():
+    rng = np.random.default_rng(9)
+    X = rng.normal(size=(300, N_FEATURES)).astype(np.float32)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    X[:5] = np.nan                                # 整列缺值
+    return X
+
+def _expected(models, X, name):
+    return models[name].predict(X).astype(np.float64)
+
+def test_matches_xgboost_including_nan_routing(models, X):
+    ens = tree_compiler.compile_models(models)
+    for name in models:
+        np.testing.assert_allclose(ens.predict(X, name), _expected(models, X, name), atol=TOL)
+
+def test_mixed_models_per_row(models, X):
+    ens = tree_compiler.compile_models(models)
+    names = np.array(["A", "B", "C"])[np.arange(len(X)) % 3].tolist()
+    want = np.array([_expected(models, X[i:i + 1], n)[0] for i, n in enumerate(names)])
+    np.testing.assert_allclose(ens.predict(X, names), want, atol=TOL)
+
+def test_subset_and_merge(models, X):
+    full = tree_compiler.compile_models(models)
+    sub = full.subset(["B"])
+    assert sub.names == ["B"] and len(sub.feature) < len(full.feature)
+    np.testing.assert_allclose(sub.predict(X, "B"), _expected(models, X, "B"), atol=TOL)
+
+    # 重訓 A：新模型優先，B / C 沿用舊樹
+    retrained = {"A": _fit(4, 12)}
+    merged = tree_compiler.compile_models(retrained).merge(full)
+    assert merged.names == ["A", "B", "C"]
+    np.testing.assert_allclose(merged.predict(X, "A"), _expected(retrained, X, "A"), atol=TOL)
+    for name in ("B", "C"):
+        np.testing.assert_allclose(merged.predict(X, name), _expected(models, X, name), atol=TOL)
+
+def test_save_load_round_trip(models, X, tmp_path):
+    ens = tree_compiler.compile_models(models, feature_names=[f"f{i}" for i in range(N_FEATURES)])
+    path = str(tmp_path / "TW.npz")
+    ens.save(path, meta={"session": "2026-10-16"})
+    back = tree_compiler.Ensemble.load(path)
+    assert back.meta["session"] == "2026-10-16" and back.feature_names == ens.feature_names
+    np.testing.assert_array_equal(back.predict(X, "C"), ens.predict(X, "C"))
@@ -0,0 +1,66 @@
+import json
+import os
+from datetime import date
+
+import numpy as np
+import pytest
+
+from scripts import market_registry
+from scripts import update_explorer_pool as uep
+
+UNIVERSE = ["D.TW", "C.TW", "B.TW", "A.TW"]
+
+@pytest.fixture
+def explorer(tmp_path, monkeypatch):
+    volumes = {"A.TW": 100.0, "B.TW": 300.0, "C.TW": 200.0, "D.TW": 1.0}
+    monkeypatch.setattr(uep, "STATE_DIR", str(tmp_path / "explorer_state"))
+    monkeypatch.setattr(uep, "POOL_SIZE", 3)
+    monkeypatch.setattr(uep, "last_closed_session", lambda code: date(2026, 10, 16))
+    monkeypatch.setattr(market_registry, "universe", lambda code: list(UNIVERSE))
+    monkeypatch.setattr(market_registry, "pool_file", lambda code: str(tmp_path / "pool.json"))
+    monkeypatch.setattr(market_registry, "ranking_file", lambda code: str(tmp_path / "explorer_state" / "ranking.json"))
+
+    def refresh(code, state, symbols, target):
+        dates = np.arange(np.datetime64("2026-09-01"), np.datetime64("2026-09-21"))
+        for s in symbols:
+            close = np.full(len(dates), 10.0)
+            if s == "C.TW":
+                close[-1] = np.nan            # 最新一根沒有收盤價
+            state.last_date[state.col[s]] = np.datetime64("NaT")
+            state.fold(s, dates, np.full(len(dates), volumes[s]), close)
+        return len(symbols), 0, []
+
+    monkeypatch.setattr(uep, "refresh", refresh)
+    return tmp_path, volumes
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_pool_is_sorted_and_rank_lives_in_cache(explorer):
+    tmp, _ = explorer
+    uep.run("TW")
+    pool = _read(tmp / "pool.json")
+    assert pool["symbols"] == ["A.TW", "B.TW", "C.TW"]
+    assert "volume" not in pool
+
+    ranking = _read(tmp / "explorer_state" / "ranking.json")["ranking"]
+    assert [(r["symbol"], r["rank"]) for r in ranking] == [("B.TW", 1), ("C.TW", 2), ("A.TW", 3)]
+    assert ranking[1]["close"] is None
+    assert market_registry.ranked_pool("TW") == ["B.TW", "C.TW", "A.TW"]
+
+def test_pool_is_rewritten_only_when_membership_changes(explorer):
+    tmp, volumes = explorer
+    uep.run("TW")
+    before = (tmp / "pool.json").read_bytes()
+
+    volumes["A.TW"], volumes["C.TW"] = 250.0, 150.0      # 名次變動、成員不變
+    os.utime(tmp / "pool.json", (0, 0))
+    uep.run("TW")
+    assert (tmp / "pool.json").read_bytes() == before
+    assert os.path.getmtime(tmp / "pool.json") == 0
+    assert market_registry.ranked_pool("TW") == ["B.TW", "A.TW", "C.TW"]
+
+    volumes["D.TW"] = 1000.0                              # 成員改變
+    uep.run("TW")
+    assert _read(tmp / "pool.json")["symbols"] == ["A.TW", "B.TW", "D.TW"]